@@ -1,13 +1,15 @@
-from langchain_huggingface import HuggingFaceEndpoint
-from langchain.agents import AgentExecutor
-from langchain.agents.format_scratchpad import format_log_to_str
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.memory import ConversationBufferMemory
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_core.tools.render import render_text_description
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-from output_parser import FlexibleOutputParser, clean_llm_response, validate_pdp_response, PDPOutputParser
+from inference import build_llm
+from fast_path import FastPathRouter
+from pdp_pipeline import (
+    MAX_BATCH_UPLOAD_BYTES, MAX_CV_BYTES, build_pdp_query, expand_cv_uploads, extract_cv_file, extract_cv_text,
+    finalize_pdp, get_role_profile, pdp_filename
+)
+from pdp_export import export_pdp, get_render_cache, get_renderer
+from tools.speculative import SpeculativeToolPrefetcher
+from tools.passthrough import TOOL_PASSTHROUGH_ENABLED, splice_observations, wrap_tools as wrap_passthrough_tools
 from tools import *
 from helpers import *
 import logging
@@ -16,159 +18,295 @@ import logging
 import os
 import yaml
 import uuid
-from typing import Optional, Dict, Any
+import time
+from typing import Optional, Dict, Any, List, Tuple
 from pydantic import BaseModel, Field
 import asyncio
-import tempfile
+import base64
+import contextvars
+import json
+import zipfile
+import threading
+from contextlib import asynccontextmanager
 from io import BytesIO
-import re
+import pytz
 from datetime import datetime
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form
 from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from helpers.logging_config import configure_logging
+from helpers.role_profiles import get_role_profile_cache
+from helpers.uploads import UploadLimitMiddleware, UploadTooLarge, read_upload, save_pdf_upload
+from helpers.metrics import (
+    ACTIVE_REQUESTS, MEMORY_CHARS, MEMORY_MESSAGES, PASSTHROUGH_SPLICES, PASSTHROUGH_TOKENS_SAVED, TOKENS_TODAY,
+    metrics_callback_handler, metrics_middleware, record_agent_iterations
+)
+from helpers.tokens import TokenBudgetExceeded, count_tokens, current_scope, load_tokenizer, token_accounted, token_ledger, token_scope
+from helpers.compression import CompressionMiddleware
+from helpers.thought_process import ThoughtProcessStore, format_turn
+from helpers.cassette import get_cassette, wrap_tools as wrap_cassette_tools
+from helpers.static_assets import InMemoryPage, PrecompressedStaticFiles, precompress_directory
 
+configure_logging()
+logger = logging.getLogger(__name__)
 
 active_requests = {}
+thought_processes = ThoughtProcessStore()
 
-# Initialize FastAPI app
-app = FastAPI(title="AI Assistant", description="AI Assistant with LangChain powered by Llama-3.3-70B-Instruct")
+FRONTEND_BUILD_DIR = "frontend/build"
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# LangChain's verbose mode prints every prompt and observation to stdout, bypassing logging
+AGENT_VERBOSE = os.getenv('AGENT_VERBOSE', 'false').lower() == 'true'
 
-# Token authentication for Hugging Face
-if not os.getenv('HUGGINGFACEHUB_API_TOKEN'):
-    raise ValueError("Please set HUGGINGFACEHUB_API_TOKEN environment variable")
-
-#model = "nvidia/Llama-3.1-Nemotron-70B-Instruct-HF"
-model = "meta-llama/Llama-3.3-70B-Instruct"
-
-# Initialize the HuggingFace pipeline with more strict parameters
-llm = HuggingFaceEndpoint(
-    repo_id=model,
-    huggingfacehub_api_token=os.getenv('HUGGINGFACEHUB_API_TOKEN'),
-    provider="hf-inference",
-    task="text-generation",
-    temperature=0.1,  # Slightly higher for more natural responses
-    max_new_tokens=1024,  # Increase to avoid truncation
-    top_p=0.9,  # More diverse responses
-    repetition_penalty=1.15,  # Stronger penalty to avoid "Human:"
-    do_sample=True,
-    verbose=True,
-    return_full_text=False
-)
+# Import the PDF, search and REPL modules in the background once the server is up
+STARTUP_PREWARM = os.getenv('STARTUP_PREWARM', 'true').lower() == 'true'
+
+# "stable" keeps the system prompt and tool specs byte-identical across requests, so inference
+# servers with prefix caching can reuse them, and sends the time with each user message.
+# "legacy" renders the startup time into the system prompt.
+PROMPT_LAYOUT = os.getenv('PROMPT_LAYOUT', 'stable').lower()
 
-utc_date_and_time_now = current_date_and_time('UTC')
-# Load system prompt and template
-with open("prompts.yaml", 'r') as stream:
-    prompt_templates = yaml.safe_load(stream)
+# Start idempotent tools while the LLM is still streaming its completion
+speculative_prefetcher = SpeculativeToolPrefetcher() if os.getenv('SPECULATIVE_TOOLS', 'false').lower() == 'true' else None
 
 # Define tools
 tools = [visit_webpage, wikipedia_search, run_python_code, internet_search, google_job_search, current_date_and_time]
 
-# Create memory for conversation history
-memory = ConversationBufferMemory(
-    memory_key="chat_history",
-    return_messages=True,
-    output_key="output"  # Specify which key to use for the output
-)
+# Built by build_agents() in the lifespan hook, so importing this module stays cheap
+llm = None
+pdp_llm = None
+memory = None
+agent_executor = None
+pdp_agent_executor = None
+pdp_batch_executor = None
+
+# Batch PDP generation: CVs processed at once and CVs accepted per request
+PDP_BATCH_CONCURRENCY = int(os.getenv('PDP_BATCH_CONCURRENCY', '4'))
+
+
+def utc_now() -> str:
+    """Current UTC time in the same format as the current_date_and_time tool"""
+    return datetime.now(pytz.utc).strftime('%Y:%m:%d %H:%M:%S %Z %z')
+
+
+def build_agent_prompt(layout: str = PROMPT_LAYOUT) -> ChatPromptTemplate:
+    """System prompt with tool specs, chat history, the user's message and the scratchpad"""
+    # Load system prompt and template
+    with open("prompts.yaml", 'r') as stream:
+        prompt_templates = yaml.safe_load(stream)
+
+    if layout == "legacy":
+        current_utc_date_and_time = utc_now()
+        human_template = "{input}"
+    else:
+        # Volatile fields go after the static prefix, into the human turn
+        current_utc_date_and_time = "given at the start of each user message"
+        human_template = "[Current UTC date and time: {current_utc_date_and_time}]\n{input}"
+
+    # Create the prompt template with chat history
+    return ChatPromptTemplate.from_messages([
+        ("system", prompt_templates["system_prompt"].format(
+            tools=render_text_description(tools),
+            tool_names=", ".join([t.name for t in tools]),
+            current_utc_date_and_time=current_utc_date_and_time
+        )),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", human_template),
+        ("assistant", "{agent_scratchpad}")  # Remove the prefix text and change to "assistant"
+    ])
+
+
+def build_agents() -> None:
+    """Create the LLM clients, the shared memory and both agent executors"""
+    global llm, pdp_llm, memory, agent_executor, pdp_agent_executor, pdp_batch_executor
+
+    # langchain.agents alone takes over a second to import
+    from langchain.agents.format_scratchpad import format_log_to_str
+    from langchain.memory import ConversationBufferMemory
+    from output_parser import FlexibleOutputParser, PDPOutputParser
+    # Repeated tool calls are answered from the run's earlier results
+    from loop_guard import LoopGuardExecutor
+
+    # Each route gets its own model and backend, see models.yaml
+    if speculative_prefetcher:
+        llm = build_llm("chat", streaming=True)
+        llm.callbacks = [speculative_prefetcher.callback_handler]
+    else:
+        llm = build_llm("chat")
+
+    # Create memory for conversation history
+    memory = ConversationBufferMemory(
+        memory_key="chat_history",
+        return_messages=True,
+        output_key="output"  # Specify which key to use for the output
+    )
+
+    prompt = build_agent_prompt()
+
+    # Define the agent
+    chat_model_with_stop = llm.bind(
+        stop=["\nHuman:", "Human:", "\n\nHuman", "\nUser:"] 
+    )
+
+    agent = (
+        {
+            "input": lambda x: x["input"],
+            "current_utc_date_and_time": lambda x: utc_now(),
+            "agent_scratchpad": lambda x: format_log_to_str(x["intermediate_steps"]) if x["intermediate_steps"] else "",
+            "chat_history": lambda x: x.get("chat_history", []) 
+        }
+        | prompt
+        | chat_model_with_stop
+        | FlexibleOutputParser()
+    )
+
+    # Tool results are recorded or replayed underneath every other tool wrapper
+    cassette = get_cassette()
+    base_tools = wrap_cassette_tools(tools, cassette) if cassette else tools
+
+    # Job listings are spliced into the answer by the server instead of being retyped by the model
+    chat_tools = wrap_passthrough_tools(base_tools) if TOOL_PASSTHROUGH_ENABLED else base_tools
+
+    agent_executor = LoopGuardExecutor(
+        guard_name="chat",
+        agent=agent,
+        tools=speculative_prefetcher.wrap_tools(chat_tools) if speculative_prefetcher else chat_tools,
+        verbose=AGENT_VERBOSE,
+       #handle_parsing_errors="Check your output and make sure it conforms to the expected format!",
+        handle_parsing_errors=True,
+        max_iterations=5,  
+        return_intermediate_steps=True,
+        early_stopping_method="force",  
+        memory=memory
+    )
+
+    #initialize PDP agent
+    pdp_llm = build_llm("pdp")
+
+    # Short messages the fast path rules can't place are classified by the small "fast" route model
+    if fast_path_router and FAST_PATH_LLM_ENABLED:
+        fast_path_router.llm = build_llm("fast")
+
+    # Create separate agent executor for PDP
+    pdp_chat_model_with_stop = pdp_llm.bind(
+        stop=["\nHuman:", "Human:", "\n\nHuman", "\nUser:"] 
+    )
+
+    pdp_agent = (
+        {
+            "input": lambda x: x["input"],
+            "current_utc_date_and_time": lambda x: utc_now(),
+            "agent_scratchpad": lambda x: format_log_to_str(x["intermediate_steps"]) if x["intermediate_steps"] else "",
+            "chat_history": lambda x: x.get("chat_history", []) 
+        }
+        | prompt
+        | pdp_chat_model_with_stop
+        | PDPOutputParser()
+    )
+
+    pdp_agent_executor = LoopGuardExecutor(
+        guard_name="pdp",
+        finish_on_convergence=False,
+        agent=pdp_agent,
+        tools=base_tools,
+        verbose=AGENT_VERBOSE,
+        handle_parsing_errors=True,
+        max_iterations=5,  
+        return_intermediate_steps=True,
+        early_stopping_method="force",  
+        memory=memory
+    )
+
+    # Batch runs are independent of each other and of the chat, so they get no memory
+    pdp_batch_executor = LoopGuardExecutor(
+        guard_name="pdp_batch",
+        finish_on_convergence=False,
+        agent=pdp_agent,
+        tools=base_tools,
+        verbose=AGENT_VERBOSE,
+        handle_parsing_errors=True,
+        max_iterations=5,
+        early_stopping_method="force",
+    )
+
+
+def prewarm_imports() -> None:
+    """Load the modules that are only needed by PDP requests and tools, off the request path"""
+    started = time.perf_counter()
+    try:
+        import langchain_community.document_loaders
+        import langchain_text_splitters
+        import reportlab.platypus
+        import pypdf
+        from langchain_community.tools import DuckDuckGoSearchResults, WikipediaQueryRun
+        from langchain_community.utilities import WikipediaAPIWrapper
+        from langchain_experimental.utilities import PythonREPL
+    except Exception as e:
+        logger.warning("Prewarming imports failed: %s", e)
+        return
+    logger.info("Prewarmed imports in %.2fs", time.perf_counter() - started)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    # Reading or downloading the tokenizer can take seconds; counts are estimated until it is ready
+    threading.Thread(target=load_tokenizer, name="load-tokenizer", daemon=True).start()
+    await asyncio.to_thread(build_agents)
+    logger.info("Agents ready in %.2fs", time.perf_counter() - started)
+    if STARTUP_PREWARM:
+        threading.Thread(target=prewarm_imports, name="prewarm-imports", daemon=True).start()
+    if os.path.exists(FRONTEND_BUILD_DIR):
+        # Usually done at build time already, then this only compares modification times
+        written = await asyncio.to_thread(precompress_directory, FRONTEND_BUILD_DIR)
+        if written:
+            logger.info("Precompressed %s frontend files", written)
+    yield
 
-# Create the prompt template with chat history
-prompt = ChatPromptTemplate.from_messages([
-    ("system", prompt_templates["system_prompt"].format(
-        tools=render_text_description(tools),
-        tool_names=", ".join([t.name for t in tools]),
-        current_utc_date_and_time=utc_date_and_time_now
-    )),
-    MessagesPlaceholder(variable_name="chat_history"),
-    ("human", "{input}"),
-    ("assistant", "{agent_scratchpad}")  # Remove the prefix text and change to "assistant"
-])
-
-# Define the agent
-chat_model_with_stop = llm.bind(
-    stop=["\nHuman:", "Human:", "\n\nHuman", "\nUser:"] 
-)
 
-agent = (
-    {
-        "input": lambda x: x["input"],
-        "agent_scratchpad": lambda x: format_log_to_str(x["intermediate_steps"]) if x["intermediate_steps"] else "",
-        "chat_history": lambda x: x.get("chat_history", []) 
-    }
-    | prompt
-    | chat_model_with_stop
-    | FlexibleOutputParser()
-)
+# Initialize FastAPI app
+app = FastAPI(title="AI Assistant", description="AI Assistant with LangChain powered by Llama-3.3-70B-Instruct", lifespan=lifespan)
 
-agent_executor = AgentExecutor(
-    agent=agent,
-    tools=tools,
-    verbose=True,
-   #handle_parsing_errors="Check your output and make sure it conforms to the expected format!",
-    handle_parsing_errors=True,
-    max_iterations=5,  
-    return_intermediate_steps=True,
-    early_stopping_method="force",  
-    memory=memory
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["X-PDP-Id"],
 )
 
-#initialize PDP agent
-pdp_llm = HuggingFaceEndpoint(
-    repo_id=model,
-    huggingfacehub_api_token=os.getenv('HUGGINGFACEHUB_API_TOKEN'),
-    provider="hf-inference",
-    task="text-generation",
-    temperature=0.1,
-    max_new_tokens=3072,  # Much higher for comprehensive PDPs
-    top_p=0.9,
-    repetition_penalty=1.15,
-    do_sample=True,
-    verbose=True,
-    return_full_text=False
-)
+# Multipart bodies are parsed before the endpoint runs, so their size is capped here. 1 MB on
+# top of the file limits leaves room for the other form fields.
+app.add_middleware(UploadLimitMiddleware, limits={
+    "/pdp-generator/batch": MAX_BATCH_UPLOAD_BYTES + 1024 * 1024,
+    "/pdp-generator": MAX_CV_BYTES + 1024 * 1024,
+})
 
-# Create separate agent executor for PDP
-pdp_chat_model_with_stop = pdp_llm.bind(
-    stop=["\nHuman:", "Human:", "\n\nHuman", "\nUser:"] 
-)
+if os.getenv("RESPONSE_COMPRESSION", "true").lower() == "true":
+    app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "500")))
 
-pdp_agent = (
-    {
-        "input": lambda x: x["input"],
-        "agent_scratchpad": lambda x: format_log_to_str(x["intermediate_steps"]) if x["intermediate_steps"] else "",
-        "chat_history": lambda x: x.get("chat_history", []) 
-    }
-    | prompt
-    | pdp_chat_model_with_stop
-    | PDPOutputParser()
-)
+app.middleware("http")(metrics_middleware)
 
-pdp_agent_executor = AgentExecutor(
-    agent=pdp_agent,
-    tools=tools,
-    verbose=True,
-    handle_parsing_errors=True,
-    max_iterations=5,  
-    return_intermediate_steps=True,
-    early_stopping_method="force",  
-    memory=memory
-)
+ACTIVE_REQUESTS.set_function(lambda: len(active_requests))
+TOKENS_TODAY.set_function(token_ledger.day_total)
+MEMORY_MESSAGES.set_function(lambda: len(memory.chat_memory.messages) if memory else 0)
+MEMORY_CHARS.set_function(lambda: sum(len(str(message.content)) for message in memory.chat_memory.messages) if memory else 0)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+def agent_callbacks(thread_id: Optional[str] = None) -> list:
+    """Callbacks for one agent run: metrics always, tracing when enabled"""
+    callbacks = [metrics_callback_handler]
+    if tracing_enabled():
+        callbacks.append(TracingCallbackHandler(thread_id, current_context()))
+    return callbacks
+
+# Cheap pre-agent router for greetings, thanks and date/time questions
+fast_path_router = FastPathRouter() if os.getenv('FAST_PATH_ENABLED', 'true').lower() == 'true' else None
+FAST_PATH_LLM_ENABLED = os.getenv('FAST_PATH_LLM', 'true').lower() == 'true'
 
 # Add this function to clear corrupted memory
 def clear_memory_if_corrupted():
@@ -179,10 +317,10 @@ def clear_memory_if_corrupted():
 
     corrupted_count = sum(1 for msg in messages if not msg.content.strip() or "Human:" in msg.content or msg.content == "Human:")
 
-    logging.info(f"Memory check: {corrupted_count}/{len(messages)} corrupted messages")
+    logger.info("Memory check: %s/%s corrupted messages", corrupted_count, len(messages))
 
     if corrupted_count > len(messages) * 0.2:  # If 20% of messages are corrupted
-        logging.info("Clearing corrupted memory...")
+        logger.info("Clearing corrupted memory...")
         memory.clear()
 
 # API Models
@@ -190,6 +328,8 @@ class QueryRequest(BaseModel):
     query: str
     thread_id: Optional[str] = None
     context: Dict[str, Any] = Field(default_factory=dict)
+    # The steps are otherwise only stored, see /agent/thought-process/{thread_id}
+    include_thought_process: bool = False
 
 class PDPRequest(BaseModel):
     career_goal: str
@@ -218,24 +358,108 @@ async def get_feedback(key: str):
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Error retrieving feedback: {str(e)}")
+        logger.error("Error retrieving feedback: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error retrieving feedback: {str(e)}"
         )
 
+def require_admin_key(key: str) -> None:
+    """Same key check as /get-feedback: the configured Hugging Face API token"""
+    token = os.getenv('HUGGINGFACEHUB_API_TOKEN')
+    if not token:
+        raise HTTPException(status_code=500, detail="HUGGINGFACEHUB_API_TOKEN not configured")
+    if key != token:
+        raise HTTPException(status_code=401, detail="Unauthorized access")
+
+@app.get("/pdp/role-profiles")
+async def list_role_profiles(key: str):
+    """
+    List the cached role profiles with their age. Requires Hugging Face API token for authentication.
+    """
+    require_admin_key(key)
+    cache = get_role_profile_cache()
+    if cache is None:
+        return {"status": "disabled", "profiles": {}}
+    return {"status": "success", "profiles": cache.entries()}
+
+@app.delete("/pdp/role-profiles")
+async def invalidate_role_profiles(key: str, career_goal: Optional[str] = None):
+    """
+    Drop the cached role profile of one career goal, or all of them if none is given.
+    Requires Hugging Face API token for authentication.
+    """
+    require_admin_key(key)
+    cache = get_role_profile_cache()
+    if cache is None:
+        return {"status": "disabled", "removed": 0}
+    removed = cache.invalidate(career_goal)
+    logger.info("Role profiles invalidated", extra={"career_goal": career_goal, "removed": removed})
+    return {"status": "success", "removed": removed}
+
 @app.post("/agent/feedback")
 async def feedback(contact: str, feedback: str):
     """
     Receive and store user feedback
     """
     try:
-        logging.info(f"Feedback: {contact}, {feedback}")
+        logger.info("Feedback received", extra={"contact_provided": bool(contact), "feedback_chars": len(feedback)})
         result = store_feedback(contact, feedback)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/agent/router-stats")
+async def router_stats():
+    """
+    Share of queries answered by the fast path router and the estimated latency saved
+    """
+    if fast_path_router is None:
+        return {"enabled": False}
+    return {"enabled": True, **fast_path_router.stats()}
+
+@app.get("/agent/speculative-stats")
+async def speculative_stats():
+    """
+    Hit rate of speculatively prefetched tool calls and the tool latency hidden behind generation
+    """
+    if speculative_prefetcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **speculative_prefetcher.stats()}
+
+@app.get("/agent/loop-guard-stats")
+async def loop_guard_stats():
+    """
+    Repeated tool calls answered from earlier results, runs ended early and the iterations and seconds saved
+    """
+    from loop_guard import LOOP_GUARD_ENABLED, loop_guard_stats as stats
+    return {"enabled": LOOP_GUARD_ENABLED, "agents": stats.stats()}
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics: requests, LLM and tool calls, parser paths, PDP validation and memory
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/agent/thought-process/{thread_id}")
+async def get_thought_process(thread_id: str, turn: Optional[int] = None):
+    """The agent's steps for the turns of a thread, or for one turn, oldest first"""
+    turns = thought_processes.get(thread_id, turn)
+    if turns is None:
+        raise HTTPException(status_code=404, detail="No thought process stored for this thread or turn")
+    return {"thread_id": thread_id, "turns": turns}
+
+def query_result(request: QueryRequest, thread_id: str, status: str, output: str, intermediate_steps=(), note: Optional[str] = None, usage: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """Response of /agent/query. The thought process is stored and only inlined on request."""
+    turn = thought_processes.record(thread_id, request.query, intermediate_steps, note)
+    result = {"status": status, "thread_id": thread_id, "response": output, "thought_process_turn": turn["turn"]}
+    if usage is not None:
+        result["usage"] = usage
+    if request.include_thought_process:
+        result["full_thought_process"] = format_turn(turn)
+    return result
+
 @app.post("/agent/cancel/{thread_id}")
 async def cancel_request(thread_id: str):
     if thread_id in active_requests:
@@ -244,56 +468,51 @@ async def cancel_request(thread_id: str):
         return {"status": "cancelled", "thread_id": thread_id}
     return {"status": "not_found", "thread_id": thread_id}
 
-# Configure text splitter
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=200,
-    length_function=len,
-)
-
 @app.post("/pdp-generator")
+@traced("pdp.generate")
+@token_accounted("pdp")
 async def pdp_generator(
     file: UploadFile = File(...),
     career_goal: str = Form(...),
     additional_context: str = Form(""),
-    target_date: str = Form(...)
+    target_date: str = Form(...),
+    output_format: str = Form("pdf")
 ):
     """
-    Generate Personal Development Plan as PDF using uploaded CV and user inputs
+    Generate Personal Development Plan using uploaded CV and user inputs, as PDF by default
+    or in any format registered in pdp_export. The X-PDP-Id response header identifies the
+    plan for GET /pdp-generator/{pdp_id}.
     """
     # Validate file type
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    try:
+        renderer = get_renderer(output_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        token_ledger.check()
+    except TokenBudgetExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
 
-    # Create temporary file
     tmp_file_path = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            # Write uploaded content to temp file
-            content = await file.read()
-            if not content:
-                raise HTTPException(status_code=400, detail="Empty file uploaded")
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
-
-        # Load PDF using LangChain
-        try:
-            loader = PyPDFLoader(tmp_file_path)
-            documents = loader.load()
-            if not documents:
-                raise HTTPException(status_code=400, detail="Could not extract content from PDF")
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Error processing PDF: {str(e)}")
-
-        # Split documents into chunks
-        chunks = text_splitter.split_documents(documents)
-        if not chunks:
-            raise HTTPException(status_code=400, detail="No content could be extracted from the PDF")
+        # Copy the upload to disk in chunks, rejecting non-PDFs and oversized files early
+        with span("pdp.read_upload") as stage:
+            try:
+                tmp_file_path = await save_pdf_upload(file, MAX_CV_BYTES)
+            except UploadTooLarge as e:
+                raise HTTPException(status_code=413, detail=str(e))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if stage:
+                stage.set_attribute("upload.bytes", os.path.getsize(tmp_file_path))
 
         # Extract CV content
-        cv_content = "\n".join([chunk.page_content for chunk in chunks])
-        if not cv_content.strip():
-            raise HTTPException(status_code=400, detail="No text content found in the PDF")
+        try:
+            cv_content = await asyncio.to_thread(extract_cv_file, tmp_file_path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         # Create PDP request
         pdp_request = PDPRequest(
@@ -302,40 +521,23 @@ async def pdp_generator(
             target_date=target_date,
             cv_content=cv_content
         )
-        #debug
-        logging.info(f"PDP request: {pdp_request}")
-
-        # Generate PDP using the agent
-        pdp_query = f"""
-        Create a comprehensive Personal Development Plan for transitioning to {pdp_request.career_goal} by {pdp_request.target_date}.
-        DO NOT ASK FOR CONFIRMATION OF THIS REQUEST!
-
-        Based on this CV content: {pdp_request.cv_content}
-        Additional context: {pdp_request.additional_context}
+        logger.debug("PDP request: %s", pdp_request)
 
-        Structure your response with these exact sections:
-
-        ## Current Skills Assessment
-        [Analyze current skills from CV]
-
-        ## Skills Gap Analysis
-        [Identify missing skills for the target role]
-
-        ## Learning Objectives and Milestones
-        [Specific, measurable goals with dates]
-
-        ## Recommended Training and Development
-        [Specific courses, certifications, resources]
-
-        ## Timeline and Action Steps
-        [Month-by-month plan until {pdp_request.target_date}]
-
-        ## Progress Tracking and KPIs
-        [How to measure success]
+        # Requirements of the role are shared by everyone with the same goal, so they come from the cache
+        try:
+            role_profile = await asyncio.to_thread(get_role_profile, pdp_llm, pdp_request.career_goal, agent_callbacks())
+        except Exception as e:
+            logger.warning("Role profile lookup failed, generating the PDP without it: %s", e)
+            role_profile = None
 
-        Do NOT include any code execution and Python scripts.
-        Focus on creating a clear, actionable career development plan.
-        """
+        # Generate PDP using the agent
+        pdp_query = build_pdp_query(
+            career_goal=pdp_request.career_goal,
+            target_date=pdp_request.target_date,
+            cv_content=pdp_request.cv_content,
+            additional_context=pdp_request.additional_context,
+            role_profile=role_profile
+        )
 
         max_retries = 1
         for attempt in range(max_retries):
@@ -344,27 +546,26 @@ async def pdp_generator(
                 memory.clear()
 
                 agent_input = {"input": pdp_query}
-                response = pdp_agent_executor.invoke(agent_input)
+                with span("pdp.agent", attempt=attempt + 1):
+                    response = pdp_agent_executor.invoke(agent_input, config={"callbacks": agent_callbacks()})
+                record_agent_iterations("pdp", response)
                 pdp_response = response.get("output", "")
                                
-                logging.info(f"DEBUG: After cleanup length: {len(pdp_response)}")
+                logger.info("PDP response generated", extra={"response_chars": len(pdp_response), "attempt": attempt + 1})
                 
-                # Validate the response
-                if validate_pdp_response(pdp_response):
-                    # Create PDF only if validation passes
-                    logging.info(f"raw-pdp_response: {pdp_response}")
+                # Validate the response section by section, regenerating only the bad sections
+                structured_pdp, report = await asyncio.to_thread(finalize_pdp, pdp_llm, pdp_query, pdp_response, pdp_request.target_date, agent_callbacks())
+                if report.valid:
+                    # Render only if validation passes
+                    logger.debug("Raw PDP response: %s", pdp_response)
                     try:
-                        pdf_buffer = create_pdp_pdf(
-                            pdp_content=pdp_response,
-                            career_goal=career_goal,
-                            target_date=target_date,
-                            filename=file.filename
-                        )
+                        with span("pdp.render", format=output_format):
+                            pdp_id, document = await asyncio.to_thread(
+                                export_pdp, structured_pdp, career_goal, target_date, output_format
+                            )
 
-                        # Return successful PDF
-                        safe_career_goal = re.sub(r'[^\w\s-]', '', career_goal).strip()
-                        safe_career_goal = re.sub(r'[-\s]+', '-', safe_career_goal)
-                        pdf_filename = f"PDP_{safe_career_goal}_{datetime.now().strftime('%Y%m%d')}.pdf"
+                        # Return the rendered PDP
+                        document_filename = pdp_filename(career_goal, extension=renderer.extension)
 
                         # Add PDP request to chat history memory
                         user_pdp_message = f"User requested a Personal Development Plan.\nCareer Goal: {pdp_request.career_goal}\nTarget Date: {pdp_request.target_date}\nAdditional Context: {pdp_request.additional_context or 'None'}\nCV Provided: {'Yes' if cv_content.strip() else 'No'}"
@@ -374,18 +575,21 @@ async def pdp_generator(
                             {"output": assistant_pdp_ack}
                         )
 
+                        headers = {"Content-Disposition": f"attachment; filename={document_filename}"}
+                        if pdp_id:
+                            headers["X-PDP-Id"] = pdp_id
                         return StreamingResponse(
-                            BytesIO(pdf_buffer.read()),
-                            media_type="application/pdf",
-                            headers={"Content-Disposition": f"attachment; filename={pdf_filename}"}
+                            BytesIO(document),
+                            media_type=renderer.media_type,
+                            headers=headers
                         )
 
                     except Exception as e:
-                        logging.info(f"PDF creation error on attempt {attempt + 1}: {str(e)}")
+                        logger.info("PDP rendering error on attempt %s: %s", attempt + 1, e)
                         if attempt == max_retries - 1:
-                            raise HTTPException(status_code=500, detail=f"Error creating PDF: {str(e)}")
+                            raise HTTPException(status_code=500, detail=f"Error creating {output_format.upper()}: {str(e)}")
                 else:
-                    logging.info(f"Invalid PDP response on attempt {attempt + 1}")
+                    logger.info("Invalid PDP response on attempt %s", attempt + 1)
                     if attempt == max_retries - 1:
                         raise HTTPException(
                             status_code=500,
@@ -393,7 +597,7 @@ async def pdp_generator(
                         )
 
             except Exception as e:
-                logging.info(f"Agent execution error on attempt {attempt + 1}: {str(e)}")
+                logger.info("Agent execution error on attempt %s: %s", attempt + 1, e)
                 if attempt == max_retries - 1:
                     raise HTTPException(
                         status_code=500,
@@ -402,6 +606,8 @@ async def pdp_generator(
 
         # This should never be reached, but just in case
         raise HTTPException(status_code=500, detail="Failed to generate PDP after multiple attempts")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
     finally:
@@ -410,26 +616,228 @@ async def pdp_generator(
             try:
                 os.unlink(tmp_file_path)
             except Exception as e:
-                logging.info(f"Error cleaning up temporary file: {str(e)}")
+                logger.info("Error cleaning up temporary file: %s", e)
+
+def generate_cohort_pdp(
+    cv_name: str,
+    content: bytes,
+    career_goal: str,
+    target_date: str,
+    additional_context: str,
+    role_profile: Optional[str]
+) -> Tuple[Optional[str], bytes]:
+    """
+    Generate the PDP PDF of one CV in a batch, returned with its render cache id. Raises
+    ValueError if it can't be generated.
+    """
+    with span("pdp.batch_item", cv=cv_name):
+        cv_content = extract_cv_text(content)
+        pdp_query = build_pdp_query(
+            career_goal=career_goal,
+            target_date=target_date,
+            cv_content=cv_content,
+            additional_context=additional_context,
+            role_profile=role_profile
+        )
+
+        with span("pdp.agent"):
+            response = pdp_batch_executor.invoke({"input": pdp_query}, config={"callbacks": agent_callbacks()})
+        record_agent_iterations("pdp", response)
+        pdp_response = response.get("output", "")
+
+        structured_pdp, report = finalize_pdp(pdp_llm, pdp_query, pdp_response, target_date, agent_callbacks())
+        if not report.valid:
+            raise ValueError("Unable to generate a properly formatted PDP")
+
+        with span("pdp.render", format="pdf"):
+            return export_pdp(structured_pdp, career_goal, target_date, "pdf")
+
+
+@app.post("/pdp-generator/batch")
+@traced("pdp.batch")
+@token_accounted("pdp_batch")
+async def pdp_generator_batch(
+    files: List[UploadFile] = File(...),
+    career_goal: str = Form(...),
+    additional_context: str = Form(""),
+    target_date: str = Form(...),
+    output: str = Form("zip")
+):
+    """
+    Generate Personal Development Plans for a cohort of CVs that share one career goal.
+    CVs can be uploaded as several PDF files, as zip archives of PDFs or both. The target role
+    is analysed once for the whole batch and the PDPs are generated PDP_BATCH_CONCURRENCY at a time.
+    Returns a zip of the PDFs with a summary.json, or with output=ndjson streams one JSON line
+    per CV as soon as it is ready.
+    """
+    if output not in ("zip", "ndjson"):
+        raise HTTPException(status_code=400, detail="output must be 'zip' or 'ndjson'")
+    try:
+        token_ledger.check()
+    except TokenBudgetExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    # Kept for the summary, which ndjson writes after the endpoint has returned
+    tokens = current_scope()
+
+    uploads = []
+    remaining_bytes = MAX_BATCH_UPLOAD_BYTES
+    try:
+        for upload in files:
+            limit = min(MAX_CV_BYTES, remaining_bytes) if upload.filename.lower().endswith(".pdf") else remaining_bytes
+            content = await read_upload(upload, limit)
+            remaining_bytes -= len(content)
+            uploads.append((upload.filename, content))
+        # Unpacking is capped by file count and total size, see expand_cv_uploads
+        cvs = await asyncio.to_thread(expand_cv_uploads, uploads)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not cvs:
+        raise HTTPException(status_code=400, detail="No PDF files found in the upload")
+
+    # The requirements of the role are the same for every CV, so they are derived only once
+    try:
+        role_profile = await asyncio.to_thread(get_role_profile, pdp_llm, career_goal, agent_callbacks(), True)
+    except Exception as e:
+        logger.warning("Role analysis failed, generating PDPs without it: %s", e)
+        role_profile = None
+
+    semaphore = asyncio.Semaphore(PDP_BATCH_CONCURRENCY)
+
+    async def generate(cv_name: str, content: bytes) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                pdp_id, pdf = await asyncio.to_thread(
+                    generate_cohort_pdp, cv_name, content, career_goal, target_date, additional_context, role_profile
+                )
+                return {"cv": cv_name, "filename": pdp_filename(career_goal, cv_name), "pdp_id": pdp_id, "pdf": pdf}
+            except Exception as e:
+                logger.info("Batch PDP failed for %s: %s", cv_name, e)
+                return {"cv": cv_name, "error": str(e)}
+
+    logger.info("Batch PDP started", extra={"cvs": len(cvs), "career_goal": career_goal, "role_profile": role_profile is not None})
+    tasks = [asyncio.create_task(generate(cv_name, content)) for cv_name, content in cvs]
+
+    def summary(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "career_goal": career_goal,
+            "target_date": target_date,
+            "role_analysis": role_profile is not None,
+            "generated": [result["filename"] for result in results if "pdf" in result],
+            "pdp_ids": {result["cv"]: result["pdp_id"] for result in results if result.get("pdp_id")},
+            "failed": [{"cv": result["cv"], "error": result["error"]} for result in results if "error" in result],
+            "usage": tokens.usage(),
+        }
+
+    if output == "ndjson":
+        async def stream_results():
+            results = []
+            try:
+                for next_result in asyncio.as_completed(tasks):
+                    result = await next_result
+                    results.append(result)
+                    if "pdf" in result:
+                        line = {"type": "pdp", "cv": result["cv"], "filename": result["filename"], "pdp_id": result["pdp_id"],
+                                "pdf_base64": base64.b64encode(result["pdf"]).decode("ascii")}
+                    else:
+                        line = {"type": "error", "cv": result["cv"], "error": result["error"]}
+                    yield json.dumps(line) + "\n"
+                yield json.dumps({"type": "summary", **summary(results)}) + "\n"
+            finally:
+                # The client went away, don't generate PDPs nobody will receive
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+    results = await asyncio.gather(*tasks)
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+        for result in results:
+            if "pdf" in result:
+                zf.writestr(result["filename"], result["pdf"])
+        zf.writestr("summary.json", json.dumps(summary(results), indent=2))
+    archive.seek(0)
+
+    return StreamingResponse(
+        archive,
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={pdp_filename(career_goal, extension='zip')}"}
+    )
+
+@app.get("/pdp-generator/{pdp_id}")
+async def pdp_export(pdp_id: str, format: str = "pdf"):
+    """
+    Download an already generated PDP again, in any export format. Served from the render
+    cache without calling the model, 404 once the plan has expired.
+    """
+    try:
+        renderer = get_renderer(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    cache = get_render_cache()
+    if cache is None:
+        raise HTTPException(status_code=404, detail="PDP exports are not kept, PDP_RENDER_CACHE is off")
+
+    entry = await asyncio.to_thread(cache.plan, pdp_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"No PDP with id {pdp_id}, it may have expired")
+    try:
+        with span("pdp.render", format=format):
+            document = await asyncio.to_thread(cache.render, pdp_id, format)
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=f"Error creating {format.upper()}: {str(e)}")
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"No PDP with id {pdp_id}, it may have expired")
+
+    return Response(
+        content=document,
+        media_type=renderer.media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={pdp_filename(entry['career_goal'], extension=renderer.extension)}",
+            "X-PDP-Id": pdp_id,
+        }
+    )
 
 @app.post("/agent/query")
+@traced("agent.query")
 async def query_agent(request: QueryRequest):
-    logging.info(f"\n" + "="*50)
-    logging.info(f"Received query: {request.query}")
-    logging.info("="*50 + "\n")
-
     thread_id = request.thread_id or str(uuid.uuid4())
-
-    logging.info(f"thread_id: {thread_id}")
+    logger.info("Received query", extra={"thread_id": thread_id, "query_chars": len(request.query)})
+    logger.debug("Query: %s", request.query, extra={"thread_id": thread_id})
 
     # If no thread_id provided, this is a new conversation - clear memory
     if not request.thread_id:
-        logging.info("New conversation started - clearing memory...")
+        logger.info("New conversation started - clearing memory...")
         memory.clear()
 
     # Clear corrupted memory
     clear_memory_if_corrupted()
 
+    # Answer trivial queries without a round-trip through the agent
+    with span("fast_path.route", thread_id=thread_id):
+        if fast_path_router is None:
+            fast_path = None
+        elif fast_path_router.llm is not None:
+            # May call the fast model, which must not block the event loop
+            fast_path = await asyncio.to_thread(fast_path_router.route, request.query)
+        else:
+            fast_path = fast_path_router.route(request.query)
+    if fast_path:
+        intent, output = fast_path
+        memory.save_context(
+            {"input": request.query},
+            {"output": output}
+        )
+        return query_result(request, thread_id, "success", output, note=f"Answered by the fast path router (intent: {intent})")
+
+    # Refuse before any model call once the conversation or the day is out of tokens
+    try:
+        token_ledger.check(thread_id)
+    except TokenBudgetExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
     # Create a cancellation token
     cancel_event = asyncio.Event()
     active_requests[thread_id] = cancel_event
@@ -440,15 +848,17 @@ async def query_agent(request: QueryRequest):
             "input": request.query
         }
 
-        logging.info("\nStarting agent execution...")
+        logger.info("Starting agent execution", extra={"thread_id": thread_id})
 
         # Create a task that can be cancelled
         async def run_agent():
             try:
                 # Run the agent in a thread pool to avoid blocking
                 import concurrent.futures
+                config = {"callbacks": agent_callbacks(thread_id)}
                 with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(agent_executor.invoke, agent_input)
+                    # The copied context carries the token scope into the worker thread
+                    future = executor.submit(contextvars.copy_context().run, agent_executor.invoke, agent_input, config)
 
                     # Check for cancellation periodically
                     while not future.done():
@@ -459,47 +869,49 @@ async def query_agent(request: QueryRequest):
 
                     return future.result()
             except Exception as e:
-                logging.info(f"Agent execution error: {str(e)}")
+                logger.info("Agent execution error: %s", e)
                 raise e
 
         try:
-            response = await run_agent()
-            #debug
-            logging.info(f"Raw agent response: {response}")
+            agent_started = time.perf_counter()
+            with span("agent.run", thread_id=thread_id), token_scope("chat", thread_id) as tokens:
+                response = await run_agent()
+            if fast_path_router:
+                fast_path_router.record_agent_latency(time.perf_counter() - agent_started)
+            record_agent_iterations("chat", response)
+            logger.debug("Raw agent response: %s", response, extra={"thread_id": thread_id})
         except asyncio.CancelledError:
-            return {
-                "status": "cancelled",
-                "thread_id": thread_id,
-                "response": "Request was cancelled by user.",
-                "full_thought_process": "Request cancelled"
-            }
+            return query_result(request, thread_id, "cancelled", "Request was cancelled by user.", note="Request cancelled")
+        except TokenBudgetExceeded as e:
+            logger.info("Token budget exceeded: %s", e, extra={"thread_id": thread_id})
+            return query_result(request, thread_id, "error", str(e), note=f"Agent stopped: {str(e)}")
         except Exception as e:
-            logging.info(f"Agent execution error: {str(e)}")
-            return {
-                "status": "error",
-                "thread_id": thread_id,
-                "response": "I apologize, but I'm having trouble processing your request right now. Please try again with a different question.",
-                "full_thought_process": f"Agent execution failed: {str(e)}"
-            }
-
-        # Print detailed thought process
-        logging.info(f"\n" + "-"*50)
-        logging.info(f"Agent's Thought Process:")
-        logging.info("-"*50)
+            logger.warning("Agent execution error: %s", e, extra={"thread_id": thread_id})
+            return query_result(
+                request, thread_id, "error",
+                "I apologize, but I'm having trouble processing your request right now. Please try again with a different question.",
+                note=f"Agent execution failed: {str(e)}"
+            )
+
+        # One compact line per step, full observations only in sampled debug records
         for step in response.get("intermediate_steps", []):
-            logging.info("\nStep:")
-            logging.info(f"Action: {step[0].tool}")
-            logging.info(f"Action Input: {step[0].tool_input}")
-            logging.info(f"Observation: {step[1]}")
-            logging.info("-"*30)
-
-        logging.info("\nFinal Response:")
-        logging.info("-"*50)
+            logger.info(
+                "Agent step",
+                extra={"thread_id": thread_id, "tool": step[0].tool, "input_chars": len(str(step[0].tool_input)), "observation_chars": len(str(step[1]))}
+            )
+            logger.debug("Action: %s\nAction Input: %s\nObservation: %s", step[0].tool, step[0].tool_input, step[1], extra={"thread_id": thread_id})
+
         raw_output = response.get("output", "No response generated")
+        from output_parser import clean_llm_response
         output = clean_llm_response(raw_output)
-        #debug
-        logging.info(output)
-        logging.info("="*50 + "\n")
+
+        # After cleaning, so its line heuristics never touch the verbatim tool results
+        output, spliced = splice_observations(output, response.get("intermediate_steps", []))
+        for kind, observation in spliced:
+            PASSTHROUGH_SPLICES.labels(kind).inc()
+            PASSTHROUGH_TOKENS_SAVED.labels(kind).inc(count_tokens(observation))
+        logger.info("Agent finished", extra={"thread_id": thread_id, "response_chars": len(output), "spliced_results": len(spliced)})
+        logger.debug("Final response: %s", output, extra={"thread_id": thread_id})
 
         # Save the response to memory
         memory.save_context(
@@ -507,17 +919,9 @@ async def query_agent(request: QueryRequest):
             {"output": output}
         )
 
-        return {
-            "status": "success",
-            "thread_id": thread_id,
-            "response": output,
-            "full_thought_process": str(response.get("intermediate_steps", "No thought process generated"))
-        }
+        return query_result(request, thread_id, "success", output, response.get("intermediate_steps", []), usage=tokens.usage())
     except Exception as e:
-        logging.info("\nError occurred:")
-        logging.info("-"*50)
-        logging.info(str(e))
-        logging.info("="*50 + "\n")
+        logger.exception("Error occurred: %s", e, extra={"thread_id": thread_id})
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         # Clean up the active request
@@ -527,20 +931,27 @@ async def query_agent(request: QueryRequest):
 
 
 # Check if the frontend build directory exists
-if os.path.exists("frontend/build"):
-    # Serve static files from React build
-    app.mount("/static", StaticFiles(directory="frontend/build/static"), name="static")
+if os.path.exists(FRONTEND_BUILD_DIR):
+    # Serve static files from React build, precompressed and cached by hashed name
+    app.mount("/static", PrecompressedStaticFiles(directory=f"{FRONTEND_BUILD_DIR}/static"), name="static")
 
     # Serve other static files from the build directory
-    if os.path.exists("frontend/build/assets"):
-        app.mount("/assets", StaticFiles(directory="frontend/build/assets"), name="assets")
+    if os.path.exists(f"{FRONTEND_BUILD_DIR}/assets"):
+        app.mount("/assets", PrecompressedStaticFiles(directory=f"{FRONTEND_BUILD_DIR}/assets"), name="assets")
+
+    # Read once, every client-side route gets the same page
+    index_page = InMemoryPage(f"{FRONTEND_BUILD_DIR}/index.html")
 
     # Serve React app for all other routes that don't match API endpoints
     @app.get("/{full_path:path}")
-    async def serve_react_app(full_path: str):
+    async def serve_react_app(full_path: str, request: Request):
         # Skip API routes
         if full_path.startswith("agent/"):
             raise HTTPException(status_code=404, detail="Not found")
 
+        # Files at the top of the build (favicon, manifest) are served as they are
+        if full_path and "/" not in full_path and os.path.isfile(os.path.join(FRONTEND_BUILD_DIR, full_path)) and full_path != "index.html":
+            return FileResponse(os.path.join(FRONTEND_BUILD_DIR, full_path))
+
         # For all other routes, serve the React app
-        return FileResponse("frontend/build/index.html")
\ No newline at end of file
+        return index_page.response(request.headers.get("accept-encoding", ""), request.headers.get("if-none-match", ""))
\ No newline at end of file
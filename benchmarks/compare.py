@@ -0,0 +1,47 @@
+"""
+Compare two run_benchmark.py result files.
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json
+"""
+import argparse
+import json
+
+METRICS = [
+    ("throughput_rps", ("throughput_rps",)),
+    ("latency p50", ("latency", "p50")),
+    ("latency p95", ("latency", "p95")),
+    ("latency p99", ("latency", "p99")),
+    ("loop lag p99", ("event_loop_lag", "p99")),
+    ("loop lag max", ("event_loop_lag", "max")),
+    ("peak_rss_mb", ("peak_rss_mb",)),
+]
+
+
+def lookup(results: dict, path: tuple) -> float:
+    for key in path:
+        results = results.get(key, {})
+    return results if isinstance(results, (int, float)) else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"{'metric':<16}{'baseline':>12}{'candidate':>12}{'change':>10}")
+    for name, path in METRICS:
+        before, after = lookup(baseline, path), lookup(candidate, path)
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"{name:<16}{before:>12.3f}{after:>12.3f}{change:>10}")
+    print(f"{'errors':<16}{sum(baseline.get('errors', {}).values()):>12}{sum(candidate.get('errors', {}).values()):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Cold start profile: how long `import app` and the lifespan startup take, and which
+packages the import time goes to (from `python -X importtime`).
+
+Every measurement runs in a fresh interpreter. Startup uses the `openai` backend, which
+builds its clients without a network call or API token.
+
+Results are compared against benchmarks/baselines/import_time.json, and the script exits
+with 1 when import or startup got slower than --max-regression allows. Timings depend on
+the machine, so regenerate the baseline with --update-baseline where the check runs.
+
+Usage:
+    python -m benchmarks.import_time --runs 5
+    python -m benchmarks.import_time --baseline other.json --max-regression 0.3
+    python -m benchmarks.import_time --update-baseline
+"""
+from collections import defaultdict
+from typing import Any, Dict, List
+import statistics
+import subprocess
+import platform
+import argparse
+import json
+import sys
+import os
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baselines", "import_time.json")
+
+IMPORT_SCRIPT = """
+import time
+started = time.perf_counter()
+import app
+print(time.perf_counter() - started)
+"""
+
+STARTUP_SCRIPT = """
+import time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.build_agents()
+print(imported - started, time.perf_counter() - started)
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "LLM_BACKEND": "openai",
+        "LLM_MODEL": "benchmark",
+        "LLM_BASE_URL": "http://127.0.0.1:9/v1",
+        "LOG_LEVEL": "WARNING",
+        "FEEDBACK_DIR": env.get("FEEDBACK_DIR", "/tmp/benchmark-feedback"),
+    })
+    return env
+
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    result = subprocess.run([sys.executable, *args], cwd=REPO_ROOT, env=_env(), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Profiling run failed:\n{result.stderr[-2000:]}")
+    return result
+
+
+def import_profile(top: int) -> Dict[str, float]:
+    """Self time per top-level package in milliseconds, from one `-X importtime` run"""
+    result = _run(["-X", "importtime", "-c", "import app"])
+    per_package: Dict[str, int] = defaultdict(int)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, _, name = line[len("import time:"):].split("|")
+            per_package[name.strip().split(".")[0]] += int(self_us)
+        except ValueError:
+            continue
+    ranked = sorted(per_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {package: round(us / 1000, 1) for package, us in ranked}
+
+
+def measure(runs: int, top: int) -> Dict[str, Any]:
+    import_seconds = [float(_run(["-c", IMPORT_SCRIPT]).stdout.split()[-1]) for _ in range(runs)]
+    startup = [_run(["-c", STARTUP_SCRIPT]).stdout.split()[-2:] for _ in range(runs)]
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "runs": runs,
+        "import_seconds": statistics.median(import_seconds),
+        "startup_seconds": statistics.median(float(total) for _, total in startup),
+        "import_ms_by_package": import_profile(top),
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> bool:
+    ok = True
+    for key in ("import_seconds", "startup_seconds"):
+        before, after = baseline.get(key), results[key]
+        if not before:
+            continue
+        change = (after - before) / before
+        status = "REGRESSION" if change > max_regression else "ok"
+        ok = ok and status == "ok"
+        print(f"{key:<18}{before:>8.3f}s -> {after:>8.3f}s {change:+.1%}  {status}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Profile the app's import and startup time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Packages to list in the import profile")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Result file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed slowdown against the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results to the baseline file instead of comparing")
+    args = parser.parse_args()
+
+    results = measure(args.runs, args.top)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --update-baseline to create one", file=sys.stderr)
+        sys.exit(1)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if not compare(results, baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Iterations, LLM calls, tool calls and seconds saved by the loop guard on a model that repeats itself.
+
+Runs job queries through the chat agent with a stub model that searches again instead of
+answering, once with the loop guard off and once on. "stubborn" keeps repeating the same
+search whatever the observation says, "heeds" writes its final answer once it is told the
+result is a repeat. Without the guard both run until max_iterations. Iterations are the
+executor's agent steps, each one LLM call and, unless answered by the guard, one tool call.
+
+Usage:
+    python -m benchmarks.loop_guard --queries 10 --llm-latency 0.3 --tool-latency 0.2
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import tempfile
+import time
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stubs import JOB_ACTION, StubLLM, build_stub_tools
+from benchmarks.run_benchmark import QUERIES
+
+HINT_MARKER = "[Note: you already ran"
+
+
+class LoopingLLM(StubLLM):
+    """Searches for jobs again after every observation, optionally until told it is a repeat"""
+
+    heed_hint: bool = False
+    calls: int = 0
+
+    def _respond(self, prompt: str) -> str:
+        self.calls += 1
+        turn = prompt.rsplit("Human:", 1)[-1]
+        if "Observation:" in turn and self.heed_hint and HINT_MARKER in turn.rsplit("Observation:", 1)[-1]:
+            return super()._respond(prompt.replace(HINT_MARKER, ""))
+        lines = [line.strip() for line in turn.strip().split("\n") if line.strip() and not line.startswith("[Current UTC")]
+        return JOB_ACTION.format(query=lines[0] if lines else "")
+
+
+def load_app(args: argparse.Namespace, llm: LoopingLLM):
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["SPECULATIVE_TOOLS"] = "false"
+    os.environ["FAST_PATH_ENABLED"] = "false"
+    os.environ.setdefault("SERPAPI_API_KEY", "benchmark")
+    os.environ["LLM_BACKEND"] = "stub"
+    os.environ["ROLE_PROFILE_DIR"] = tempfile.mkdtemp(prefix="loop-guard-role-profiles-")
+    os.environ["PDP_RENDER_CACHE_DIR"] = tempfile.mkdtemp(prefix="loop-guard-pdp-exports-")
+
+    from inference import register_backend
+    register_backend("stub", lambda config: llm)
+
+    import app as app_module
+    app_module.tools = build_stub_tools(args.tool_latency)
+    app_module.build_agents()
+    return app_module
+
+
+def run(app_module, llm: LoopingLLM, queries: List[str], guard: bool) -> Dict[str, Any]:
+    from loop_guard import loop_guard_stats
+
+    executor = app_module.agent_executor
+    executor.guard_enabled = guard
+    before = loop_guard_stats.stats().get("chat", {})
+    llm.calls = 0
+    steps = 0
+    started = time.perf_counter()
+    for query in queries:
+        app_module.memory.clear()
+        response = executor.invoke({"input": query})
+        steps += len(response.get("intermediate_steps", []))
+    elapsed = time.perf_counter() - started
+
+    after = loop_guard_stats.stats().get("chat", {})
+    delta = {key: after.get(key, 0) - before.get(key, 0) for key in after}
+    repeats = delta.get("exact_repeats", 0) + delta.get("near_repeats", 0)
+    return {
+        "iterations": steps,
+        "llm_calls": llm.calls,
+        "tool_calls": steps - repeats,
+        "seconds": elapsed,
+        "guard": delta,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare agent runs with and without the loop guard")
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds per stub LLM call")
+    parser.add_argument("--tool-latency", type=float, default=0.2, help="Seconds per stub tool call")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    llm = LoopingLLM(latency=args.llm_latency)
+    app_module = load_app(args, llm)
+    job_queries = [query for query in QUERIES if "jobs" in query]
+    queries = [job_queries[i % len(job_queries)] for i in range(args.queries)]
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for behaviour in ("stubborn", "heeds"):
+        llm.heed_hint = behaviour == "heeds"
+        results[behaviour] = {"off": run(app_module, llm, queries, False), "on": run(app_module, llm, queries, True)}
+
+    print(f"{'':<22}{'off':>10}{'on':>10}{'saved':>10}")
+    for behaviour, modes in results.items():
+        print(behaviour)
+        for metric in ("iterations", "llm_calls", "tool_calls", "seconds"):
+            off, on = modes["off"][metric], modes["on"][metric]
+            saved: Optional[float] = 1 - on / off if off else None
+            print(f"  {metric:<20}{off:>10.1f}{on:>10.1f}{saved:>10.0%}" if saved is not None else f"  {metric:<20}{off:>10.1f}{on:>10.1f}")
+        print(f"  {'reported by guard':<20}{modes['on']['guard']['iterations_saved']:>10} iterations, {modes['on']['guard']['seconds_saved']:.1f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Size and signal of visit_webpage observations with and without main-content extraction.
+
+Converts every saved page in benchmarks/fixtures/pages the old way (the whole page through
+markdownify) and through tools.readability, and reports characters, tokens and extraction
+time per page, whether the facts listed in expected.json survived and how much of the
+listed boilerplate was left in. Exits with 1 when extraction loses an expected fact.
+
+Usage:
+    python -m benchmarks.page_extraction
+"""
+from typing import Any, Dict, List
+import statistics
+import argparse
+import time
+import json
+import sys
+import os
+import re
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.tokens import count_tokens, load_tokenizer
+from tools.readability import extract_page
+import markdownify
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pages")
+
+
+def full_markdown(html: str) -> str:
+    """What visit_webpage returned before extraction, minus its truncation"""
+    return re.sub(r"\n{3,}", "\n\n", markdownify.markdownify(html).strip())
+
+
+def measure(text: str, expected: Dict[str, List[str]]) -> Dict[str, Any]:
+    return {
+        "chars": len(text),
+        "tokens": count_tokens(text),
+        "missing": [fact for fact in expected["must_contain"] if fact not in text],
+        "boilerplate": [phrase for phrase in expected["must_not_contain"] if phrase in text],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare full-page and main-content observations on saved pages")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--rounds", type=int, default=20, help="Extractions per page, for timing")
+    parser.add_argument("--show", help="Print the extracted markdown of this page")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+    # The app loads it at startup; here token counts are what is being measured
+    load_tokenizer()
+
+    with open(os.path.join(args.fixtures, "expected.json")) as f:
+        manifest = json.load(f)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, expected in manifest.items():
+        with open(os.path.join(args.fixtures, name), encoding="utf-8") as f:
+            html = f.read()
+        timings = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            page = extract_page(html)
+            timings.append(time.perf_counter() - started)
+        extracted = page.to_markdown()
+        if args.show == name:
+            print(extracted)
+        results[name] = {
+            "method": page.method,
+            "full": measure(full_markdown(html), expected),
+            "extracted": measure(extracted, expected),
+            "extraction_ms": statistics.median(timings) * 1000,
+        }
+
+    print(f"{'page':<26}{'method':<13}{'full tok':>9}{'extr tok':>9}{'saved':>7}{'facts':>7}{'boilerplate':>13}{'ms':>6}")
+    for name, result in results.items():
+        full, extracted = result["full"], result["extracted"]
+        facts = len(manifest[name]["must_contain"])
+        print(
+            f"{name:<26}{result['method']:<13}{full['tokens']:>9}{extracted['tokens']:>9}"
+            f"{1 - extracted['tokens'] / full['tokens']:>7.0%}{facts - len(extracted['missing']):>4}/{facts:<2}"
+            f"{len(full['boilerplate']):>6} -> {len(extracted['boilerplate']):<3}{result['extraction_ms']:>6.1f}"
+        )
+        for fact in extracted["missing"]:
+            print(f"  missing: {fact}")
+        for phrase in extracted["boilerplate"]:
+            print(f"  boilerplate left: {phrase}")
+
+    full_tokens = sum(result["full"]["tokens"] for result in results.values())
+    extracted_tokens = sum(result["extracted"]["tokens"] for result in results.values())
+    print(f"\ntotal tokens {full_tokens} -> {extracted_tokens} ({1 - extracted_tokens / full_tokens:.0%} saved)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if any(result["extracted"]["missing"] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
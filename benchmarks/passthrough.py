@@ -0,0 +1,71 @@
+"""
+Output tokens and latency saved on job queries by splicing tool results into final answers.
+
+Runs the end-to-end benchmark on job search queries only, once with TOOL_PASSTHROUGH off
+(the model copies the listings) and once with it on (the model writes a handle). The stub
+LLM charges a fixed latency per call plus a latency per output token, which is what makes
+copying listings expensive on a real 70B endpoint.
+
+Usage:
+    python -m benchmarks.passthrough --requests 40 --llm-token-latency 0.03
+"""
+from typing import Any, Dict
+import subprocess
+import argparse
+import json
+import sys
+import os
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(passthrough: bool, args: argparse.Namespace) -> Dict[str, Any]:
+    env = dict(os.environ, TOOL_PASSTHROUGH="true" if passthrough else "false", LOG_LEVEL="WARNING")
+    command = [
+        sys.executable, "-m", "benchmarks.run_benchmark",
+        "--requests", str(args.requests),
+        "--concurrency", str(args.concurrency),
+        "--llm-latency", str(args.llm_latency),
+        "--llm-token-latency", str(args.llm_token_latency),
+        "--tool-latency", str(args.tool_latency),
+        "--query-weight", "1", "--pdp-weight", "0", "--feedback-weight", "0",
+        "--job-queries-only",
+    ]
+    result = subprocess.run(command, cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark run failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare job queries with and without tool output passthrough")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds per stub LLM call")
+    parser.add_argument("--llm-token-latency", type=float, default=0.03, help="Seconds per output token, ~33 tokens/s")
+    parser.add_argument("--tool-latency", type=float, default=0.2)
+    parser.add_argument("--output", help="Write both results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {"copy": run(False, args), "passthrough": run(True, args)}
+    for mode, result in results.items():
+        errors = sum(result["errors"].values())
+        if errors:
+            raise SystemExit(f"{mode} run had {errors} errors: {result['error_samples']}")
+
+    copy, passthrough = results["copy"], results["passthrough"]
+    tokens_per_query = {mode: result["llm_output_tokens"] / args.requests for mode, result in results.items()}
+    print(f"{'':<28}{'copy':>12}{'passthrough':>14}{'saved':>10}")
+    print(f"{'output tokens per query':<28}{tokens_per_query['copy']:>12.0f}{tokens_per_query['passthrough']:>14.0f}"
+          f"{1 - tokens_per_query['passthrough'] / tokens_per_query['copy']:>10.0%}")
+    for pct in ("p50", "p95"):
+        before, after = copy["latency"][pct], passthrough["latency"][pct]
+        print(f"{'latency ' + pct + ' (s)':<28}{before:>12.2f}{after:>14.2f}{1 - after / before:>10.0%}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Check that the agent prompt keeps a byte-identical prefix across requests and report how
+long that cache-friendly prefix is.
+
+Two requests are rendered for each layout, with different messages, chat history and
+clock times, as if they had hit different replicas at different times. Exits non-zero if
+the stable layout does not share the whole system prompt with tool specs, or if its shared
+prefix got shorter than in benchmarks/baselines/prompt_prefix.json. After an intended
+prompt change, rewrite the baseline with --update-baseline.
+
+Usage:
+    python -m benchmarks.prompt_prefix
+    python -m benchmarks.prompt_prefix --update-baseline
+"""
+from typing import Any, Dict, List
+import argparse
+import json
+import sys
+import os
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baselines", "prompt_prefix.json")
+
+sys.path.insert(0, REPO_ROOT)
+
+
+def common_prefix_length(first: str, second: str) -> int:
+    length = 0
+    for a, b in zip(first, second):
+        if a != b:
+            break
+        length += 1
+    return length
+
+
+def render(app_module, layout: str, now: str, query: str, history: list) -> str:
+    app_module.utc_now = lambda: now
+    prompt = app_module.build_agent_prompt(layout)
+    return prompt.invoke({
+        "input": query,
+        "current_utc_date_and_time": now,
+        "chat_history": history,
+        "agent_scratchpad": "",
+    }).to_string()
+
+
+def measure(app_module, layout: str) -> Dict[str, Any]:
+    from langchain_core.messages import AIMessage, HumanMessage
+    from helpers.tokens import count_tokens
+
+    first = render(app_module, layout, "2025:01:01 09:00:00 UTC +0000", "Find python developer jobs in Berlin", [])
+    second = render(
+        app_module,
+        layout,
+        "2025:01:02 17:30:00 UTC +0000",
+        "How should I ask for a raise?",
+        [HumanMessage(content="Hi"), AIMessage(content="Hello! How can I help you with your career today?")],
+    )
+    system_prompt = app_module.build_agent_prompt(layout).messages[0].format().content
+    shared = common_prefix_length(first, second)
+    return {
+        "prompt_chars": len(first),
+        "shared_prefix_chars": shared,
+        "shared_prefix_tokens": count_tokens(first[:shared]),
+        "system_prompt_chars": len(system_prompt),
+        "system_prompt_shared": shared >= len("System: ") + len(system_prompt),
+    }
+
+
+def measure_layouts(app_module) -> Dict[str, Dict[str, Any]]:
+    original_utc_now = app_module.utc_now
+    try:
+        return {layout: measure(app_module, layout) for layout in ("legacy", "stable")}
+    finally:
+        app_module.utc_now = original_utc_now
+
+
+def regressions(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Why the stable layout is less cache-friendly than the system prompt or the baseline allow"""
+    stable = results["stable"]
+    problems = []
+    if not stable["system_prompt_shared"]:
+        problems.append("The stable layout does not keep the system prompt byte-identical across requests")
+    # Characters, not tokens: token counts are estimates when no tokenizer is installed
+    before = baseline.get("stable", {}).get("shared_prefix_chars")
+    if before and stable["shared_prefix_chars"] < before:
+        problems.append(f"The stable layout's shared prefix shrank from {before} to {stable['shared_prefix_chars']} characters")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check that the stable prompt layout keeps a shared prefix")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Result file to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results to the baseline file instead of comparing")
+    args = parser.parse_args()
+
+    os.chdir(REPO_ROOT)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import app as app_module
+    from helpers.tokens import load_tokenizer
+
+    # The app loads it at startup, which does not run here
+    load_tokenizer()
+
+    results = measure_layouts(app_module)
+    print(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    baseline: Dict[str, Dict[str, Any]] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    problems = regressions(results, baseline)
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
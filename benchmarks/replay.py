@@ -0,0 +1,189 @@
+"""
+Record an agent scenario into a cassette, then replay it offline as a regression suite and
+as a benchmark of the CPU side of the pipeline.
+
+`record` runs the scenario's chat queries and PDP requests through agent_executor and
+pdp_agent_executor with the configured models and tools (or the stubs with --stub), and
+stores every completion, every tool result and the final outcome of each step. `replay` runs
+the same steps with no model or API behind them: prompts are rebuilt, completions parsed by
+FlexibleOutputParser and PDPOutputParser, answers cleaned by clean_llm_response and PDPs
+validated exactly as in production. Any difference from the recorded outcome is a regression.
+
+A scenario is a JSON list of steps:
+    {"kind": "chat", "query": "...", "new_thread": true}
+    {"kind": "pdp", "career_goal": "...", "target_date": "...", "cv_text": "...", "additional_context": "..."}
+
+Usage:
+    python -m benchmarks.replay record --cassette cassettes/baseline.json
+    python -m benchmarks.replay replay --cassette cassettes/baseline.json --rounds 20
+
+Tool descriptions are part of every prompt, so a recording made with --stub is replayed with --stub.
+"""
+from typing import Any, Dict, List
+import argparse
+import tempfile
+import time
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def default_scenario() -> List[Dict[str, Any]]:
+    from benchmarks.run_benchmark import QUERIES, SAMPLE_CV
+
+    steps: List[Dict[str, Any]] = [{"kind": "chat", "query": query, "new_thread": True} for query in QUERIES]
+    # A follow-up in the same thread, so chat history is part of the prompt
+    steps.append({"kind": "chat", "query": "Which of these would suit someone who knows FastAPI?", "new_thread": False})
+    steps.append({
+        "kind": "pdp",
+        "career_goal": "Data Scientist",
+        "target_date": "2026-12-31",
+        "cv_text": "\n".join(SAMPLE_CV),
+        "additional_context": "Interested in healthcare",
+    })
+    return steps
+
+
+def load_app(mode: str, cassette_path: str, stub: bool):
+    """Import the app with the cassette switched on and build its agents without a server"""
+    os.environ["CASSETTE_MODE"] = mode
+    os.environ["CASSETTE_PATH"] = cassette_path
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Prefetched tool calls depend on timing, which a replay can't reproduce
+    os.environ["SPECULATIVE_TOOLS"] = "false"
+    os.environ["FAST_PATH_ENABLED"] = "false"
+    os.environ.setdefault("SERPAPI_API_KEY", "replay")
+    os.environ["ROLE_PROFILE_DIR"] = tempfile.mkdtemp(prefix="replay-role-profiles-")
+    os.environ["PDP_RENDER_CACHE_DIR"] = tempfile.mkdtemp(prefix="replay-pdp-exports-")
+
+    if stub:
+        from inference import register_backend
+        from benchmarks.stubs import build_stub_tools, stub_backend
+
+        os.environ["LLM_BACKEND"] = "stub"
+        register_backend("stub", stub_backend(0.0))
+
+    import app as app_module
+    if stub:
+        # Stub tools replace the real ones before the agents are built around them
+        app_module.tools = build_stub_tools(0.0)
+    app_module.build_agents()
+    return app_module
+
+
+def run_step(app_module, step: Dict[str, Any]) -> Dict[str, Any]:
+    """One scenario step through the same code path as its endpoint, minus HTTP"""
+    from output_parser import clean_llm_response, validate_pdp_response
+    from pdp_pipeline import build_pdp_query, finalize_pdp
+    from tools.passthrough import splice_observations
+
+    if step["kind"] == "chat":
+        if step.get("new_thread", True):
+            app_module.memory.clear()
+        response = app_module.agent_executor.invoke({"input": step["query"]})
+        steps = response.get("intermediate_steps", [])
+        output, _ = splice_observations(clean_llm_response(response.get("output", "")), steps)
+        return {"kind": "chat", "tools": [action.tool for action, _ in steps], "output": output}
+
+    app_module.memory.clear()
+    pdp_query = build_pdp_query(
+        career_goal=step["career_goal"],
+        target_date=step["target_date"],
+        cv_content=step["cv_text"],
+        additional_context=step.get("additional_context", "")
+    )
+    response = app_module.pdp_agent_executor.invoke({"input": pdp_query})
+    raw = response.get("output", "")
+    pdp, report = finalize_pdp(app_module.pdp_llm, pdp_query, raw, step["target_date"])
+    return {
+        "kind": "pdp",
+        "raw_valid": validate_pdp_response(raw),
+        "valid": report.valid,
+        "sections": [section.key or section.title for section in pdp.sections],
+        "output": pdp.to_markdown(),
+    }
+
+
+def record(args: argparse.Namespace, scenario: List[Dict[str, Any]]) -> None:
+    if os.path.exists(args.cassette) and not args.overwrite:
+        raise SystemExit(f"{args.cassette} exists, pass --overwrite to record it again")
+    if os.path.exists(args.cassette):
+        os.unlink(args.cassette)
+    app_module = load_app("record", args.cassette, args.stub)
+    from helpers.cassette import get_cassette
+
+    cassette = get_cassette()
+    for index, step in enumerate(scenario):
+        started = time.perf_counter()
+        result = run_step(app_module, step)
+        cassette.add_result({"step": step, "result": result})
+        print(f"recorded step {index + 1}/{len(scenario)} ({step['kind']}) in {time.perf_counter() - started:.2f}s")
+    print(f"{len(cassette.interactions)} interactions written to {args.cassette}")
+
+
+def replay(args: argparse.Namespace) -> int:
+    app_module = load_app("replay", args.cassette, args.stub)
+    from helpers.cassette import get_cassette
+    from benchmarks.run_benchmark import summarize
+
+    cassette = get_cassette()
+    regressions = []
+    wall: Dict[str, List[float]] = {"chat": [], "pdp": []}
+    cpu: Dict[str, List[float]] = {"chat": [], "pdp": []}
+    for round_number in range(args.rounds):
+        # Every round replays the recording from its start
+        cassette.rewind()
+        for index, recorded in enumerate(cassette.results):
+            step = recorded["step"]
+            started, cpu_started = time.perf_counter(), time.process_time()
+            try:
+                result = run_step(app_module, step)
+            except Exception as e:
+                result = {"error": f"{type(e).__name__}: {str(e)}"}
+            wall[step["kind"]].append(time.perf_counter() - started)
+            cpu[step["kind"]].append(time.process_time() - cpu_started)
+            if round_number == 0 and result != recorded["result"]:
+                changed = sorted(key for key in set(result) | set(recorded["result"]) if result.get(key) != recorded["result"].get(key))
+                regressions.append({"step": index + 1, "kind": step["kind"], "changed": changed, "replayed": result})
+
+    report = {
+        "cassette": args.cassette,
+        "steps": len(cassette.results),
+        "rounds": args.rounds,
+        "regressions": regressions,
+        "cassette_misses": cassette.misses,
+        "wall_seconds": {kind: summarize(values) for kind, values in wall.items() if values},
+        "cpu_seconds": {kind: summarize(values) for kind, values in cpu.items() if values},
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if regressions else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record agent runs into a cassette and replay them offline")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--cassette", default="cassettes/baseline.json")
+    parser.add_argument("--scenario", help="JSON file with the steps to record, a built-in mix by default")
+    parser.add_argument("--stub", action="store_true", help="Use the stub model and tools, to replay a recording made with --stub too")
+    parser.add_argument("--overwrite", action="store_true", help="Record over an existing cassette")
+    parser.add_argument("--rounds", type=int, default=10, help="Replays of the whole scenario, for timing")
+    parser.add_argument("--output", help="Write the replay report as JSON to this file")
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        scenario = default_scenario()
+        if args.scenario:
+            with open(args.scenario) as f:
+                scenario = json.load(f)
+        record(args, scenario)
+        return
+    sys.exit(replay(args))
+
+
+if __name__ == "__main__":
+    main()
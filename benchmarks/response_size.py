@@ -0,0 +1,73 @@
+"""
+Wire size of /agent/query responses with and without the inlined thought process, for each
+response encoding.
+
+Every benchmark query is sent through the app with the stub model and stub tools, once
+asking for the full thought process inline (the old response shape) and once without it,
+with Accept-Encoding set to identity, gzip and br in turn.
+
+Usage:
+    python -m benchmarks.response_size --rounds 5
+"""
+from typing import Any, Dict, List
+import argparse
+import time
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ENCODINGS = ["identity", "gzip", "br"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure /agent/query response sizes per encoding")
+    parser.add_argument("--rounds", type=int, default=5, help="Times each query is sent per configuration")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from benchmarks import run_benchmark
+    from fastapi.testclient import TestClient
+
+    bench_args = argparse.Namespace(llm_latency=0.0, llm_token_latency=0.0, tool_latency=0.0, fast_path=False)
+    app_module = run_benchmark.load_app(bench_args)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    with TestClient(app_module.app) as client:
+        run_benchmark.swap_tools(app_module, bench_args)
+        for inline in (True, False):
+            for encoding in ENCODINGS:
+                sizes: List[int] = []
+                seconds: List[float] = []
+                for _ in range(args.rounds):
+                    for query in run_benchmark.QUERIES:
+                        started = time.perf_counter()
+                        response = client.post(
+                            "/agent/query",
+                            json={"query": query, "include_thought_process": inline},
+                            headers={"Accept-Encoding": encoding},
+                        )
+                        seconds.append(time.perf_counter() - started)
+                        response.raise_for_status()
+                        sizes.append(response.num_bytes_downloaded)
+                results[f"{'inline' if inline else 'lazy'}/{encoding}"] = {
+                    "bytes_mean": sum(sizes) / len(sizes),
+                    "bytes_max": max(sizes),
+                    "seconds_p50": run_benchmark.percentile(seconds, 50),
+                }
+
+    baseline = results["inline/identity"]["bytes_mean"]
+    print(f"{'':<20}{'mean bytes':>12}{'max bytes':>12}{'vs inline':>11}{'p50 ms':>9}")
+    for name, result in results.items():
+        print(f"{name:<20}{result['bytes_mean']:>12.0f}{result['bytes_max']:>12}"
+              f"{result['bytes_mean'] / baseline:>11.0%}{result['seconds_p50'] * 1000:>9.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Facts kept and tokens sent by query-focused retrieval versus cutting a long page at 10,000 chars.
+
+Builds a long relocation guide with one section per country, then asks a question about a
+country for each section. The old visit_webpage returned the first 10,000 characters; the
+retrieval stage returns the lead and the chunks that match the question within
+RETRIEVAL_MAX_TOKENS. Reports how often the answer's facts reached the observation, the
+observation size, and the time to index the page and to answer a follow-up from the cached
+index.
+
+Usage:
+    python -m benchmarks.retrieval
+"""
+from typing import Dict, List, Tuple
+import statistics
+import argparse
+import time
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.tokens import count_tokens, load_tokenizer
+from tools.retrieval import RETRIEVAL_MAX_TOKENS, BM25Index, DocumentIndexCache, chunk_document, retrieve
+
+# Country, capital, median salary, visa, language, tax note
+COUNTRIES = [
+    ("Germany", "Berlin", "€62,000", "EU Blue Card", "German", "church tax of 8 to 9 percent for registered members"),
+    ("Netherlands", "Amsterdam", "€58,000", "highly skilled migrant permit", "Dutch", "the 30 percent ruling for recruited experts"),
+    ("Portugal", "Lisbon", "€38,000", "Tech Visa", "Portuguese", "the IFICI regime with a flat 20 percent rate"),
+    ("Spain", "Madrid", "€42,000", "Digital Nomad Visa", "Spanish", "the Beckham law with a flat 24 percent rate"),
+    ("Ireland", "Dublin", "€70,000", "Critical Skills Employment Permit", "English", "the Special Assignee Relief Programme"),
+    ("France", "Paris", "€55,000", "Talent Passport", "French", "the impatriate regime exempting part of the salary"),
+    ("Sweden", "Stockholm", "SEK 600,000", "work permit with a job offer", "Swedish", "expert tax relief on 25 percent of income"),
+    ("Denmark", "Copenhagen", "DKK 620,000", "Pay Limit Scheme", "Danish", "the researcher scheme with a 27 percent rate"),
+    ("Poland", "Warsaw", "PLN 240,000", "EU Blue Card", "Polish", "a flat 19 percent rate for sole traders on B2B contracts"),
+    ("Czech Republic", "Prague", "CZK 1,100,000", "Employee Card", "Czech", "flat-rate tax for freelancers up to a turnover limit"),
+    ("Austria", "Vienna", "€60,000", "Red-White-Red Card", "German", "a thirteenth and fourteenth monthly salary taxed at 6 percent"),
+    ("Switzerland", "Zurich", "CHF 120,000", "B permit from a non-EU quota", "German", "withholding tax at source for foreign nationals"),
+    ("Finland", "Helsinki", "€52,000", "specialist residence permit", "Finnish", "the key employee tax at a 32 percent flat rate"),
+    ("Estonia", "Tallinn", "€42,000", "Startup Visa", "Estonian", "a flat 22 percent income tax"),
+    ("Belgium", "Brussels", "€54,000", "single permit", "French or Dutch", "the expat regime exempting 30 percent of pay"),
+    ("Italy", "Milan", "€40,000", "EU Blue Card", "Italian", "the impatriate regime taxing half of income"),
+    ("Norway", "Oslo", "NOK 750,000", "skilled worker permit", "Norwegian", "a standard deduction of 10 percent for the first two years"),
+    ("Lithuania", "Vilnius", "€36,000", "Startup Visa", "Lithuanian", "a 20 percent flat income tax"),
+    ("Romania", "Bucharest", "RON 180,000", "EU Blue Card", "Romanian", "an exemption from income tax for software developers until 2023"),
+    ("Greece", "Athens", "€28,000", "Digital Nomad Visa", "Greek", "a 50 percent income tax reduction for seven years"),
+]
+
+SECTION = """## Working in {country}
+
+{country} has a growing technology sector centred on {city}, where most international companies and startups have their offices. Many teams work in English, although {language} helps with everyday life, public offices and promotion into management.
+
+The median gross salary for a software engineer with five years of experience in {country} is {salary} per year. Salaries in {city} are usually higher than in the rest of the country, and large companies pay more than startups, which often add stock options instead.
+
+Non-EU citizens usually apply for the {visa}. It requires a signed job offer, a recognised degree or equivalent experience, and in most cases a minimum salary; processing takes several weeks, so companies that hire internationally often start the paperwork before the start date.
+
+Newcomers should also know about {tax}. Ask the employer's HR team or a tax adviser in {city} whether it applies before signing a contract, because it can change the net salary considerably.
+
+Health insurance, pension contributions and unemployment insurance are deducted from the gross salary. Rent in {city} takes a large share of a junior salary, and furnished flats for newcomers are scarce, so start looking early and plan for a deposit of two to three months of rent.
+"""
+
+INTRO = """# Relocating to Europe as a Software Engineer: the Complete Guide
+
+This guide compares salaries, visas, languages and taxes for software engineers moving to the main technology hubs in Europe. Each country section covers the typical salary, the usual work permit for non-EU citizens, the language you need, and the tax rules that matter most for newcomers.
+
+Read the country sections you are considering, and use the comparison to plan your job search and your negotiation. Figures are medians for engineers with about five years of experience and were collected from salary surveys and job ads.
+"""
+
+QUESTIONS = [
+    "What is the typical software engineer salary in {country} and which visa would I need?",
+    "Do I need to speak {language} to work in {city}, and what tax rules apply to newcomers in {country}?",
+]
+
+
+def build_document() -> str:
+    sections = [SECTION.format(country=c, city=city, salary=s, visa=v, language=l, tax=t) for c, city, s, v, l, t in COUNTRIES]
+    return INTRO + "\n" + "\n".join(sections)
+
+
+def cases() -> List[Tuple[str, List[str]]]:
+    result = []
+    for country, city, salary, visa, language, tax in COUNTRIES:
+        result.append((QUESTIONS[0].format(country=country), [salary, visa]))
+        result.append((QUESTIONS[1].format(country=country, language=language, city=city), [tax]))
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare truncation and query-focused retrieval on a long page")
+    parser.add_argument("--max-tokens", type=int, default=RETRIEVAL_MAX_TOKENS)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+    # The app loads it at startup; here token counts are what is being measured
+    load_tokenizer()
+
+    document = build_document()
+    truncated = document[:10000]
+    build_times = []
+    for _ in range(5):
+        started = time.perf_counter()
+        index = BM25Index(chunk_document(document, source="guide"))
+        build_times.append(time.perf_counter() - started)
+
+    cache = DocumentIndexCache()
+    cache.put("https://example.com/guide", index)
+    results: Dict[str, Dict[str, List[float]]] = {"truncation": {"found": [], "tokens": []}, "retrieval": {"found": [], "tokens": []}}
+    followup_times = []
+    for question, facts in cases():
+        started = time.perf_counter()
+        cached, _ = cache.get_or_build("webpage", "https://example.com/guide", lambda: index)
+        observation = retrieve("webpage", cached, question, max_tokens=args.max_tokens)
+        followup_times.append(time.perf_counter() - started)
+        for mode, text in (("truncation", truncated), ("retrieval", observation)):
+            results[mode]["found"].append(sum(fact in text for fact in facts) / len(facts))
+            results[mode]["tokens"].append(count_tokens(text))
+
+    print(f"document: {len(document)} chars, {count_tokens(document)} tokens, {len(index.chunks)} chunks, {len(cases())} questions")
+    print(f"{'':<14}{'facts found':>12}{'tokens':>9}")
+    for mode, values in results.items():
+        print(f"{mode:<14}{statistics.mean(values['found']):>12.0%}{statistics.mean(values['tokens']):>9.0f}")
+    print(f"index build {statistics.median(build_times) * 1000:.1f} ms, cached follow-up {statistics.median(followup_times) * 1000:.2f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results, "build_seconds": build_times, "followup_seconds": followup_times}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+End-to-end load test of the FastAPI app with a stub LLM and stub tools.
+
+The real app is imported and served by uvicorn in a background thread, with the model
+backend swapped for a deterministic stub of configurable latency and the tools swapped for
+canned ones, so runs are repeatable and cost nothing. A mix of /agent/query (direct and job
+questions), /pdp-generator and /agent/feedback requests is sent at a fixed concurrency.
+
+Usage:
+    python -m benchmarks.run_benchmark --concurrency 8 --requests 200 --output results.json
+"""
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import tempfile
+import resource
+import random
+import socket
+import threading
+import time
+import json
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUERIES = [
+    "How do I prepare for a system design interview?",
+    "What skills do I need to move from backend development into data science?",
+    "Find me python developer jobs in Berlin",
+    "Show me data scientist jobs in Munich",
+    "How should I ask for a raise after my first year?",
+]
+
+SAMPLE_CV = [
+    "Jane Doe - Senior Backend Developer",
+    "Experience: 5 years of Python, SQL and REST API development at a fintech company.",
+    "Led the migration of a monolith to microservices and mentored two junior developers.",
+    "Education: BSc Computer Science, coursework in statistics and linear algebra.",
+    "Skills: Python, FastAPI, PostgreSQL, Docker, Kubernetes, basic pandas.",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (app and load generator share it)"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+
+
+def build_cv_pdf() -> bytes:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    y = 800
+    for line in SAMPLE_CV:
+        pdf.drawString(50, y, line)
+        y -= 20
+    pdf.save()
+    return buffer.getvalue()
+
+
+def llm_output_tokens() -> float:
+    """Output tokens of all LLM calls so far, from the app's Prometheus counter"""
+    from helpers.metrics import LLM_TOKENS
+
+    return sum(
+        sample.value for metric in LLM_TOKENS.collect() for sample in metric.samples
+        if sample.name == "llm_tokens_total" and sample.labels.get("direction") == "out"
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def load_app(args: argparse.Namespace):
+    """Import the app with the stub backend registered"""
+    os.environ["LLM_BACKEND"] = "stub"
+    os.environ.setdefault("SERPAPI_API_KEY", "benchmark")
+    os.environ["FEEDBACK_DIR"] = tempfile.mkdtemp(prefix="benchmark-feedback-")
+    os.environ["ROLE_PROFILE_DIR"] = tempfile.mkdtemp(prefix="benchmark-role-profiles-")
+    os.environ["PDP_RENDER_CACHE_DIR"] = tempfile.mkdtemp(prefix="benchmark-pdp-exports-")
+    os.environ["FAST_PATH_ENABLED"] = "true" if args.fast_path else "false"
+
+    from inference import register_backend
+    from benchmarks.stubs import stub_backend
+
+    register_backend("stub", stub_backend(args.llm_latency, args.llm_token_latency))
+
+    import app as app_module
+    return app_module
+
+
+def swap_tools(app_module, args: argparse.Namespace) -> None:
+    """Replace the agents' tools with stubs, once the lifespan hook has built the executors"""
+    from benchmarks.stubs import build_stub_tools
+    from tools.passthrough import wrap_tools as wrap_passthrough_tools
+
+    stub_tools = build_stub_tools(args.tool_latency)
+    chat_tools = wrap_passthrough_tools(stub_tools) if app_module.TOOL_PASSTHROUGH_ENABLED else stub_tools
+    if app_module.speculative_prefetcher:
+        chat_tools = app_module.speculative_prefetcher.wrap_tools(chat_tools)
+    app_module.agent_executor.tools = chat_tools
+    app_module.pdp_agent_executor.tools = stub_tools
+    app_module.pdp_batch_executor.tools = stub_tools
+
+
+class LagMonitor:
+    """Measures how late a periodic callback runs on the server's event loop"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._stopped = False
+
+    async def run(self) -> None:
+        while not self._stopped:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - expected))
+
+    def stop(self) -> None:
+        self._stopped = True
+
+
+def start_server(app, port: int, monitor: LagMonitor):
+    import uvicorn
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+    server = uvicorn.Server(config)
+
+    async def serve() -> None:
+        asyncio.get_running_loop().create_task(monitor.run())
+        await server.serve()
+
+    thread = threading.Thread(target=lambda: asyncio.run(serve()), daemon=True)
+    thread.start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline or not thread.is_alive():
+            raise RuntimeError("Benchmark server did not start")
+        time.sleep(0.05)
+    return server, thread
+
+
+async def send(client, kind: str, cv_pdf: bytes, rng: random.Random, queries: List[str]) -> None:
+    if kind == "query":
+        response = await client.post("/agent/query", json={"query": rng.choice(queries)})
+    elif kind == "pdp":
+        response = await client.post(
+            "/pdp-generator",
+            files={"file": ("cv.pdf", cv_pdf, "application/pdf")},
+            data={
+                "career_goal": "Data Scientist",
+                "additional_context": "Interested in healthcare",
+                "target_date": "2026-12-31",
+            },
+        )
+    else:
+        response = await client.post("/agent/feedback", params={"contact": "bench@example.com", "feedback": "Great"})
+    if response.status_code != 200:
+        raise RuntimeError(f"{kind} returned {response.status_code}: {response.text[:200]}")
+    if kind == "query" and response.json().get("status") != "success":
+        raise RuntimeError(f"query failed: {response.text[:200]}")
+
+
+async def drive(base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    rng = random.Random(args.seed)
+    weights = {"query": args.query_weight, "pdp": args.pdp_weight, "feedback": args.feedback_weight}
+    kinds = rng.choices(list(weights), weights=list(weights.values()), k=args.requests)
+    cv_pdf = build_cv_pdf()
+    queries = [query for query in QUERIES if "jobs" in query] if args.job_queries_only else QUERIES
+
+    latencies: Dict[str, List[float]] = {kind: [] for kind in weights}
+    errors: Dict[str, int] = {kind: 0 for kind in weights}
+    error_samples: List[str] = []
+    queue: asyncio.Queue = asyncio.Queue()
+    for kind in kinds:
+        queue.put_nowait(kind)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+        async def worker() -> None:
+            while not queue.empty():
+                kind = queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    await send(client, kind, cv_pdf, rng, queries)
+                    latencies[kind].append(time.perf_counter() - started)
+                except Exception as e:
+                    errors[kind] += 1
+                    if len(error_samples) < 5:
+                        error_samples.append(str(e))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "elapsed_seconds": elapsed,
+        "throughput_rps": len(all_latencies) / elapsed if elapsed else 0.0,
+        "latency": summarize(all_latencies),
+        "latency_by_endpoint": {kind: summarize(values) for kind, values in latencies.items()},
+        "errors": errors,
+        "error_samples": error_samples,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the app with a stub LLM and stub tools")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per stub LLM call")
+    parser.add_argument("--llm-token-latency", type=float, default=0.0, help="Extra seconds per output token of the stub LLM")
+    parser.add_argument("--tool-latency", type=float, default=0.2, help="Seconds per stub tool call")
+    parser.add_argument("--query-weight", type=float, default=0.7)
+    parser.add_argument("--pdp-weight", type=float, default=0.2)
+    parser.add_argument("--feedback-weight", type=float, default=0.1)
+    parser.add_argument("--fast-path", action="store_true", help="Keep the fast path router enabled")
+    parser.add_argument("--job-queries-only", action="store_true", help="Only send job search queries to /agent/query")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    app_module = load_app(args)
+    monitor = LagMonitor()
+    port = free_port()
+    server, thread = start_server(app_module.app, port, monitor)
+    swap_tools(app_module, args)
+
+    try:
+        results = asyncio.run(drive(f"http://127.0.0.1:{port}", args))
+    finally:
+        monitor.stop()
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    results["config"] = {key: value for key, value in vars(args).items() if key != "output"}
+    results["peak_rss_mb"] = peak_rss_mb()
+    results["event_loop_lag"] = summarize(monitor.lags)
+    results["llm_output_tokens"] = llm_output_tokens()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+from langchain_core.language_models.llms import LLM
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.tools import BaseTool, tool
+from helpers.tokens import count_tokens
+from tools.passthrough import HANDLE_PATTERN
+from typing import Any, Dict, List, Optional
+import time
+
+JOB_ACTION = """Thought: The user wants job postings, I should search Google Jobs.
+Action: google_job_search
+Action Input: {query}"""
+
+JOB_FINAL_ANSWER = """Final Answer: Here are the job postings I found for you:
+
+{observation}"""
+
+JOB_DESCRIPTION = (
+    "Design, build and run the backend services behind our hiring platform. You will own APIs end to end, "
+    "from data model to deployment."
+)
+
+DIRECT_ANSWER = """Final Answer: A good next step is to list the skills the target role needs, compare them with your current experience and plan one concrete learning goal per month. Focus on projects you can show in interviews."""
+
+PDP_RESPONSE = """## Current Skills Assessment
+- Solid Python and SQL from five years of backend development
+- Experience with REST APIs, code review and mentoring junior developers
+- Basic statistics from university coursework
+
+## Skills Gap Analysis
+- Machine learning fundamentals: supervised learning, model evaluation
+- Data wrangling at scale with pandas and Spark
+- Experiment design and communication of results to stakeholders
+
+## Learning Objectives and Milestones
+1. Complete an introductory machine learning course by month 2
+2. Publish two end-to-end portfolio projects by month 5
+3. Present an internal analytics project to stakeholders by month 8
+
+## Recommended Training and Development
+- Andrew Ng's Machine Learning Specialization (Coursera)
+- "Hands-On Machine Learning" by Aurélien Géron
+- Kaggle competitions for practice with real datasets
+
+## Timeline and Action Steps
+- Months 1-2: Machine learning fundamentals, 6 hours per week
+- Months 3-5: Portfolio projects and code reviews with a mentor
+- Months 6-8: Internal project, networking and first applications
+- Months 9-12: Interviews and transition into the target role
+
+## Progress Tracking and KPIs
+- Courses completed and certificates earned
+- Number of portfolio projects published with documentation
+- Interviews secured per month and feedback received
+"""
+
+ROLE_PROFILE = """### Required Skills
+- Python, SQL and statistics
+- Machine learning fundamentals and model evaluation
+
+### Certifications
+- Google Professional Data Engineer
+
+### Recommended Resources
+- "Hands-On Machine Learning" by Aurélien Géron
+"""
+
+
+class StubLLM(LLM):
+    """
+    Deterministic stand-in for the 70B model with a configurable latency.
+
+    Job questions get a google_job_search action and, once the observation is in the
+    scratchpad, a final answer that repeats it. PDP requests get a fixed, valid PDP, role
+    analyses a fixed role profile and everything else a short direct answer.
+    """
+
+    latency: float = 0.5
+    token_latency: float = 0.0  # Extra seconds per output token, to model decoding time
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        response = self._respond(prompt)
+        time.sleep(self.latency + self.token_latency * count_tokens(response))
+        return response
+
+    def _respond(self, prompt: str) -> str:
+        turn = prompt.rsplit("Human:", 1)[-1]
+
+        if "Describe what the role" in turn:
+            return ROLE_PROFILE
+        if "Personal Development Plan" in turn:
+            return PDP_RESPONSE
+        if "Observation:" in turn:
+            observation = turn.rsplit("Observation:", 1)[-1].split("\nThought:")[0].strip()
+            # Follow the prompt: a passthrough handle replaces the copied listings
+            handle = HANDLE_PATTERN.search(observation)
+            if handle:
+                return JOB_FINAL_ANSWER.format(observation=handle.group(0))
+            return JOB_FINAL_ANSWER.format(observation=observation)
+        if "job" in turn.lower():
+            # Skip the timestamp line the stable prompt layout puts in front of the message
+            lines = [line.strip() for line in turn.strip().split("\n") if not line.startswith("[Current UTC")]
+            query = lines[0] if lines else ""
+            return JOB_ACTION.format(query=query)
+        return DIRECT_ANSWER
+
+
+def build_stub_tools(latency: float = 0.2) -> List[BaseTool]:
+    """Tools with the same names as the real ones that sleep and return canned results"""
+
+    @tool
+    def visit_webpage(url: str) -> str:
+        """Visits a webpage at the given url and reads its content as a markdown string."""
+        time.sleep(latency)
+        return f"# Page at {url}\n\nCareer advice and open positions."
+
+    @tool
+    def wikipedia_search(topic: str) -> str:
+        """Useful for when you need to look up a topic on wikipedia."""
+        time.sleep(latency)
+        return f"Page: {topic}\nSummary: {topic} is a well documented topic."
+
+    @tool
+    def run_python_code(code: str) -> str:
+        """Runs Python code and returns the output."""
+        time.sleep(latency)
+        return "42"
+
+    @tool
+    def internet_search(query: str) -> str:
+        """Performs an internet search using DuckDuckGo."""
+        time.sleep(latency)
+        return f"snippet: Results about {query}, title: Search results, link: https://example.com"
+
+    @tool
+    def google_job_search(query: str) -> str:
+        """Performs a search for actual jobs and job posts in internet using Google jobs tool."""
+        time.sleep(latency)
+        listings = [f"Found 10 job results for '{query}':\n"]
+        for i in range(1, 11):
+            listings.append(
+                f"{i}. **Software Engineer {i}**\n   Company: Company {i}\n   Location: Berlin, Germany\n"
+                f"   Apply: https://example.com/jobs/{i}\n   Description: {JOB_DESCRIPTION}\n\n"
+            )
+        return "".join(listings)
+
+    @tool
+    def current_date_and_time(timezone: str) -> str:
+        """Get current date and time based on the timezone"""
+        return "2025:01:01 12:00:00 UTC +0000"
+
+    return [visit_webpage, wikipedia_search, run_python_code, internet_search, google_job_search, current_date_and_time]
+
+
+def stub_backend(latency: float, token_latency: float = 0.0):
+    """Backend factory for inference.register_backend"""
+    def build(config: Dict[str, Any]) -> StubLLM:
+        return StubLLM(latency=latency, token_latency=token_latency)
+    return build
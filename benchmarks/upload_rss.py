@@ -0,0 +1,145 @@
+"""
+Peak memory of the server while it receives concurrent large CV uploads on /pdp-generator.
+
+The app runs in its own process with the stub model, so its peak RSS (VmHWM) is not mixed
+up with the load generator's buffers. Every upload is a valid one-page CV padded to the
+requested size with an embedded attachment, streamed from disk by the client. One upload
+over the size limit checks that it is rejected before its body is read.
+
+Usage:
+    python -m benchmarks.upload_rss --uploads 8 --size-mb 19
+"""
+from typing import Any, Dict, List
+import subprocess
+import argparse
+import tempfile
+import asyncio
+import time
+import json
+import sys
+import os
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    values = {}
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key, value = line.split(":", 1)
+                values[key] = int(value.split()[0]) / 1024
+    return {"rss_mb": values["VmRSS"], "peak_rss_mb": values["VmHWM"]}
+
+
+def build_padded_cv(path: str, size_bytes: int) -> None:
+    """The benchmark CV with an attachment of random bytes, so the file is size_bytes long"""
+    from benchmarks.run_benchmark import build_cv_pdf
+    from pypdf import PdfReader, PdfWriter
+    import io
+
+    writer = PdfWriter()
+    writer.append(PdfReader(io.BytesIO(build_cv_pdf())))
+    # Random bytes do not compress, so the attachment adds its full size
+    writer.add_attachment("padding.bin", os.urandom(max(0, size_bytes - 4096)))
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def serve(port: int) -> None:
+    """Run the app with the stub backend until killed (the --serve mode of this script)"""
+    from benchmarks import run_benchmark
+
+    args = argparse.Namespace(llm_latency=0.05, llm_token_latency=0.0, tool_latency=0.01, fast_path=False)
+    app_module = run_benchmark.load_app(args)
+    monitor = run_benchmark.LagMonitor()
+    run_benchmark.start_server(app_module.app, port, monitor)
+    run_benchmark.swap_tools(app_module, args)
+    print("ready", flush=True)
+    while True:
+        time.sleep(3600)
+
+
+async def upload(client, path: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        response = await client.post(
+            "/pdp-generator",
+            files={"file": ("cv.pdf", f, "application/pdf")},
+            data={"career_goal": "Data Scientist", "target_date": "2026-12-31"},
+        )
+    return {"status": response.status_code, "seconds": time.perf_counter() - started, "detail": response.text[:200] if response.status_code != 200 else ""}
+
+
+async def drive(base_url: str, cv_path: str, oversized_path: str, uploads: int) -> Dict[str, Any]:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        results: List[Dict[str, Any]] = await asyncio.gather(*(upload(client, cv_path) for _ in range(uploads)))
+        started = time.perf_counter()
+        try:
+            oversized = await upload(client, oversized_path)
+        except httpx.TransportError:
+            # The 413 went out and the connection was closed while the client was still sending
+            oversized = {"status": "closed before the body was read", "seconds": time.perf_counter() - started}
+    return {"uploads": results, "oversized": oversized}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure server memory under concurrent large CV uploads")
+    parser.add_argument("--uploads", type=int, default=8, help="Concurrent uploads")
+    parser.add_argument("--size-mb", type=float, default=19, help="Size of each upload, below PDP_MAX_CV_BYTES")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    from benchmarks.run_benchmark import free_port
+    from pdp_pipeline import MAX_CV_BYTES
+
+    workdir = tempfile.mkdtemp(prefix="benchmark-uploads-")
+    cv_path = os.path.join(workdir, "cv.pdf")
+    oversized_path = os.path.join(workdir, "oversized.pdf")
+    build_padded_cv(cv_path, int(args.size_mb * 1024 * 1024))
+    build_padded_cv(oversized_path, MAX_CV_BYTES + 2 * 1024 * 1024)
+
+    port = free_port()
+    env = dict(os.environ, LOG_LEVEL="WARNING", STARTUP_PREWARM="false")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.upload_rss", "--serve", str(port)],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        if server.stdout.readline().strip() != "ready":
+            raise RuntimeError("Benchmark server did not start")
+        before = memory_mb(server.pid)
+        results = asyncio.run(drive(f"http://127.0.0.1:{port}", cv_path, oversized_path, args.uploads))
+        after = memory_mb(server.pid)
+    finally:
+        server.kill()
+        server.wait()
+
+    seconds = [result["seconds"] for result in results["uploads"]]
+    report = {
+        "config": {"uploads": args.uploads, "size_mb": os.path.getsize(cv_path) / (1024 * 1024)},
+        "statuses": sorted({result["status"] for result in results["uploads"]}),
+        "errors": [result["detail"] for result in results["uploads"] if result["status"] != 200][:3],
+        "upload_seconds_max": max(seconds),
+        "oversized": {"status": results["oversized"]["status"], "seconds": results["oversized"]["seconds"]},
+        "server_rss_before_mb": before["rss_mb"],
+        "server_peak_rss_mb": after["peak_rss_mb"],
+        "server_peak_growth_mb": after["peak_rss_mb"] - before["peak_rss_mb"],
+        "server_peak_growth_per_upload_mb": (after["peak_rss_mb"] - before["peak_rss_mb"]) / args.uploads,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
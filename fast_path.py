@@ -0,0 +1,270 @@
+from tools.date_and_time import current_date_and_time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+import logging
+import math
+import time
+import re
+import pytz
+
+logger = logging.getLogger(__name__)
+
+GREETING_REPLY = "Hello! How can I help you with your career today?"
+THANKS_REPLY = "You're welcome! Let me know if there is anything else I can help you with in your career."
+
+# Messages mentioning any of these always go to the agent, whatever the classifier says
+AGENT_KEYWORDS = [
+    "job", "jobs", "career", "cv", "resume", "salary", "interview", "pdp", "plan", "skill",
+    "skills", "course", "courses", "company", "role", "position", "search", "find", "wikipedia",
+    "http", "www", "calculate", "compare", "recommend", "learn", "become", "how to"
+]
+
+GREETING_PATTERN = re.compile(
+    r"^(hi|hello|hey|hiya|howdy|greetings|good (morning|afternoon|evening|day)|hi there|hello there|hey there)"
+    r"( (there|coach|assistant|bot))?[\s!.,]*$"
+)
+THANKS_PATTERN = re.compile(
+    r"^((ok(ay)?|great|perfect|awesome|cool|nice)[\s,!.]*)?"
+    r"(thanks|thank you|thx|ty|cheers|many thanks|thanks a lot|thank you so much|much appreciated)"
+    r"( (so much|a lot|very much))?[\s!.,]*$"
+)
+DATETIME_PATTERN = re.compile(
+    r"^(what('?s| is)|tell me|show me|give me)? ?(the )?(current |today'?s )?(date|time|day|date and time|time and date)"
+    r"( is it| today| now| right now)?( in [\w /,_-]+)?\??$"
+    r"|^what (time|day|date) is it( now| today| right now)?( in [\w /,_-]+)?\??$"
+)
+# Date/time questions about another moment, an event or two places are for the agent:
+# "the date in 5 years", "the date of the next meetup", "the time difference between ..."
+NOT_CURRENT_DATETIME_PATTERN = re.compile(
+    r"\b(\d+|a|an|one|two|three|few|couple of)\s+(seconds?|minutes?|hours?|days?|weeks?|months?|years?)\b"
+    r"|\b(of|difference|between|until|till|since|ago|from now|tomorrow|yesterday|next|last|when|will|was)\b"
+)
+
+# Asked of the small "fast" model when neither the rules nor the classifier are sure
+ROUTER_PROMPT = """Classify the user's message to a career coaching assistant.
+Answer GREETING if it only greets, THANKS if it only thanks or acknowledges, and OTHER for anything else.
+
+Message: {message}
+Answer:"""
+ROUTER_LABELS = {"greeting": "greeting", "thanks": "thanks", "other": "agent"}
+
+# Seed examples for the naive Bayes classifier used when no rule matches
+TRAINING_EXAMPLES = {
+    "greeting": [
+        "hi", "hello", "hey there", "good morning", "hello coach", "hi how are you",
+        "hey how is it going", "good evening", "hi nice to meet you", "hello again",
+        "morning", "yo", "hi there friend", "hello how are you doing",
+    ],
+    "thanks": [
+        "thanks", "thank you", "thank you very much", "thanks a lot that helps",
+        "great thanks", "appreciate it", "thanks for the help", "that was helpful thank you",
+        "cheers", "many thanks", "thank you so much", "perfect thanks", "awesome thank you",
+    ],
+    "datetime": [
+        "what time is it", "what is the date today", "what day is it", "current time",
+        "what is the time now", "today's date", "what's the time in london",
+        "what is the current date and time", "time in new york", "what day is today",
+        "tell me the time", "date today", "what time is it in tokyo",
+    ],
+    "agent": [
+        "find me software engineer jobs in berlin", "how do i become a data scientist",
+        "can you review my career plan", "what skills do i need for product management",
+        "search for remote python jobs", "tell me about machine learning", "what is kubernetes",
+        "how much does a data analyst earn in germany", "help me prepare for an interview",
+        "what courses should i take", "who is the ceo of google", "visit this page",
+        "what are the best certifications for cloud", "i want to change my career",
+        "what should i learn next", "how long does it take to learn sql",
+        "give me tips for my resume", "what time management techniques work",
+        "what day should i apply", "what is a good career for me",
+    ],
+}
+
+# Cities and regions from the tz database ("berlin" -> "Europe/Berlin") for date/time questions,
+# countries with a single timezone ("india" -> "Asia/Kolkata") and unambiguous abbreviations
+_TIMEZONE_BY_PLACE = {
+    **{
+        name.lower(): pytz.country_timezones[code][0]
+        for code, name in pytz.country_names.items() if len(pytz.country_timezones.get(code, [])) == 1
+    },
+    **{
+        zone.split("/")[-1].replace("_", " ").lower(): zone
+        for zone in pytz.common_timezones if "/" in zone
+    },
+    "pst": "America/Los_Angeles", "pdt": "America/Los_Angeles", "pt": "America/Los_Angeles",
+    "mst": "America/Denver", "mdt": "America/Denver", "cst": "America/Chicago", "cdt": "America/Chicago",
+    "est": "America/New_York", "edt": "America/New_York", "et": "America/New_York",
+    "bst": "Europe/London", "cet": "Europe/Berlin", "cest": "Europe/Berlin",
+}
+_IANA_ZONES = {zone.lower(): zone for zone in pytz.all_timezones}
+
+
+def _tokenize(text: str) -> List[str]:
+    words = re.findall(r"[a-z']+", text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class NaiveBayesIntentClassifier:
+    """Multinomial naive Bayes over unigrams and bigrams, small enough to train at import"""
+
+    def __init__(self, examples: Dict[str, List[str]]):
+        self.word_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.class_counts: Counter = Counter()
+        for intent, texts in examples.items():
+            for text in texts:
+                self.class_counts[intent] += 1
+                self.word_counts[intent].update(_tokenize(text))
+        self.vocabulary = {word for counts in self.word_counts.values() for word in counts}
+        self.totals = {intent: sum(counts.values()) for intent, counts in self.word_counts.items()}
+        self.examples_total = sum(self.class_counts.values())
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return the most likely intent and its posterior probability"""
+        tokens = _tokenize(text)
+        vocabulary_size = len(self.vocabulary) + 1
+        log_scores = {}
+        for intent, count in self.class_counts.items():
+            score = math.log(count / self.examples_total)
+            for token in tokens:
+                score += math.log((self.word_counts[intent][token] + 1) / (self.totals[intent] + vocabulary_size))
+            log_scores[intent] = score
+
+        best = max(log_scores, key=log_scores.get)
+        normalizer = sum(math.exp(score - log_scores[best]) for score in log_scores.values())
+        return best, 1.0 / normalizer
+
+
+class FastPathRouter:
+    """
+    Pre-agent router that answers greetings, thanks and date/time questions directly,
+    so only questions that need tools pay for a full ReAct round-trip.
+
+    Short messages that the rules and the classifier can't place are classified by llm,
+    the small model of the "fast" route, when one is set.
+    """
+
+    def __init__(self, confidence_threshold: float = 0.9, max_words: int = 12, llm: Optional[Any] = None):
+        self.classifier = NaiveBayesIntentClassifier(TRAINING_EXAMPLES)
+        self.llm = llm
+        self.confidence_threshold = confidence_threshold
+        self.max_words = max_words
+        self._lock = threading.Lock()
+        self._total = 0
+        self._routed: Counter = Counter()
+        self._fast_path_seconds = 0.0
+        self._agent_seconds = 0.0
+        self._agent_requests = 0
+
+    def classify(self, text: str) -> str:
+        """Return 'greeting', 'thanks', 'datetime' or 'agent'"""
+        normalized = " ".join(text.lower().strip().split())
+        if not normalized or len(normalized.split()) > self.max_words:
+            return "agent"
+
+        if GREETING_PATTERN.match(normalized):
+            return "greeting"
+        if THANKS_PATTERN.match(normalized):
+            return "thanks"
+        if any(re.search(rf"\b{re.escape(keyword)}\b", normalized) for keyword in AGENT_KEYWORDS):
+            return "agent"
+
+        if DATETIME_PATTERN.match(normalized):
+            # Only the current date and time, here or in a place with a known timezone
+            if NOT_CURRENT_DATETIME_PATTERN.search(normalized) or _extract_timezone(normalized) is None:
+                return "agent"
+            return "datetime"
+
+        # The classifier may only pick the canned replies, never a date/time answer
+        intent, confidence = self.classifier.predict(normalized)
+        if intent in ("greeting", "thanks") and confidence >= self.confidence_threshold:
+            return intent
+        if self.llm is not None:
+            return self._classify_with_llm(normalized)
+        return "agent"
+
+    def _classify_with_llm(self, text: str) -> str:
+        try:
+            answer = self.llm.invoke(ROUTER_PROMPT.format(message=text), max_new_tokens=4)
+        except Exception as e:
+            logger.warning("Fast model could not classify the query, sending it to the agent: %s", e)
+            return "agent"
+        words = re.findall(r"[a-z]+", str(answer).lower())
+        return ROUTER_LABELS.get(words[0], "agent") if words else "agent"
+
+    def route(self, text: str) -> Optional[Tuple[str, str]]:
+        """Answer the query on the fast path, or return None if it needs the agent"""
+        started = time.perf_counter()
+        intent = self.classify(text)
+        answer = None
+        if intent == "greeting":
+            answer = GREETING_REPLY
+        elif intent == "thanks":
+            answer = THANKS_REPLY
+        elif intent == "datetime":
+            answer = self._answer_datetime(text)
+            if answer is None:
+                intent = "agent"
+
+        with self._lock:
+            self._total += 1
+            if answer is not None:
+                self._routed[intent] += 1
+                self._fast_path_seconds += time.perf_counter() - started
+
+        if answer is None:
+            return None
+        logger.info("Fast path answered query with intent '%s'", intent)
+        return intent, answer
+
+    def record_agent_latency(self, seconds: float) -> None:
+        """Record how long a query took through the agent, used to estimate the time saved"""
+        with self._lock:
+            self._agent_requests += 1
+            self._agent_seconds += seconds
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            routed = sum(self._routed.values())
+            average_agent = self._agent_seconds / self._agent_requests if self._agent_requests else None
+            average_fast = self._fast_path_seconds / routed if routed else 0.0
+            return {
+                "total_requests": self._total,
+                "routed_requests": routed,
+                "routed_share": routed / self._total if self._total else 0.0,
+                "routed_by_intent": dict(self._routed),
+                "average_agent_latency_seconds": average_agent,
+                "average_fast_path_latency_seconds": average_fast,
+                "estimated_seconds_saved": routed * (average_agent - average_fast) if average_agent is not None else None,
+            }
+
+    def _answer_datetime(self, text: str) -> Optional[str]:
+        timezone = _extract_timezone(text)
+        if timezone is None:
+            return None
+        result = current_date_and_time.invoke({"timezone": timezone})
+        if result.startswith(("Error", "Can't")):
+            return result
+        return f"The current date and time in {timezone} is {result}."
+
+
+def _extract_timezone(text: str) -> Optional[str]:
+    """
+    Find an IANA timezone, a tz database city, a country or an abbreviation in the text.
+    UTC when no place is named, None when the place has no single known timezone.
+    """
+    for candidate in re.findall(r"[A-Za-z]+/[A-Za-z_]+(?:/[A-Za-z_]+)?", text):
+        if candidate.lower() in _IANA_ZONES:
+            return _IANA_ZONES[candidate.lower()]
+
+    match = re.search(r"\bin ([\w /,_-]+?)\s*\??$", text.strip(), re.IGNORECASE)
+    if match:
+        place = match.group(1).strip().lower()
+        # "berlin, germany" -> "berlin"
+        for candidate in (place, place.split(",")[0].strip()):
+            if candidate in _TIMEZONE_BY_PLACE:
+                return _TIMEZONE_BY_PLACE[candidate]
+        # Only after the places, so "est" is New York with daylight saving, not the fixed-offset EST
+        if place.upper() in pytz.all_timezones_set:
+            return place.upper()
+        return None
+    return "UTC"
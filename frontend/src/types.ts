@@ -8,6 +8,7 @@ export interface ChatResponse {
   status: string;
   thread_id: string;
   response: string;
+  thought_process_turn?: number;
   full_thought_process?: string;
 }
 
@@ -1,4 +1,5 @@
 from .helper import create_pdp_pdf, clean_input
 from .feedback_handler import store_feedback, read_out_feedback
+from .tracing import TracingCallbackHandler, current_context, span, traced, tracing_enabled
 
-__all__ = ["create_pdp_pdf", "store_feedback", "clean_input", "read_out_feedback"] 
\ No newline at end of file
+__all__ = ["create_pdp_pdf", "store_feedback", "clean_input", "read_out_feedback", "TracingCallbackHandler", "current_context", "span", "traced", "tracing_enabled"] 
\ No newline at end of file
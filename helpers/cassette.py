@@ -0,0 +1,190 @@
+"""
+Record and replay of LLM completions and tool observations, for deterministic offline runs.
+
+With CASSETTE_MODE=record every completion of every model route and every tool result is
+written to the cassette at CASSETTE_PATH, keyed by a hash of the prompt (or tool input) with
+timestamps masked. With CASSETTE_MODE=replay the same calls are answered from the cassette
+without contacting any model or API, and a call that was never recorded raises CassetteMiss.
+
+benchmarks/replay.py records scenarios and replays them as a regression suite and CPU benchmark.
+"""
+from langchain_core.language_models.llms import LLM, BaseLLM
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.tools import BaseTool
+from helpers.tool_wrapping import rewrap_tool
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+import threading
+import atexit
+import hashlib
+import logging
+import json
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off").lower()  # off, record or replay
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "cassettes/default.json")
+CASSETTE_VERSION = 1
+
+# Parts of prompts that differ between a recording and its replay
+VOLATILE_PATTERNS = [
+    # utc_now() and the current_date_and_time tool: 2025:01:01 12:00:00 UTC +0000
+    re.compile(r"\d{4}:\d{2}:\d{2} \d{2}:\d{2}:\d{2} [A-Z]+ [+-]\d{4}"),
+]
+
+
+class CassetteMiss(LookupError):
+    """A replayed call that is not in the cassette, usually because a prompt changed"""
+    # Asking again can't help, see ResilientLLM
+    retryable = False
+
+
+def normalize(text: str) -> str:
+    for pattern in VOLATILE_PATTERNS:
+        text = pattern.sub("<now>", text)
+    return text
+
+
+def interaction_key(kind: str, name: str, payload: str) -> str:
+    return hashlib.sha256(f"{kind}\x00{name}\x00{normalize(payload)}".encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    Interactions of one recording. A call recorded several times with the same key is
+    replayed in the recorded order, and its last response repeats once they run out.
+    Recorded interactions are written out with each scenario result and on exit, not one by one.
+    """
+
+    def __init__(self, path: str, mode: str):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Cassette mode must be 'record' or 'replay', got '{mode}'")
+        self.path = path
+        self.mode = mode
+        self.interactions: List[Dict[str, Any]] = []
+        self.results: List[Dict[str, Any]] = []
+        self.hits = 0
+        self.misses = 0
+        self._played: Dict[str, int] = defaultdict(int)
+        self._by_key: Dict[str, List[str]] = defaultdict(list)
+        self._lock = threading.Lock()
+        if mode == "replay":
+            self._load()
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"{self.path} has cassette version {data.get('version')}, expected {CASSETTE_VERSION}")
+        self.interactions = data.get("interactions", [])
+        self.results = data.get("results", [])
+        for interaction in self.interactions:
+            self._by_key[interaction["key"]].append(interaction["response"])
+
+    def save(self) -> None:
+        with self._lock:
+            self._save()
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CASSETTE_VERSION, "interactions": self.interactions, "results": self.results}, f, indent=1, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    def record(self, kind: str, name: str, payload: str, response: str) -> None:
+        with self._lock:
+            self.interactions.append({
+                "kind": kind,
+                "name": name,
+                "key": interaction_key(kind, name, payload),
+                "request": payload,
+                "response": response,
+            })
+
+    def play(self, kind: str, name: str, payload: str) -> str:
+        key = interaction_key(kind, name, payload)
+        with self._lock:
+            responses = self._by_key.get(key)
+            if not responses:
+                self.misses += 1
+                raise CassetteMiss(f"No recorded {kind} call for {name} with this input: {normalize(payload)[-300:]!r}")
+            self.hits += 1
+            index = min(self._played[key], len(responses) - 1)
+            self._played[key] += 1
+            return responses[index]
+
+    def rewind(self) -> None:
+        """Replay repeated calls from their first recorded response again"""
+        with self._lock:
+            self._played.clear()
+
+    def add_result(self, result: Dict[str, Any]) -> None:
+        """Keep the outcome of a recorded scenario step, to compare replays against"""
+        with self._lock:
+            self.results.append(result)
+            self._save()
+
+
+class CassetteLLM(LLM):
+    """Records the completions of the wrapped LLM, or replays them without one"""
+
+    llm: Optional[BaseLLM] = None  # None when replaying
+    route: str
+    cassette: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cassette_{self.llm._llm_type}" if self.llm is not None else "cassette_replay"
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        # Stop sequences change the completion, the generation budget only where it cuts it off
+        payload = json.dumps({"prompt": prompt, "stop": stop or []}, ensure_ascii=False)
+        if self.cassette.mode == "replay":
+            return self.cassette.play("llm", self.route, payload)
+        response = self.llm._call(prompt, stop=stop, run_manager=run_manager, **kwargs)
+        self.cassette.record("llm", self.route, payload, response)
+        return response
+
+
+def wrap_tools(tools: List[BaseTool], cassette: Cassette) -> List[BaseTool]:
+    """Return the tools wrapped to record their results, or to replay them without running"""
+    return [_wrap(tool, cassette) for tool in tools]
+
+
+def _wrap(tool: BaseTool, cassette: Cassette) -> BaseTool:
+    def run_from_cassette(*args: Any, **kwargs: Any) -> Any:
+        payload = json.dumps({"args": [str(arg) for arg in args], "kwargs": {k: str(v) for k, v in sorted(kwargs.items())}}, ensure_ascii=False)
+        if cassette.mode == "replay":
+            return cassette.play("tool", tool.name, payload)
+        result = tool.func(*args, **kwargs)
+        cassette.record("tool", tool.name, payload, str(result))
+        return result
+
+    return rewrap_tool(tool, run_from_cassette)
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The process-wide cassette of CASSETTE_MODE and CASSETTE_PATH, None when the mode is off"""
+    global _cassette
+    if CASSETTE_MODE == "off":
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE)
+            if CASSETTE_MODE == "record":
+                atexit.register(_cassette.save)
+            logger.info("Cassette %s: %s", CASSETTE_MODE, CASSETTE_PATH)
+        return _cassette
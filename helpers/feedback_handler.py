@@ -5,12 +5,10 @@ from typing import Dict, Any, List
 import shutil
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+logger = logging.getLogger(__name__)
+
+FEEDBACK_DIR = os.getenv("FEEDBACK_DIR", "/app/data/feedback")
+
 
 def store_feedback(contact: str, feedback: str) -> Dict[str, Any]:
     """
@@ -42,7 +40,7 @@ def store_feedback(contact: str, feedback: str) -> Dict[str, Any]:
         }
 
         # Ensure /data/feedback directory exists
-        feedback_dir = "/app/data/feedback"
+        feedback_dir = FEEDBACK_DIR
         try:
             os.makedirs(feedback_dir, exist_ok=True)
             if not os.access(feedback_dir, os.W_OK):
@@ -108,7 +106,7 @@ def store_feedback(contact: str, feedback: str) -> Dict[str, Any]:
 
     except Exception as e:
         error_msg = f"Error saving feedback: {str(e)}"
-        logging.error(error_msg)
+        logger.error(error_msg)
         raise Exception(error_msg)
 
 
@@ -128,14 +126,14 @@ def _read_feedback_file(filename: str) -> List[Dict[str, Any]]:
                 # If file is corrupted, try to read backup
                 backup_filename = f"{filename}.bak"
                 if os.path.exists(backup_filename):
-                    logging.warning(f"Warning: Corrupted feedback file {filename}, trying backup")
+                    logger.warning("Warning: Corrupted feedback file %s, trying backup", filename)
                     with open(backup_filename, 'r', encoding='utf-8') as backup_f:
                         return json.load(backup_f)
                 else:
-                    logging.warning(f"Warning: Corrupted feedback file {filename}, starting fresh")
+                    logger.warning("Warning: Corrupted feedback file %s, starting fresh", filename)
                     return []
     except Exception as e:
-        logging.error(f"Error reading feedback file: {str(e)}")
+        logger.error("Error reading feedback file: %s", e)
         return []
 
 
@@ -159,14 +157,10 @@ def _write_feedback_file(filename: str, feedback_list: List[Dict[str, Any]]) ->
 
 def _log_feedback_to_console(feedback_entry: Dict[str, Any], filename: str) -> None:
     """Log feedback to console for immediate visibility"""
-    logging.info("\n" + "="*60)
-    logging.info("NEW FEEDBACK RECEIVED")
-    logging.info("="*60)
-    logging.info(f"Timestamp: {feedback_entry['timestamp']}")
-    logging.info(f"Contact: {feedback_entry['contact']}")
-    logging.info(f"Feedback: {feedback_entry['feedback']}")
-    logging.info(f"Saved to: {filename}")
-    logging.info("="*60 + "\n")
+    logger.info(
+        "New feedback received",
+        extra={"timestamp": feedback_entry["timestamp"], "contact": feedback_entry["contact"], "feedback": feedback_entry["feedback"], "saved_to": filename}
+    )
 
 def read_out_feedback() -> Dict[str, Any]:
     """
@@ -176,7 +170,7 @@ def read_out_feedback() -> Dict[str, Any]:
         Dict[str, Any]: Dictionary containing all feedback entries organized by date
     """
     try:
-        feedback_dir = "/app/data/feedback"
+        feedback_dir = FEEDBACK_DIR
         if not os.path.exists(feedback_dir):
             return {"status": "success", "message": "No feedback files found", "feedback": {}}
             
@@ -196,7 +190,7 @@ def read_out_feedback() -> Dict[str, Any]:
                         date_key = filename.replace('feedback_', '').replace('.json', '')
                         feedback_data[date_key] = feedback_entries
                 except Exception as e:
-                    logging.error(f"Error reading feedback file {filename}: {str(e)}")
+                    logger.error("Error reading feedback file %s: %s", filename, e)
                     continue
                     
         return {
@@ -207,5 +201,5 @@ def read_out_feedback() -> Dict[str, Any]:
         
     except Exception as e:
         error_msg = f"Error reading feedback: {str(e)}"
-        logging.error(error_msg)
+        logger.error(error_msg)
         raise Exception(error_msg)
\ No newline at end of file
@@ -1,11 +1,7 @@
 import re
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.colors import HexColor
 from io import BytesIO
 from datetime import datetime
+from typing import Optional, Tuple, Union
 
 def clean_input(input_text: str) -> str:
     """Clean the input by removing special tokens, code blocks, and unwanted text"""
@@ -49,6 +45,35 @@ def clean_input(input_text: str) -> str:
 
     return input_text
 
+def format_markdown_line(line: str) -> Optional[Tuple[str, str]]:
+    """
+    Map one Markdown line to a (style, text) pair for the PDF renderer, None for blank lines
+    """
+    line = line.strip()
+    if not line:
+        return None
+
+    # Handle Markdown headers
+    if line.startswith('###'):
+        # Level 3 header
+        return ('subheading', line.replace('###', '').strip())
+    if line.startswith('##'):
+        # Level 2 header
+        return ('heading', line.replace('##', '').strip())
+    if line.startswith('#'):
+        # Level 1 header
+        return ('title', line.replace('#', '').strip())
+    # Handle bold text (markdown-style)
+    if '**' in line:
+        # Replace markdown bold with HTML bold
+        clean_line = line.replace('**', '<b>', 1)
+        return ('body', clean_line.replace('**', '</b>', 1))
+    # Handle bullet points
+    if line.startswith('- ') or line.startswith('* '):
+        return ('body', f"• {line[2:]}")
+    # Numbered lists and regular content
+    return ('body', line)
+
 def prepare_pdf_content(pdf_content: str):
     """
     Format LLM output to PDF content with proper Markdown conversion
@@ -66,52 +91,23 @@ def prepare_pdf_content(pdf_content: str):
 
     # Process content line by line
     formatted_lines = []
-    lines = pdf_content.split('\n')
-
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-
-        # Handle Markdown headers
-        if line.startswith('###'):
-            # Level 3 header
-            clean_line = line.replace('###', '').strip()
-            formatted_lines.append(('subheading', clean_line))
-        elif line.startswith('##'):
-            # Level 2 header
-            clean_line = line.replace('##', '').strip()
-            formatted_lines.append(('heading', clean_line))
-        elif line.startswith('#'):
-            # Level 1 header
-            clean_line = line.replace('#', '').strip()
-            formatted_lines.append(('title', clean_line))
-        # Handle bold text (markdown-style)
-        elif '**' in line:
-            # Replace markdown bold with HTML bold
-            clean_line = line.replace('**', '<b>', 1)
-            clean_line = clean_line.replace('**', '</b>', 1)
-            formatted_lines.append(('body', clean_line))
-        # Handle bullet points
-        elif line.startswith('- '):
-            clean_line = f"• {line[2:]}"
-            formatted_lines.append(('body', clean_line))
-        elif line.startswith('* '):
-            clean_line = f"• {line[2:]}"
-            formatted_lines.append(('body', clean_line))
-        # Handle numbered lists
-        elif re.match(r'^\d+\.', line):
-            formatted_lines.append(('body', line))
-        # Regular content
-        else:
-            formatted_lines.append(('body', line))
+    for line in pdf_content.split('\n'):
+        formatted_line = format_markdown_line(line)
+        if formatted_line:
+            formatted_lines.append(formatted_line)
 
     return formatted_lines
 
-def create_pdp_pdf(pdp_content: str, career_goal: str, target_date: str, filename: str) -> BytesIO:
+def create_pdp_pdf(pdp_content: Union[str, "StructuredPDP"], career_goal: str, target_date: str, filename: str) -> BytesIO:
     """
-    Create a formatted PDF from PDP content
+    Create a formatted PDF from PDP content, either Markdown text or an already parsed StructuredPDP
     """
+    # reportlab is imported on first use, it is only needed for PDP downloads
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.colors import HexColor
+
     buffer = BytesIO()
 
     # Create PDF document
@@ -179,8 +175,8 @@ def create_pdp_pdf(pdp_content: str, career_goal: str, target_date: str, filenam
     story.append(Paragraph(f"<b>Generated on:</b> {datetime.now().strftime('%B %d, %Y')}", body_style))
     story.append(Spacer(1, 20))
 
-    # Process PDP content using prepare_pdf_content
-    formatted_content = prepare_pdf_content(pdp_content)
+    # A StructuredPDP carries its formatted lines, plain text goes through prepare_pdf_content
+    formatted_content = prepare_pdf_content(pdp_content) if isinstance(pdp_content, str) else pdp_content.blocks()
     
     for content_type, line in formatted_content:
         if content_type == 'title':
@@ -0,0 +1,128 @@
+"""
+Structured, non-blocking logging.
+
+Records are handed to a queue and formatted and written by a background listener thread,
+so request handlers never wait on stderr. Output is one JSON object per line with size-capped
+fields. DEBUG records, which carry the verbose payloads (raw LLM output, observations,
+intermediate steps), are sampled.
+
+Environment:
+    LOG_LEVEL=INFO                                   root level
+    LOG_LEVELS=output_parser=WARNING,tools=DEBUG     per-module levels
+    LOG_FORMAT=json                                  json or text
+    LOG_MAX_FIELD_CHARS=2000                         cap for the message and each extra field
+    LOG_DEBUG_SAMPLE_RATE=0.1                        share of DEBUG records that are written
+"""
+from logging.handlers import QueueHandler, QueueListener
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+import logging
+import random
+import atexit
+import queue
+import json
+import sys
+import os
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "2000"))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+
+# Attributes every LogRecord has, so anything else came in through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+def _cap(value: str, limit: int = LOG_MAX_FIELD_CHARS) -> str:
+    if len(value) <= limit:
+        return value
+    return f"{value[:limit]}...({len(value) - limit} chars truncated)"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the message and `extra` fields capped in size"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": _cap(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value if isinstance(value, (bool, int, float, type(None))) else _cap(str(value))
+        if record.exc_info:
+            entry["exception"] = _cap(self.formatException(record.exc_info))
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class CappedTextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return _cap(super().format(record))
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Keeps every INFO and above record, and only a sample of DEBUG ones"""
+
+    def __init__(self, rate: float = LOG_DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class _PreparedQueueHandler(QueueHandler):
+    """
+    Enqueues the record as is. The stock QueueHandler formats the message on the calling
+    thread, which is exactly the work this setup moves to the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "module=LEVEL,other.module=LEVEL" into a dict"""
+    levels = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, level = part.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging() -> None:
+    """Route all logging through a queue to a JSON (or text) stderr handler. Safe to call twice."""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == "text":
+        output.setFormatter(CappedTextFormatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s", "%Y-%m-%d %H:%M:%S"))
+    else:
+        output.setFormatter(JsonFormatter())
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    queue_handler = _PreparedQueueHandler(log_queue)
+    # Sample on the calling side, so dropped records never reach the queue
+    queue_handler.addFilter(DebugSamplingFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
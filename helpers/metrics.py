@@ -0,0 +1,144 @@
+"""
+Prometheus metrics for capacity planning, exposed on /metrics.
+
+HTTP metrics come from a middleware, LLM and tool metrics from a LangChain callback handler
+passed to every agent run, and parser and PDP validation metrics from counters incremented
+where the decision is made.
+"""
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import Counter, Gauge, Histogram
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+from .tokens import count_tokens
+import threading
+import time
+
+# LLM calls can take minutes on a cold endpoint, so the buckets go well past typical HTTP ones
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 180)
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests", ["route", "method", "status"])
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ["route", "method"], buckets=LATENCY_BUCKETS)
+
+LLM_CALLS = Counter("llm_calls_total", "LLM calls", ["model", "status"])
+LLM_LATENCY = Histogram("llm_call_duration_seconds", "LLM call latency", ["model"], buckets=LATENCY_BUCKETS)
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens, counted locally when the backend reports no usage", ["model", "direction"])
+LLM_PROMPT_TOKENS = Histogram("llm_prompt_tokens", "Prompt tokens per LLM call", ["model"], buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072))
+LLM_MAX_NEW_TOKENS = Histogram("llm_max_new_tokens", "Generation budget given to each LLM call", ["model"], buckets=(64, 128, 256, 512, 768, 1024, 2048, 3072, 4096))
+TOKEN_BUDGET_REJECTIONS = Counter("token_budget_rejections_total", "LLM calls refused for lack of context or token budget", ["reason"])
+TOKENS_TODAY = Gauge("tokens_used_today", "Prompt and completion tokens used since midnight UTC")
+
+AGENT_ITERATIONS = Histogram("agent_iterations", "ReAct iterations per request", ["agent"], buckets=(1, 2, 3, 4, 5, 6, 8, 10))
+LOOP_GUARD_REPEATS = Counter("agent_repeated_actions_total", "Repeated tool calls answered from the run's earlier result", ["agent", "match"])
+LOOP_GUARD_CONVERGED = Counter("agent_converged_runs_total", "Runs ended early because the model kept repeating itself", ["agent"])
+LOOP_GUARD_ITERATIONS_SAVED = Counter("agent_iterations_saved_total", "Iterations left unused by converged runs", ["agent"])
+LOOP_GUARD_SECONDS_SAVED = Counter("agent_loop_guard_seconds_saved_total", "Estimated tool and LLM seconds saved by the loop guard", ["agent"])
+
+TOOL_CALLS = Counter("tool_calls_total", "Tool calls", ["tool", "status"])
+TOOL_LATENCY = Histogram("tool_call_duration_seconds", "Tool call latency", ["tool"], buckets=LATENCY_BUCKETS)
+
+PARSER_PATHS = Counter("output_parser_path_total", "Branch taken by the output parser", ["parser", "path"])
+PDP_VALIDATION_FAILURES = Counter("pdp_validation_failures_total", "PDP responses rejected by validation", ["reason"])
+PDP_SECTIONS_REGENERATED = Counter("pdp_sections_regenerated_total", "PDP sections regenerated after failing validation", ["section"])
+PASSTHROUGH_SPLICES = Counter("tool_passthrough_splices_total", "Tool results spliced into final answers by handle", ["kind"])
+PASSTHROUGH_TOKENS_SAVED = Counter("tool_passthrough_tokens_saved_total", "Estimated output tokens the model did not have to copy", ["kind"])
+ROLE_PROFILE_CACHE = Counter("role_profile_cache_total", "Role profile lookups for PDP requests", ["result"])
+RESPONSE_COMPRESSION_BYTES = Counter("http_response_compression_bytes_total", "Bytes of compressed responses before and after compression", ["encoding", "stage"])
+RETRIEVAL_CACHE = Counter("retrieval_index_cache_total", "Fetched documents served from the index cache or fetched and indexed", ["source", "result"])
+RETRIEVAL_TOKENS = Counter("retrieval_tokens_total", "Tokens of fetched documents and of the chunks returned from them", ["source", "stage"])
+RENDER_CACHE = Counter("pdp_render_cache_total", "PDP exports served from the render cache or rendered", ["format", "result"])
+
+ACTIVE_REQUESTS = Gauge("active_requests", "Agent requests currently running")
+MEMORY_MESSAGES = Gauge("conversation_memory_messages", "Messages in the shared conversation memory")
+MEMORY_CHARS = Gauge("conversation_memory_chars", "Characters in the shared conversation memory")
+
+
+def _route_label(request: Any) -> str:
+    """Route template rather than raw path, so ids in the URL do not explode label cardinality"""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+async def metrics_middleware(request: Any, call_next: Any) -> Any:
+    started = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        route = _route_label(request)
+        HTTP_REQUESTS.labels(route, request.method, status).inc()
+        HTTP_LATENCY.labels(route, request.method).observe(time.perf_counter() - started)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Records LLM and tool latency, tokens and outcomes. One shared instance is enough."""
+
+    def __init__(self):
+        self._started: Dict[UUID, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, label: str) -> None:
+        with self._lock:
+            self._started[run_id] = (label, time.perf_counter())
+
+    def _stop(self, run_id: UUID) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        if started is None:
+            return None
+        label, started_at = started
+        return label, time.perf_counter() - started_at
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or params.get("_type") or "unknown"
+        self._start(run_id, model)
+        LLM_TOKENS.labels(model, "in").inc(sum(count_tokens(prompt) for prompt in prompts))
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        stopped = self._stop(run_id)
+        if stopped is None:
+            return
+        model, elapsed = stopped
+        LLM_CALLS.labels(model, "success").inc()
+        LLM_LATENCY.labels(model).observe(elapsed)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        completion_tokens = usage.get("completion_tokens")
+        if completion_tokens is None:
+            text = "".join(generation.text for generations in response.generations for generation in generations)
+            completion_tokens = count_tokens(text)
+        LLM_TOKENS.labels(model, "out").inc(completion_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        stopped = self._stop(run_id)
+        if stopped is not None:
+            LLM_CALLS.labels(stopped[0], "error").inc()
+            LLM_LATENCY.labels(stopped[0]).observe(stopped[1])
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, kwargs.get("name") or (serialized or {}).get("name") or "unknown")
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        stopped = self._stop(run_id)
+        if stopped is None:
+            return
+        tool, elapsed = stopped
+        # The tools report most failures as an "Error: ..." observation instead of raising
+        status = "error" if str(output).lstrip().startswith("Error") else "success"
+        TOOL_CALLS.labels(tool, status).inc()
+        TOOL_LATENCY.labels(tool).observe(elapsed)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        stopped = self._stop(run_id)
+        if stopped is not None:
+            TOOL_CALLS.labels(stopped[0], "error").inc()
+            TOOL_LATENCY.labels(stopped[0]).observe(stopped[1])
+
+
+metrics_callback_handler = MetricsCallbackHandler()
+
+
+def record_agent_iterations(agent: str, response: Dict[str, Any]) -> None:
+    """One iteration per tool step plus the final LLM call"""
+    AGENT_ITERATIONS.labels(agent).observe(len(response.get("intermediate_steps") or []) + 1)
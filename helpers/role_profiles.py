@@ -0,0 +1,162 @@
+"""
+Cache of role profiles: the skills, certifications and resources a career goal requires.
+
+They depend only on the target role, not on the candidate, and career goals repeat a lot, so
+a profile is generated once per normalized goal, stored as a JSON file and reused by every PDP
+for that goal until the TTL runs out or it is invalidated.
+"""
+from typing import Any, Callable, Dict, Optional
+from .metrics import ROLE_PROFILE_CACHE
+import threading
+import hashlib
+import logging
+import json
+import time
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+ROLE_PROFILE_CACHE_ENABLED = os.getenv("ROLE_PROFILE_CACHE", "true").lower() == "true"
+ROLE_PROFILE_DIR = os.getenv("ROLE_PROFILE_DIR", "/app/data/role_profiles")
+ROLE_PROFILE_TTL_HOURS = float(os.getenv("ROLE_PROFILE_TTL_HOURS", "168"))
+
+# Headings every generated profile must contain before it is worth caching
+REQUIRED_HEADINGS = ("Required Skills", "Certifications", "Recommended Resources")
+
+# Leading words that do not change what a role requires
+GOAL_PREFIXES = {"a", "an", "the", "become", "becoming", "to", "as", "work", "working"}
+
+
+def normalize_career_goal(career_goal: str) -> str:
+    """Lowercase, strip punctuation and filler words so "Become a Data Scientist!" and "data scientist" share one profile"""
+    words = re.findall(r"\w+", career_goal.lower())
+    while words and words[0] in GOAL_PREFIXES:
+        words.pop(0)
+    return " ".join(words)
+
+
+def is_valid_profile(profile: str) -> bool:
+    return all(heading.lower() in profile.lower() for heading in REQUIRED_HEADINGS)
+
+
+class RoleProfileCache:
+    """
+    One JSON file per normalized career goal, written atomically. Concurrent requests for the
+    same missing goal wait for a single generation instead of all calling the model.
+    """
+
+    def __init__(self, directory: str = ROLE_PROFILE_DIR, ttl_hours: float = ROLE_PROFILE_TTL_HOURS):
+        self.directory = directory
+        self.ttl_seconds = ttl_hours * 3600
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        slug = re.sub(r"[^\w]+", "-", key)[:60].strip("-") or "role"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:10]
+        return os.path.join(self.directory, f"{slug}-{digest}.json")
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, career_goal: str) -> Optional[str]:
+        """Cached profile for the goal, or None if there is none or it is older than the TTL"""
+        key = normalize_career_goal(career_goal)
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Unreadable role profile for '%s': %s", key, e)
+            return None
+        if entry.get("key") != key or time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+            return None
+        return entry.get("profile")
+
+    def put(self, career_goal: str, profile: str) -> None:
+        key = normalize_career_goal(career_goal)
+        path = self._path(key)
+        entry = {"key": key, "career_goal": career_goal, "created_at": time.time(), "profile": profile}
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def get_or_create(self, career_goal: str, generate: Callable[[str], str]) -> Optional[str]:
+        """Cached profile, generated with generate(career_goal) on a miss. Invalid profiles are returned but not cached."""
+        profile = self.get(career_goal)
+        if profile is not None:
+            ROLE_PROFILE_CACHE.labels("hit").inc()
+            return profile
+
+        with self._key_lock(normalize_career_goal(career_goal)):
+            # Another request may have generated it while this one waited
+            profile = self.get(career_goal)
+            if profile is not None:
+                ROLE_PROFILE_CACHE.labels("hit").inc()
+                return profile
+
+            ROLE_PROFILE_CACHE.labels("miss").inc()
+            profile = generate(career_goal)
+            if not is_valid_profile(profile):
+                logger.info("Not caching role profile for '%s', expected headings are missing", career_goal)
+                return profile
+            try:
+                self.put(career_goal, profile)
+            except OSError as e:
+                logger.warning("Could not store role profile for '%s': %s", career_goal, e)
+            return profile
+
+    def invalidate(self, career_goal: Optional[str] = None) -> int:
+        """Drop the profile of one goal, or all profiles if no goal is given. Returns the number removed."""
+        if career_goal is not None:
+            paths = [self._path(normalize_career_goal(career_goal))]
+        else:
+            paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".json")]
+
+        removed = 0
+        for path in paths:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+    def entries(self) -> Dict[str, Any]:
+        """Cached goals with their age in hours, for the admin endpoint"""
+        entries = {}
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            age_seconds = now - entry.get("created_at", 0)
+            entries[entry.get("key", name)] = {"age_hours": round(age_seconds / 3600, 1), "stale": age_seconds > self.ttl_seconds}
+        return entries
+
+
+_role_profile_cache: Optional[RoleProfileCache] = None
+_role_profile_cache_lock = threading.Lock()
+_role_profile_cache_disabled = not ROLE_PROFILE_CACHE_ENABLED
+
+
+def get_role_profile_cache() -> Optional[RoleProfileCache]:
+    """Shared cache, or None if it is switched off or the directory cannot be created"""
+    global _role_profile_cache, _role_profile_cache_disabled
+    with _role_profile_cache_lock:
+        if _role_profile_cache is None and not _role_profile_cache_disabled:
+            try:
+                _role_profile_cache = RoleProfileCache()
+            except Exception as e:
+                logger.warning("Role profile cache disabled: %s", e)
+                _role_profile_cache_disabled = True
+        return _role_profile_cache
@@ -0,0 +1,174 @@
+"""
+Serving of the React build. Text assets are compressed once, at build time or at startup,
+into .br and .gz files next to the originals, and the variant the client accepts is sent as
+it is. Files with a content hash in their name are cached by browsers for a year, and
+index.html is held in memory in all three encodings.
+
+Precompress a build directory:
+    python -m helpers.static_assets frontend/build
+"""
+from helpers.compression import choose_encoding, compress
+from typing import Dict, Optional, Tuple
+import mimetypes
+import hashlib
+import logging
+import sys
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+PRECOMPRESS_EXTENSIONS = (".js", ".css", ".html", ".json", ".map", ".svg", ".txt", ".xml", ".ico", ".webmanifest")
+# Smaller files gain less than the Content-Encoding header costs
+PRECOMPRESS_MIN_BYTES = 1024
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# Create React App and Vite put an 8+ character hash before the extension: main.3f2a1b9c.js.
+# The digit keeps names like asset-manifest.json out.
+HASHED_NAME = re.compile(r"[.-](?=[0-9a-zA-Z_]*[0-9])[0-9a-zA-Z_]{8,}\.(?:chunk\.)?[a-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def available_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def precompress_directory(directory: str, min_bytes: int = PRECOMPRESS_MIN_BYTES) -> int:
+    """
+    Write .br and .gz variants of the text files under directory, skipping those whose variant
+    is already newer than the original. Brotli runs at its highest quality, the cost is paid
+    once. Returns the number of files written.
+    """
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(PRECOMPRESS_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            source_stat = os.stat(path)
+            if source_stat.st_size < min_bytes:
+                continue
+            data = None
+            for encoding in available_encodings():
+                target = path + ENCODING_SUFFIXES[encoding]
+                if os.path.exists(target) and os.path.getmtime(target) >= source_stat.st_mtime:
+                    continue
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                compressed = compress(data, encoding, gzip_level=9, brotli_quality=11)
+                # Keep the variant only if it is worth a Content-Encoding round trip
+                if len(compressed) >= len(data) * 0.95:
+                    continue
+                temp_path = f"{target}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(compressed)
+                os.replace(temp_path, target)
+                written += 1
+    return written
+
+
+def cache_control(path: str) -> str:
+    return IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(os.path.basename(path)) else REVALIDATE_CACHE_CONTROL
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _header(scope, name: bytes) -> str:
+    for key, value in scope.get("headers") or []:
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+class PrecompressedStaticFiles:
+    """
+    ASGI app serving a directory like StaticFiles, picking a .br or .gz variant by the
+    request's Accept-Encoding. ETags name the variant, so caches never mix encodings up.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = os.path.realpath(directory)
+
+    def _resolve(self, path: str) -> Optional[str]:
+        full_path = os.path.realpath(os.path.join(self.directory, path.lstrip("/")))
+        if not full_path.startswith(self.directory + os.sep) or not os.path.isfile(full_path):
+            return None
+        return full_path
+
+    async def __call__(self, scope, receive, send):
+        from starlette.responses import FileResponse, PlainTextResponse, Response
+
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405)
+            await response(scope, receive, send)
+            return
+
+        # Mount adds the mount point to root_path, the rest of the path is ours
+        path, root_path = scope["path"], scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        full_path = self._resolve(path)
+        if full_path is None:
+            await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+            return
+
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        variants = [encoding for encoding in available_encodings() if os.path.isfile(full_path + ENCODING_SUFFIXES[encoding])]
+        encoding = choose_encoding(_header(scope, b"accept-encoding"), variants) if variants else None
+        served_path = full_path + ENCODING_SUFFIXES[encoding] if encoding else full_path
+
+        stat_result = os.stat(served_path)
+        etag = f'"{stat_result.st_size:x}-{int(stat_result.st_mtime):x}{"-" + encoding if encoding else ""}"'
+        headers = {"cache-control": cache_control(full_path), "etag": etag}
+        if variants:
+            headers["vary"] = "Accept-Encoding"
+        if encoding:
+            headers["content-encoding"] = encoding
+
+        if etag_matches(_header(scope, b"if-none-match"), etag):
+            await Response(status_code=304, headers=headers)(scope, receive, send)
+            return
+        response = FileResponse(served_path, headers=headers, media_type=media_type, stat_result=stat_result)
+        await response(scope, receive, send)
+
+
+class InMemoryPage:
+    """A small file, e.g. index.html, kept in memory with its compressed variants"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.body = f.read()
+        self.media_type = mimetypes.guess_type(path)[0] or "text/html"
+        digest = hashlib.sha1(self.body).hexdigest()[:16]
+        self.variants: Dict[Optional[str], Tuple[bytes, str]] = {None: (self.body, f'"{digest}"')}
+        for encoding in available_encodings():
+            self.variants[encoding] = (compress(self.body, encoding, gzip_level=9, brotli_quality=11), f'"{digest}-{encoding}"')
+
+    def response(self, accept_encoding: str, if_none_match: str = ""):
+        from starlette.responses import Response
+
+        encoding = choose_encoding(accept_encoding, [e for e in self.variants if e is not None])
+        body, etag = self.variants[encoding]
+        # index.html names the current hashed bundles, so it is always revalidated
+        headers = {"cache-control": REVALIDATE_CACHE_CONTROL, "etag": etag, "vary": "Accept-Encoding"}
+        if encoding:
+            headers["content-encoding"] = encoding
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type=self.media_type, headers=headers)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for build_directory in sys.argv[1:] or ["frontend/build"]:
+        logger.info("Precompressed %s files in %s", precompress_directory(build_directory), build_directory)
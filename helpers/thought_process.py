@@ -0,0 +1,89 @@
+"""
+The agent's intermediate steps per conversation thread, kept out of /agent/query responses.
+A response only carries the turn number; the steps are fetched from
+/agent/thought-process/{thread_id} when someone wants to see them. Observations are
+truncated and each thread has a character budget, oldest turns dropped first.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import threading
+import time
+import os
+
+THOUGHT_PROCESS_MAX_THREADS = int(os.getenv("THOUGHT_PROCESS_MAX_THREADS", "1000"))
+THOUGHT_PROCESS_MAX_CHARS = int(os.getenv("THOUGHT_PROCESS_MAX_CHARS", "50000"))
+THOUGHT_PROCESS_MAX_OBSERVATION_CHARS = int(os.getenv("THOUGHT_PROCESS_MAX_OBSERVATION_CHARS", "4000"))
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}\n[... {len(text) - limit} more characters]"
+
+
+def summarize_steps(intermediate_steps: Sequence[Tuple[Any, Any]]) -> List[Dict[str, str]]:
+    """Plain, size-capped dicts of the agent's (AgentAction, observation) pairs"""
+    steps = []
+    for action, observation in intermediate_steps or []:
+        steps.append({
+            "tool": getattr(action, "tool", ""),
+            "tool_input": _truncate(str(getattr(action, "tool_input", "")), THOUGHT_PROCESS_MAX_OBSERVATION_CHARS),
+            "log": _truncate(getattr(action, "log", "") or "", THOUGHT_PROCESS_MAX_OBSERVATION_CHARS),
+            "observation": _truncate(str(observation), THOUGHT_PROCESS_MAX_OBSERVATION_CHARS),
+        })
+    return steps
+
+
+def format_turn(turn: Dict[str, Any]) -> str:
+    """A turn as text in the agent scratchpad layout, for the inline full_thought_process field"""
+    if not turn["steps"]:
+        return turn.get("note") or "No thought process generated"
+    return "\n".join(f"{step['log'].strip()}\nObservation: {step['observation']}" for step in turn["steps"])
+
+
+def _turn_chars(turn: Dict[str, Any]) -> int:
+    return len(turn["query"]) + len(turn.get("note") or "") + sum(len(value) for step in turn["steps"] for value in step.values())
+
+
+class ThoughtProcessStore:
+    """In-memory turns per thread, least recently used threads evicted first"""
+
+    def __init__(self, max_threads: int = THOUGHT_PROCESS_MAX_THREADS, max_chars: int = THOUGHT_PROCESS_MAX_CHARS):
+        self.max_threads = max_threads
+        self.max_chars = max_chars
+        self._threads: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, thread_id: str, query: str, intermediate_steps: Sequence[Tuple[Any, Any]] = (), note: Optional[str] = None) -> Dict[str, Any]:
+        """Store one turn of a thread and return it, with its turn number"""
+        with self._lock:
+            thread = self._threads.pop(thread_id, None) or {"next_turn": 1, "turns": []}
+            turn = {
+                "turn": thread["next_turn"],
+                "created_at": time.time(),
+                "query": _truncate(query, THOUGHT_PROCESS_MAX_OBSERVATION_CHARS),
+                "note": note,
+                "steps": summarize_steps(intermediate_steps),
+            }
+            thread["next_turn"] += 1
+            thread["turns"].append(turn)
+            # The latest turn is always kept, even if it alone is over the budget
+            while len(thread["turns"]) > 1 and sum(_turn_chars(t) for t in thread["turns"]) > self.max_chars:
+                thread["turns"].pop(0)
+            self._threads[thread_id] = thread
+            while len(self._threads) > self.max_threads:
+                self._threads.popitem(last=False)
+            return turn
+
+    def get(self, thread_id: str, turn: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """The stored turns of a thread, or only the given one. None if there are none."""
+        with self._lock:
+            thread = self._threads.get(thread_id)
+            if thread is None:
+                return None
+            turns = [t for t in thread["turns"] if turn is None or t["turn"] == turn]
+            return turns or None
+
+    def clear(self, thread_id: str) -> None:
+        with self._lock:
+            self._threads.pop(thread_id, None)
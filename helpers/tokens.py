@@ -0,0 +1,273 @@
+"""
+Token accounting: counting with the Llama-3 tokenizer, generation budgets per LLM call and
+token budgets per conversation thread and per day.
+
+The tokenizer is read from LLM_TOKENIZER_FILE (a Hugging Face tokenizer.json), or downloaded
+there, by load_tokenizer() at startup, off the request path. Until it is ready, and without
+it or the tokenizers package, counts fall back to the four-characters-per-token estimate, and
+the context safety margin grows to cover its error.
+
+The thread a call belongs to is carried in a context variable set with token_scope(), so the
+LLM wrapper can check budgets without every chain passing the thread id along.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional
+import functools
+import threading
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER_FILE = os.getenv("LLM_TOKENIZER_FILE", "/app/data/tokenizer.json")
+# Downloaded to TOKENIZER_FILE at startup when the file is missing and a token is set
+TOKENIZER_REPO = os.getenv("LLM_TOKENIZER_REPO", "meta-llama/Llama-3.3-70B-Instruct")
+
+# Tokens kept free between prompt and context end, for chat template tokens the prompt text lacks
+CONTEXT_SAFETY_TOKENS = int(os.getenv("LLM_CONTEXT_SAFETY_TOKENS", "64"))
+# The character estimate can be off by this fraction either way on code and non-English text
+ESTIMATE_SAFETY_FRACTION = 0.15
+# Below this many new tokens there is no point in calling the model
+MIN_NEW_TOKENS = int(os.getenv("LLM_MIN_NEW_TOKENS", "64"))
+
+TOKEN_BUDGET_PER_THREAD = int(os.getenv("TOKEN_BUDGET_PER_THREAD", "0"))  # 0 means no limit
+TOKEN_BUDGET_PER_DAY = int(os.getenv("TOKEN_BUDGET_PER_DAY", "0"))  # 0 means no limit
+TOKEN_LEDGER_MAX_THREADS = 10000
+
+
+class TokenBudgetExceeded(RuntimeError):
+    """A thread or the whole service used up its token budget"""
+
+
+class ContextWindowExceeded(ValueError):
+    """The prompt leaves no room for an answer in the model's context window"""
+
+
+_tokenizer = None
+_tokenizer_loaded = False
+_tokenizer_lock = threading.Lock()
+
+
+def _load_tokenizer():
+    try:
+        from tokenizers import Tokenizer
+    except ImportError:
+        logger.info("tokenizers is not installed, token counts are estimated from text length")
+        return None
+
+    if os.path.exists(TOKENIZER_FILE):
+        return Tokenizer.from_file(TOKENIZER_FILE)
+    token = os.getenv("HUGGINGFACEHUB_API_TOKEN")
+    if not token or not TOKENIZER_REPO:
+        logger.info("No tokenizer at %s, token counts are estimated from text length", TOKENIZER_FILE)
+        return None
+    # The Llama repos are gated, so the download needs the same token as the endpoint
+    tokenizer = Tokenizer.from_pretrained(TOKENIZER_REPO, token=token)
+    try:
+        os.makedirs(os.path.dirname(TOKENIZER_FILE) or ".", exist_ok=True)
+        tokenizer.save(TOKENIZER_FILE)
+    except OSError as e:
+        logger.info("Could not keep the tokenizer at %s: %s", TOKENIZER_FILE, e)
+    return tokenizer
+
+
+def load_tokenizer():
+    """
+    Load the Llama-3 tokenizer, downloading it if needed. Blocks for as long as that takes, so
+    the app calls it from a startup thread; requests never wait for it.
+    """
+    global _tokenizer, _tokenizer_loaded
+    with _tokenizer_lock:
+        if not _tokenizer_loaded:
+            try:
+                _tokenizer = _load_tokenizer()
+            except Exception as e:
+                logger.warning("Tokenizer unavailable, token counts are estimated from text length: %s", e)
+                _tokenizer = None
+            _tokenizer_loaded = True
+            if _tokenizer is not None:
+                # Counts made before this were estimates
+                _count.cache_clear()
+                logger.info("Token counts use the Llama-3 tokenizer")
+    return _tokenizer
+
+
+def get_tokenizer():
+    """The Llama-3 tokenizer, or None when counts are estimated, including while it is loading"""
+    return _tokenizer
+
+
+def tokens_are_estimated() -> bool:
+    return get_tokenizer() is None
+
+
+@functools.lru_cache(maxsize=32)
+def _count(text: str) -> int:
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return max(1, len(text) // 4)
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def count_tokens(text: str) -> int:
+    """Tokens of a text. The same prompt is counted by several callbacks, so counts are cached."""
+    return _count(text) if text else 0
+
+
+def context_safety_tokens(prompt_tokens: int) -> int:
+    if tokens_are_estimated():
+        return CONTEXT_SAFETY_TOKENS + int(prompt_tokens * ESTIMATE_SAFETY_FRACTION)
+    return CONTEXT_SAFETY_TOKENS
+
+
+@dataclass
+class TokenScope:
+    """Tokens of one request, optionally belonging to a conversation thread"""
+    kind: str
+    thread_id: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    calls: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.calls += 1
+
+    def usage(self) -> Dict[str, int]:
+        return {"prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens, "llm_calls": self.calls}
+
+
+_current_scope: ContextVar[Optional[TokenScope]] = ContextVar("token_scope", default=None)
+
+
+@contextmanager
+def token_scope(kind: str, thread_id: Optional[str] = None) -> Iterator[TokenScope]:
+    """LLM calls made inside the block, in this thread or tasks copying its context, count towards it"""
+    scope = TokenScope(kind=kind, thread_id=thread_id)
+    reset_token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(reset_token)
+
+
+def token_accounted(kind: str):
+    """Decorator running an async endpoint in its own token scope, like traced() does for spans"""
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with token_scope(kind):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current_scope() -> Optional[TokenScope]:
+    return _current_scope.get()
+
+
+class TokenLedger:
+    """Tokens used per thread (least recently used threads forgotten first) and per UTC day"""
+
+    def __init__(self, per_thread: int = TOKEN_BUDGET_PER_THREAD, per_day: int = TOKEN_BUDGET_PER_DAY, max_threads: int = TOKEN_LEDGER_MAX_THREADS):
+        self.per_thread = per_thread
+        self.per_day = per_day
+        self.max_threads = max_threads
+        self._threads: "OrderedDict[str, int]" = OrderedDict()
+        self._day = self._today()
+        self._day_total = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def _roll_day(self) -> None:
+        today = self._today()
+        if today != self._day:
+            self._day, self._day_total = today, 0
+
+    def remaining(self, thread_id: Optional[str] = None) -> Optional[int]:
+        """Tokens left for the thread and the day, whichever is less. None if neither is limited."""
+        with self._lock:
+            self._roll_day()
+            limits = []
+            if self.per_day:
+                limits.append(self.per_day - self._day_total)
+            if self.per_thread and thread_id:
+                limits.append(self.per_thread - self._threads.get(thread_id, 0))
+            return max(0, min(limits)) if limits else None
+
+    def check(self, thread_id: Optional[str] = None) -> None:
+        """Raise TokenBudgetExceeded if the thread or the day has no tokens left"""
+        with self._lock:
+            self._roll_day()
+            if self.per_day and self._day_total >= self.per_day:
+                raise TokenBudgetExceeded(f"The daily budget of {self.per_day} tokens is used up, try again tomorrow")
+            if self.per_thread and thread_id and self._threads.get(thread_id, 0) >= self.per_thread:
+                raise TokenBudgetExceeded(f"This conversation used its budget of {self.per_thread} tokens, please start a new one")
+
+    def record(self, tokens: int, thread_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._roll_day()
+            self._day_total += tokens
+            if thread_id:
+                self._threads[thread_id] = self._threads.pop(thread_id, 0) + tokens
+                while len(self._threads) > self.max_threads:
+                    self._threads.popitem(last=False)
+
+    def day_total(self) -> int:
+        with self._lock:
+            self._roll_day()
+            return self._day_total
+
+    def thread_total(self, thread_id: str) -> int:
+        with self._lock:
+            return self._threads.get(thread_id, 0)
+
+
+token_ledger = TokenLedger()
+
+
+def plan_generation(prompt: str, max_new_tokens: int, context_window: int) -> Dict[str, int]:
+    """
+    Count the prompt and pick the max_new_tokens of one call: the request type's cap, cut to
+    what is left of the context window and of the current thread's and the day's budgets.
+    Raises ContextWindowExceeded or TokenBudgetExceeded when fewer than MIN_NEW_TOKENS remain.
+    """
+    scope = current_scope()
+    thread_id = scope.thread_id if scope else None
+    token_ledger.check(thread_id)
+
+    prompt_tokens = count_tokens(prompt)
+    available = context_window - prompt_tokens - context_safety_tokens(prompt_tokens)
+    if available < min(MIN_NEW_TOKENS, max_new_tokens):
+        raise ContextWindowExceeded(
+            f"The prompt has {prompt_tokens} tokens, which leaves no room for an answer in the {context_window} token context"
+        )
+    planned = min(max_new_tokens, available)
+
+    remaining = token_ledger.remaining(thread_id)
+    if remaining is not None:
+        # The prompt is spent as soon as the call is made, the answer has to fit in the rest
+        if remaining - prompt_tokens < min(MIN_NEW_TOKENS, planned):
+            raise TokenBudgetExceeded("Not enough tokens left in the budget for this request")
+        planned = min(planned, remaining - prompt_tokens)
+    return {"prompt_tokens": prompt_tokens, "max_new_tokens": planned}
+
+
+def record_generation(prompt_tokens: int, completion: str) -> int:
+    """Book one finished call on the current scope and the ledger. Returns its completion tokens."""
+    completion_tokens = count_tokens(completion)
+    scope = current_scope()
+    if scope is not None:
+        scope.add(prompt_tokens, completion_tokens)
+    token_ledger.record(prompt_tokens + completion_tokens, scope.thread_id if scope else None)
+    return completion_tokens
@@ -0,0 +1,20 @@
+"""
+Shared helper for the layers that wrap agent tools (cassette, speculative prefetch,
+passthrough handles) without changing what the model sees.
+"""
+from langchain_core.tools import BaseTool, StructuredTool
+from typing import Any, Callable
+import functools
+
+
+def rewrap_tool(tool: BaseTool, func: Callable[..., Any]) -> BaseTool:
+    """
+    Same tool running func instead of its own function. functools.wraps keeps the original
+    signature, so the rendered tool description does not change.
+    """
+    return StructuredTool.from_function(
+        func=functools.wraps(tool.func)(func),
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema
+    )
@@ -0,0 +1,248 @@
+"""
+OpenTelemetry tracing for the agents, tools and PDP pipeline.
+
+Spans are exported to the console or to a JSON lines file, selected with TRACING_EXPORTER
+(`console`, `file` or `none`). When OpenTelemetry is not installed or tracing is off,
+`span()` and the callback handler do nothing, so call sites never need to check.
+"""
+from langchain_core.callbacks import BaseCallbackHandler
+from .tokens import count_tokens, tokens_are_estimated
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from uuid import UUID
+import functools
+import threading
+import logging
+import asyncio
+import json
+import os
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import context as otel_context, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExporter, SpanExportResult
+    from opentelemetry.trace import Status, StatusCode
+except ImportError:
+    trace = None
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "/app/data/traces/spans.jsonl")
+
+# Attribute values are capped so a whole CV or web page never ends up in a span
+MAX_ATTRIBUTE_LENGTH = 500
+
+
+if trace is not None:
+    class JsonLinesSpanExporter(SpanExporter):
+        """Appends one JSON object per finished span to a local file"""
+
+        def __init__(self, path: str):
+            self.path = path
+            self._lock = threading.Lock()
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        def export(self, spans: Sequence[Any]) -> "SpanExportResult":
+            lines = [json.dumps(json.loads(span.to_json())) for span in spans]
+            try:
+                with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            except OSError as e:
+                logger.warning("Could not write spans to %s: %s", self.path, e)
+                return SpanExportResult.FAILURE
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self) -> None:
+            pass
+
+
+def _create_tracer():
+    if trace is None or TRACING_EXPORTER in ("", "none", "off", "false"):
+        return None
+    if TRACING_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    elif TRACING_EXPORTER == "file":
+        try:
+            exporter = JsonLinesSpanExporter(TRACING_FILE)
+        except OSError as e:
+            logger.warning("Tracing disabled, could not create %s: %s", TRACING_FILE, e)
+            return None
+    else:
+        logger.warning("Unknown TRACING_EXPORTER '%s', tracing disabled", TRACING_EXPORTER)
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": "career-coach-agent"}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    return provider.get_tracer("career-coach-agent")
+
+
+_tracer = _create_tracer()
+
+
+def tracing_enabled() -> bool:
+    return _tracer is not None
+
+
+def _attribute(value: Any) -> Any:
+    if isinstance(value, (bool, int, float)):
+        return value
+    text = str(value)
+    return text if len(text) <= MAX_ATTRIBUTE_LENGTH else text[:MAX_ATTRIBUTE_LENGTH] + "..."
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Span around a block, nested under the current span. Yields None when tracing is off."""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name) as current:
+        for key, value in attributes.items():
+            if value is not None:
+                current.set_attribute(key, _attribute(value))
+        yield current
+
+
+def current_context() -> Any:
+    """Context to hand to work that runs on another thread, so its spans keep their parent"""
+    return otel_context.get_current() if _tracer is not None else None
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Turns LangChain callbacks into spans: one per chain step (prompt render, LLM call, output
+    parsing), per LLM call and per tool call, parented by LangChain's run ids.
+
+    Create one per request, since the agent runs on a worker thread where the request's span
+    is not current. Runs without a LangChain parent hang off `parent_context` instead.
+    """
+
+    def __init__(self, thread_id: Optional[str] = None, parent_context: Any = None):
+        self.thread_id = thread_id
+        self.parent_context = parent_context
+        self._spans: Dict[UUID, Any] = {}
+        self._tokens: Dict[UUID, Any] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, name: str, run_id: UUID, parent_run_id: Optional[UUID], **attributes: Any) -> Any:
+        if _tracer is None:
+            return None
+        with self._lock:
+            parent = self._spans.get(parent_run_id) if parent_run_id else None
+        context = trace.set_span_in_context(parent) if parent is not None else self.parent_context
+        current = _tracer.start_span(name, context=context)
+        if self.thread_id:
+            current.set_attribute("thread_id", self.thread_id)
+        for key, value in attributes.items():
+            if value is not None:
+                current.set_attribute(key, _attribute(value))
+        with self._lock:
+            self._spans[run_id] = current
+        return current
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None, **attributes: Any) -> None:
+        with self._lock:
+            current = self._spans.pop(run_id, None)
+        if current is None:
+            return
+        for key, value in attributes.items():
+            if value is not None:
+                current.set_attribute(key, _attribute(value))
+        if error is not None:
+            current.record_exception(error)
+            current.set_status(Status(StatusCode.ERROR, str(error)))
+        current.end()
+
+    @staticmethod
+    def _name(serialized: Optional[Dict[str, Any]], kwargs: Dict[str, Any], default: str) -> str:
+        if kwargs.get("name"):
+            return kwargs["name"]
+        if serialized:
+            return serialized.get("name") or (serialized.get("id") or [default])[-1]
+        return default
+
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        name = self._name(serialized, kwargs, "chain")
+        self._start(f"chain.{name}", run_id, parent_run_id, **{"langchain.run_type": kwargs.get("run_type") or "chain"})
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        params = kwargs.get("invocation_params") or {}
+        prompt = "".join(prompts)
+        self._start(
+            "llm",
+            run_id,
+            parent_run_id,
+            **{
+                "llm.model": params.get("model_name") or params.get("model") or params.get("repo_id") or self._name(serialized, kwargs, "llm"),
+                "llm.prompt_chars": len(prompt),
+                "llm.prompt_tokens": count_tokens(prompt),
+            }
+        )
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        text = "".join(generation.text for generations in response.generations for generation in generations)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        self._end(
+            run_id,
+            **{
+                "llm.completion_chars": len(text),
+                "llm.completion_tokens": usage.get("completion_tokens") or count_tokens(text),
+                "llm.tokens_estimated": not usage and tokens_are_estimated(),
+            }
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        name = self._name(serialized, kwargs, "tool")
+        current = self._start(f"tool.{name}", run_id, parent_run_id, **{"tool.name": name, "tool.input": input_str})
+        if current is not None:
+            # Tools run synchronously on this thread, so spans opened inside them nest here
+            with self._lock:
+                self._tokens[run_id] = otel_context.attach(trace.set_span_in_context(current))
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._detach(run_id)
+        self._end(run_id, **{"tool.output_chars": len(str(output))})
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._detach(run_id)
+        self._end(run_id, error)
+
+    def _detach(self, run_id: UUID) -> None:
+        with self._lock:
+            token = self._tokens.pop(run_id, None)
+        if token is not None:
+            try:
+                otel_context.detach(token)
+            except Exception:
+                pass
+
+
+def traced(name: str):
+    """Decorator that wraps a sync or async function in a span"""
+    def decorate(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
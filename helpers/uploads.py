@@ -0,0 +1,136 @@
+"""
+Size-capped upload handling. Request bodies of upload routes are limited before they are
+parsed, and uploaded files are copied to disk in chunks, so no upload is ever held in memory
+as a whole.
+"""
+from typing import Dict, Optional
+import tempfile
+import asyncio
+import json
+import os
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# Acrobat accepts the header anywhere in the first 1024 bytes, so we do too
+PDF_MAGIC = b"%PDF-"
+PDF_MAGIC_WINDOW = 1024
+
+
+class UploadTooLarge(ValueError):
+    """An upload went over its size limit, reported as 413"""
+
+
+class UploadLimitMiddleware:
+    """
+    Rejects requests to the given path prefixes with 413 once their body goes over the
+    limit: straight away from Content-Length, or while streaming for chunked bodies. Without
+    it the whole multipart body is received and parsed before the endpoint can say no.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    def _limit(self, path: str) -> Optional[int]:
+        matches = [prefix for prefix in self.limits if path.startswith(prefix)]
+        return self.limits[max(matches, key=len)] if matches else None
+
+    async def __call__(self, scope, receive, send):
+        limit = self._limit(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+        response_started = False
+        rejected = False
+
+        # The 413 is sent from here: raising inside receive would reach the app's form parser,
+        # which reports any error while reading the body as a 400
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    rejected = True
+                    if not response_started:
+                        await self._reject(send, limit)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if rejected:
+                return  # The 413 already went out, whatever the app answers to the disconnect is dropped
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except Exception:
+            if not rejected:
+                raise
+
+    @staticmethod
+    async def _reject(send, limit: int) -> None:
+        body = json.dumps({"detail": f"Upload is larger than {limit // (1024 * 1024)} MB"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def save_pdf_upload(upload, max_bytes: int) -> str:
+    """
+    Copy an uploaded PDF to a temporary file chunk by chunk and return its path. Raises
+    ValueError if it does not start like a PDF and UploadTooLarge as soon as it goes over
+    max_bytes. The caller removes the file.
+    """
+    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+    size = 0
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            if size == 0 and PDF_MAGIC not in chunk[:PDF_MAGIC_WINDOW]:
+                raise ValueError("Only PDF files are allowed")
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"The CV is larger than {max_bytes // (1024 * 1024)} MB")
+            await asyncio.to_thread(tmp_file.write, chunk)
+        if size == 0:
+            raise ValueError("Empty file uploaded")
+        tmp_file.close()
+        return tmp_file.name
+    except BaseException:
+        tmp_file.close()
+        os.unlink(tmp_file.name)
+        raise
+
+
+async def read_upload(upload, max_bytes: int) -> bytes:
+    """Read a whole upload, giving up with UploadTooLarge as soon as it goes over max_bytes"""
+    chunks = []
+    size = 0
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(f"{upload.filename} is larger than {max_bytes // (1024 * 1024)} MB")
+        chunks.append(chunk)
+    return b"".join(chunks)
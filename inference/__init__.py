@@ -0,0 +1,8 @@
+from .resilient_llm import ResilientLLM, CircuitBreaker, CircuitOpenError, LLMDeadlineExceeded
+from .openai_compatible import OpenAICompatibleLLM
+from .backends import build_llm, register_backend, load_route_config
+
+__all__ = [
+    "ResilientLLM", "CircuitBreaker", "CircuitOpenError", "LLMDeadlineExceeded",
+    "OpenAICompatibleLLM", "build_llm", "register_backend", "load_route_config"
+]
@@ -0,0 +1,203 @@
+from langchain_core.language_models.llms import BaseLLM
+from .resilient_llm import ResilientLLM, CircuitBreaker
+from .openai_compatible import OpenAICompatibleLLM
+from helpers.cassette import CassetteLLM, get_cassette
+from typing import Any, Callable, Dict, Optional
+import threading
+import logging
+import yaml
+import os
+
+logger = logging.getLogger(__name__)
+
+MODELS_FILE = os.getenv("LLM_MODELS_FILE", "models.yaml")
+
+# Context of routes that don't set context_window (or n_ctx for llama.cpp)
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Sampling settings shared by every backend unless a route overrides them
+GENERATION_DEFAULTS = {
+    "temperature": 0.1,  # Slightly higher for more natural responses
+    "top_p": 0.9,  # More diverse responses
+    "repetition_penalty": 1.15,  # Stronger penalty to avoid "Human:"
+}
+
+# Keys that may be overridden from the environment and how to parse them
+_ROUTE_KEYS: Dict[str, Callable[[str], Any]] = {
+    "backend": str,
+    "model": str,
+    "provider": str,
+    "base_url": str,
+    "api_key": str,
+    "model_path": str,
+    "max_new_tokens": int,
+    "timeout": float,
+    "temperature": float,
+    "top_p": float,
+    "repetition_penalty": float,
+    "n_ctx": int,
+    "context_window": int,
+    "n_threads": int,
+    "streaming": lambda value: value.lower() == "true",
+}
+
+# Settings from before per-route configs, still read as the route key they used to set.
+# LLM_TIMEOUT was the chat deadline, so it is not the global timeout override.
+DEPRECATED_ENV = {
+    "LLM_TIMEOUT": ("chat", "timeout", "LLM_CHAT_TIMEOUT"),
+    "PDP_LLM_TIMEOUT": ("pdp", "timeout", "LLM_PDP_TIMEOUT"),
+}
+_deprecation_warned = set()
+
+_backends: Dict[str, Callable[[Dict[str, Any]], BaseLLM]] = {}
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def register_backend(name: str, factory: Callable[[Dict[str, Any]], BaseLLM]) -> None:
+    """Register a factory that builds a LangChain LLM from a route config"""
+    _backends[name] = factory
+
+
+def load_route_config(route: str, models_file: Optional[str] = None) -> Dict[str, Any]:
+    """Read the route from models.yaml and apply LLM_<KEY> and LLM_<ROUTE>_<KEY> overrides"""
+    with open(models_file or MODELS_FILE, 'r') as stream:
+        routes = yaml.safe_load(stream).get("routes", {})
+
+    if route not in routes:
+        raise ValueError(f"Unknown model route '{route}'. Configured routes: {', '.join(routes)}")
+
+    config = {**GENERATION_DEFAULTS, **routes[route]}
+    for key, parse in _ROUTE_KEYS.items():
+        env_names = [f"LLM_{key.upper()}"] if f"LLM_{key.upper()}" not in DEPRECATED_ENV else []
+        # The new per-route name wins over the old one
+        env_names += [old for old, (old_route, old_key, _) in DEPRECATED_ENV.items() if (old_route, old_key) == (route, key)]
+        env_names.append(f"LLM_{route.upper()}_{key.upper()}")
+        for env_name in env_names:
+            value = os.getenv(env_name)
+            if value:
+                config[key] = parse(value)
+                _warn_deprecated(env_name)
+    return config
+
+
+def _warn_deprecated(env_name: str) -> None:
+    if env_name in DEPRECATED_ENV and env_name not in _deprecation_warned:
+        _deprecation_warned.add(env_name)
+        logger.warning("%s is deprecated, set %s instead", env_name, DEPRECATED_ENV[env_name][2])
+
+
+def build_llm(route: str, **overrides: Any) -> ResilientLLM:
+    """Build the LLM for a route, wrapped with deadlines, retries and a circuit breaker"""
+    config = {**load_route_config(route), **overrides}
+    backend = config.get("backend", "hf")
+    cassette = get_cassette()
+    if cassette is not None and cassette.mode == "replay":
+        # Completions come from the cassette, the backend is never built
+        client = CassetteLLM(route=route, cassette=cassette)
+    elif backend not in _backends:
+        raise ValueError(f"Unknown LLM backend '{backend}' for route '{route}'. Available: {', '.join(_backends)}")
+    else:
+        client = _backends[backend](config)
+        if cassette is not None:
+            client = CassetteLLM(llm=client, route=route, cassette=cassette)
+
+    logger.info("Model route '%s': backend=%s, model=%s", route, backend, config.get('model') or config.get('model_path'))
+
+    hedge_delay = os.getenv('LLM_HEDGE_DELAY')
+    return ResilientLLM(
+        llm=client,
+        model_name=str(config.get("model") or config.get("model_path") or backend),
+        timeout=config["timeout"],
+        total_timeout=config["timeout"] * 2,
+        max_retries=int(os.getenv('LLM_MAX_RETRIES', '2')),
+        hedge=os.getenv('LLM_HEDGE', 'false').lower() == 'true',
+        hedge_delay=float(hedge_delay) if hedge_delay else None,
+        circuit_breaker=_circuit_breaker_for(backend, config),
+        max_new_tokens=config["max_new_tokens"],
+        # llama.cpp has exactly the context it was loaded with
+        context_window=config.get("n_ctx", DEFAULT_CONTEXT_WINDOW) if backend == "llamacpp" else config.get("context_window", DEFAULT_CONTEXT_WINDOW),
+        # LlamaCpp passes its kwargs straight to llama-cpp-python, which calls it max_tokens
+        max_tokens_param="max_tokens" if backend == "llamacpp" else "max_new_tokens"
+    )
+
+
+def _circuit_breaker_for(backend: str, config: Dict[str, Any]) -> CircuitBreaker:
+    """Routes that hit the same upstream share one circuit breaker"""
+    upstream = f"{backend}:{config.get('base_url') or config.get('model') or config.get('model_path')}"
+    with _circuit_breakers_lock:
+        if upstream not in _circuit_breakers:
+            _circuit_breakers[upstream] = CircuitBreaker(
+                failure_threshold=int(os.getenv('LLM_CIRCUIT_FAILURE_THRESHOLD', '5')),
+                reset_timeout=float(os.getenv('LLM_CIRCUIT_RESET_TIMEOUT', '30'))
+            )
+        return _circuit_breakers[upstream]
+
+
+def _hf_backend(config: Dict[str, Any]) -> BaseLLM:
+    from langchain_huggingface import HuggingFaceEndpoint
+
+    # Token authentication for Hugging Face
+    if not os.getenv('HUGGINGFACEHUB_API_TOKEN'):
+        raise ValueError("Please set HUGGINGFACEHUB_API_TOKEN environment variable")
+
+    return HuggingFaceEndpoint(
+        repo_id=config["model"],
+        huggingfacehub_api_token=os.getenv('HUGGINGFACEHUB_API_TOKEN'),
+        provider=config.get("provider", "hf-inference"),
+        task="text-generation",
+        temperature=config["temperature"],
+        max_new_tokens=config["max_new_tokens"],
+        top_p=config["top_p"],
+        repetition_penalty=config["repetition_penalty"],
+        do_sample=True,
+        verbose=True,
+        return_full_text=False,
+        streaming=config.get("streaming", False),
+        # Not longer than ResilientLLM's attempt deadline, so abandoned calls end with it
+        timeout=max(1, int(config["timeout"]))
+    )
+
+
+def _openai_backend(config: Dict[str, Any]) -> BaseLLM:
+    if not config.get("base_url"):
+        raise ValueError("The openai backend needs a base_url, e.g. LLM_BASE_URL=http://localhost:8080/v1")
+
+    return OpenAICompatibleLLM(
+        base_url=config["base_url"],
+        model=config["model"],
+        api_key=config.get("api_key"),
+        max_new_tokens=config["max_new_tokens"],
+        temperature=config["temperature"],
+        top_p=config["top_p"],
+        repetition_penalty=config["repetition_penalty"],
+        streaming=config.get("streaming", False),
+        timeout=config["timeout"]
+    )
+
+
+def _llamacpp_backend(config: Dict[str, Any]) -> BaseLLM:
+    from langchain_community.llms import LlamaCpp
+
+    if not config.get("model_path"):
+        raise ValueError("The llamacpp backend needs a model_path to a GGUF file, e.g. LLM_MODEL_PATH=/models/llama-3.2-3b.gguf")
+
+    try:
+        return LlamaCpp(
+            model_path=config["model_path"],
+            n_ctx=config.get("n_ctx", DEFAULT_CONTEXT_WINDOW),
+            n_threads=config.get("n_threads"),
+            max_tokens=config["max_new_tokens"],
+            temperature=config["temperature"],
+            top_p=config["top_p"],
+            repeat_penalty=config["repetition_penalty"],
+            streaming=config.get("streaming", False),
+            verbose=False
+        )
+    except ImportError:
+        raise ValueError("The llamacpp backend needs llama-cpp-python: pip install llama-cpp-python")
+
+
+register_backend("hf", _hf_backend)
+register_backend("openai", _openai_backend)
+register_backend("llamacpp", _llamacpp_backend)
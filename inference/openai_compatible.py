@@ -0,0 +1,95 @@
+from langchain_core.language_models.llms import LLM
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.outputs import GenerationChunk
+from typing import Any, Dict, Iterator, List, Optional
+import requests
+import json
+
+
+class OpenAICompatibleLLM(LLM):
+    """
+    Text completion client for any server that speaks the OpenAI `/v1/completions` API
+    (vLLM, TGI, llama.cpp server, LM Studio, Ollama). Only `requests` is needed.
+    """
+
+    base_url: str = "http://localhost:8080/v1"
+    model: str
+    api_key: Optional[str] = None
+    max_new_tokens: int = 1024
+    temperature: float = 0.1
+    top_p: float = 0.9
+    repetition_penalty: Optional[float] = None
+    streaming: bool = False
+    timeout: float = 120
+
+    @property
+    def _llm_type(self) -> str:
+        return "openai_compatible"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"base_url": self.base_url, "model": self.model}
+
+    def _payload(self, prompt: str, stop: Optional[List[str]], stream: bool, **kwargs: Any) -> Dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "max_tokens": kwargs.pop("max_new_tokens", self.max_new_tokens),
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "stream": stream,
+        }
+        if stop:
+            payload["stop"] = stop
+        if self.repetition_penalty is not None:
+            payload["repetition_penalty"] = self.repetition_penalty
+        payload.update(kwargs)
+        return payload
+
+    def _post(self, payload: Dict[str, Any]) -> requests.Response:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        response = requests.post(
+            f"{self.base_url.rstrip('/')}/completions",
+            json=payload,
+            headers=headers,
+            timeout=self.timeout,
+            stream=payload["stream"],
+        )
+        response.raise_for_status()
+        return response
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        if self.streaming:
+            return "".join(chunk.text for chunk in self._stream(prompt, stop, run_manager, **kwargs))
+
+        response = self._post(self._payload(prompt, stop, stream=False, **kwargs))
+        return response.json()["choices"][0]["text"]
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        response = self._post(self._payload(prompt, stop, stream=True, **kwargs))
+        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            text = json.loads(data)["choices"][0].get("text", "")
+            if text:
+                chunk = GenerationChunk(text=text)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text)
+                yield chunk
@@ -0,0 +1,294 @@
+from langchain_core.language_models.llms import LLM, BaseLLM
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from helpers.metrics import LLM_MAX_NEW_TOKENS, LLM_PROMPT_TOKENS, TOKEN_BUDGET_REJECTIONS
+from helpers.tokens import ContextWindowExceeded, TokenBudgetExceeded, plan_generation, record_generation
+from pydantic import Field, PrivateAttr
+from tenacity import RetryCallState
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from collections import deque
+from typing import Any, Dict, List, Optional
+import contextvars
+import threading
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Shared pool for upstream calls so that a deadline or a hedge never blocks the caller
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-call")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when the circuit breaker rejects a call without contacting the upstream"""
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """Raised when an LLM call does not finish within its deadline"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker shared by all clients of the same upstream.
+
+    closed -> open after `failure_threshold` consecutive failures,
+    open -> half-open after `reset_timeout` seconds (a single trial call is let through),
+    half-open -> closed on success, back to open on failure.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_ignored(self) -> None:
+        """The call failed for a reason that says nothing about the upstream's health"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._state() != "open":
+                    logger.warning("LLM circuit breaker opened after %s consecutive failures", self._failures)
+                self._opened_at = time.monotonic()
+
+
+class _AttemptRunManager:
+    """
+    Run manager of one attempt. It stops passing on streamed tokens once the attempt is given
+    up, so a timed-out request that keeps streaming does not mix into the next attempt's text.
+    """
+
+    def __init__(self, run_manager: CallbackManagerForLLMRun):
+        self._run_manager = run_manager
+        self.abandoned = False
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if not self.abandoned:
+            self._run_manager.on_llm_new_token(token, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._run_manager, name)
+
+
+def _retry_state(attempt: int, error: Exception, delay: float) -> RetryCallState:
+    """The failed attempt in the form LangChain's on_retry callbacks take"""
+    state = RetryCallState(retry_object=None, fn=None, args=(), kwargs={})
+    state.attempt_number = attempt + 1
+    state.idle_for = delay
+    state.set_exception((type(error), error, error.__traceback__))
+    return state
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Client errors (bad request, auth, not found) will not succeed on a retry"""
+    if isinstance(error, CircuitOpenError) or getattr(error, "retryable", True) is False:
+        return False
+    response = getattr(error, "response", None)
+    status_code = getattr(response, "status_code", None)
+    if isinstance(status_code, int) and 400 <= status_code < 500:
+        return status_code in (408, 425, 429)
+    return True
+
+
+class ResilientLLM(LLM):
+    """
+    Wraps a LangChain LLM with per-call deadlines, retries with exponential backoff and
+    full jitter, an optional hedged second request and a circuit breaker. Every call is
+    counted, and its max_new_tokens cut to what the context window and token budgets leave.
+
+    The wrapper is itself an LLM, so it can be bound with stop sequences and piped into
+    the agent chains exactly like the endpoint it wraps.
+    """
+
+    llm: BaseLLM
+    model_name: str = ""  # Model behind the wrapped client, used to label logs and metrics
+    # Deadline for a single attempt in seconds. The wrapped client's own request timeout must not
+    # be longer, or calls abandoned at the deadline keep holding a worker of the shared pool
+    timeout: float = 90.0
+    total_timeout: float = 180.0  # Budget for all attempts including backoff sleeps
+    max_retries: int = 2
+    backoff_base: float = 1.0
+    backoff_max: float = 10.0
+    hedge: bool = False
+    hedge_percentile: float = 0.95
+    hedge_min_samples: int = 20  # Observed latencies needed before the percentile is trusted
+    hedge_delay: Optional[float] = None  # Fixed hedge threshold used until enough samples exist
+    circuit_breaker: CircuitBreaker = Field(default_factory=CircuitBreaker)
+    max_new_tokens: int = 1024  # Cap for calls that don't pass their own max_new_tokens
+    context_window: int = 8192
+    max_tokens_param: str = "max_new_tokens"  # Name of the generation limit in the backend's kwargs
+
+    _latencies: deque = PrivateAttr(default_factory=lambda: deque(maxlen=200))
+    _latency_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return f"resilient_{self.llm._llm_type}"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {
+            **self.llm._identifying_params,
+            "model_name": self.model_name,
+            "timeout": self.timeout,
+            "max_retries": self.max_retries,
+            "hedge": self.hedge,
+        }
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        requested = kwargs.pop("max_new_tokens", None) or kwargs.pop(self.max_tokens_param, None) or self.max_new_tokens
+        try:
+            plan = plan_generation(prompt, requested, self.context_window)
+        except ContextWindowExceeded:
+            TOKEN_BUDGET_REJECTIONS.labels("context").inc()
+            raise
+        except TokenBudgetExceeded:
+            TOKEN_BUDGET_REJECTIONS.labels("budget").inc()
+            raise
+        kwargs[self.max_tokens_param] = plan["max_new_tokens"]
+        LLM_PROMPT_TOKENS.labels(self.model_name).observe(plan["prompt_tokens"])
+        LLM_MAX_NEW_TOKENS.labels(self.model_name).observe(plan["max_new_tokens"])
+
+        deadline = time.monotonic() + self.total_timeout
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.max_retries + 1):
+            if not self.circuit_breaker.allow_request():
+                raise CircuitOpenError("LLM upstream is unavailable (circuit open), failing fast")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            try:
+                result = self._attempt(prompt, stop, run_manager, min(self.timeout, remaining), kwargs)
+            except Exception as e:
+                last_error = e
+                # A bad request is answered by a healthy upstream and must not open the circuit
+                if not _is_retryable(e):
+                    self.circuit_breaker.record_ignored()
+                    break
+                self.circuit_breaker.record_failure()
+                if attempt == self.max_retries:
+                    break
+
+                delay = self._backoff(attempt)
+                if time.monotonic() + delay >= deadline:
+                    break
+                logger.warning("LLM call failed on attempt %s (%s: %s), retrying in %.2fs", attempt + 1, type(e).__name__, e, delay)
+                if run_manager:
+                    # Streaming callbacks start over with the next attempt's tokens
+                    run_manager.on_retry(_retry_state(attempt, e, delay))
+                time.sleep(delay)
+                continue
+
+            self.circuit_breaker.record_success()
+            record_generation(plan["prompt_tokens"], result)
+            return result
+
+        if last_error is not None:
+            raise last_error
+        raise LLMDeadlineExceeded(f"LLM call exceeded its {self.total_timeout}s budget")
+
+    def _attempt(
+        self,
+        prompt: str,
+        stop: Optional[List[str]],
+        run_manager: Optional[CallbackManagerForLLMRun],
+        timeout: float,
+        kwargs: Dict[str, Any],
+    ) -> str:
+        """Run one attempt, hedging it with a duplicate request if it is slower than usual"""
+        started = time.monotonic()
+
+        def call(manager: Optional[CallbackManagerForLLMRun]) -> str:
+            call_started = time.monotonic()
+            result = self.llm._call(prompt, stop=stop, run_manager=manager, **kwargs)
+            self._record_latency(time.monotonic() - call_started)
+            return result
+
+        # Only the primary request reports streamed tokens, so callbacks never see them twice. It
+        # runs in the caller's context, which callbacks such as speculative prefetching read.
+        attempt_manager = _AttemptRunManager(run_manager) if run_manager else None
+        futures = [_executor.submit(contextvars.copy_context().run, call, attempt_manager)]
+
+        hedge_after = self._hedge_after()
+        if hedge_after is not None and hedge_after < timeout:
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done:
+                logger.info("LLM call slower than %.2fs, sending hedged request", hedge_after)
+                futures.append(_executor.submit(call, None))
+
+        error: Optional[Exception] = None
+        try:
+            for future in as_completed(futures, timeout=max(0.0, timeout - (time.monotonic() - started))):
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+        except TimeoutError:
+            raise LLMDeadlineExceeded(f"LLM call did not finish within {timeout:.1f}s")
+        finally:
+            if attempt_manager:
+                attempt_manager.abandoned = True
+        raise error
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record_latency(self, seconds: float) -> None:
+        with self._latency_lock:
+            self._latencies.append(seconds)
+
+    def _hedge_after(self) -> Optional[float]:
+        """Delay after which a hedged request is sent, or None when hedging is off"""
+        if not self.hedge:
+            return None
+        with self._latency_lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.hedge_min_samples:
+            return self.hedge_delay
+        index = min(len(samples) - 1, int(self.hedge_percentile * len(samples)))
+        return samples[index]
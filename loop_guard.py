@@ -0,0 +1,231 @@
+"""
+Loop detection for ReAct runs.
+
+Models regularly repeat an action they already took, typically the same google_job_search
+after an empty result. AgentExecutor would run the tool again and spend one of its
+max_iterations on it. LoopGuardExecutor keeps the observations of the current run, answers an
+exact or near-duplicate call of an idempotent tool from them with a hint to move on, and ends
+the run once the model has repeated itself LOOP_GUARD_MAX_REPEATS times, answering from the
+repeated call's result instead of looping until the iteration limit.
+"""
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+from langchain_core.callbacks import CallbackManagerForChainRun
+from langchain_core.tools import BaseTool
+from helpers.helper import clean_input
+from helpers.metrics import LOOP_GUARD_CONVERGED, LOOP_GUARD_ITERATIONS_SAVED, LOOP_GUARD_REPEATS, LOOP_GUARD_SECONDS_SAVED
+from tools.speculative import IDEMPOTENT_TOOLS
+from tools.passthrough import HANDLE_PATTERN
+from tools.job_index import QUERY_STOPWORDS
+from tools.retrieval import asking
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+import logging
+import time
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+LOOP_GUARD_ENABLED = os.getenv("LOOP_GUARD", "true").lower() == "true"
+
+# Repeated actions after which a run is considered converged and ends
+LOOP_GUARD_MAX_REPEATS = int(os.getenv("LOOP_GUARD_MAX_REPEATS", "2"))
+
+REPEAT_HINT = (
+    "\n[Note: you already ran {tool} with {match} input in this conversation turn and the result above is the same. "
+    "Do not run it again. Write your Final Answer from what you have, or use a different tool or input.]"
+)
+CONVERGED_ANSWER = "Here is what I found:\n\n{result}"
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def normalize_action_input(tool_input: Any) -> str:
+    """Input as the tools see it: cleaned, first line only, unquoted, case and spacing folded"""
+    cleaned = clean_input(str(tool_input)).strip()
+    first_line = cleaned.split("\n")[0] if cleaned else ""
+    return " ".join(first_line.strip().strip('"\'').lower().split())
+
+
+def content_words(text: str) -> frozenset:
+    """
+    Words of an input that change what a search returns. Two inputs with the same content words
+    only differ in filler ("jobs", "in", "position") or word order; any other difference, even a
+    single city or seniority, is a different search.
+    """
+    return frozenset(word for word in WORD_PATTERN.findall(text) if word not in QUERY_STOPWORDS)
+
+
+@dataclass
+class ToolResult:
+    observation: str
+    seconds: float
+
+
+@dataclass
+class RunState:
+    """What one run of an executor has seen so far"""
+    results: Dict[Tuple[str, str], ToolResult] = field(default_factory=dict)
+    repeats: int = 0
+    iterations: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    converged_observation: Optional[str] = None
+    converged: bool = False
+
+    def lookup(self, tool: str, tool_input: str) -> Optional[Tuple[str, ToolResult]]:
+        """An earlier result of the same call, as ("exact" or "near", result)"""
+        exact = self.results.get((tool, tool_input))
+        if exact is not None:
+            return "exact", exact
+        words = content_words(tool_input)
+        if not words:
+            return None
+        for (previous_tool, previous_input), result in self.results.items():
+            if previous_tool == tool and content_words(previous_input) == words:
+                return "near", result
+        return None
+
+
+_run_state: ContextVar[Optional[RunState]] = ContextVar("loop_guard_run", default=None)
+
+
+class LoopGuardStats:
+    """Repeated actions caught and the iterations and seconds that saved, per agent"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _agent(self, agent: str) -> Dict[str, float]:
+        return self._stats.setdefault(agent, {
+            "runs": 0, "exact_repeats": 0, "near_repeats": 0, "converged_runs": 0,
+            "iterations_saved": 0, "seconds_saved": 0.0
+        })
+
+    def record_run(self, agent: str) -> None:
+        with self._lock:
+            self._agent(agent)["runs"] += 1
+
+    def record_repeat(self, agent: str, match: str, seconds: float) -> None:
+        LOOP_GUARD_REPEATS.labels(agent, match).inc()
+        LOOP_GUARD_SECONDS_SAVED.labels(agent).inc(seconds)
+        with self._lock:
+            stats = self._agent(agent)
+            stats[f"{match}_repeats"] += 1
+            stats["seconds_saved"] += seconds
+
+    def record_convergence(self, agent: str, iterations: int, seconds: float) -> None:
+        LOOP_GUARD_CONVERGED.labels(agent).inc()
+        LOOP_GUARD_ITERATIONS_SAVED.labels(agent).inc(iterations)
+        LOOP_GUARD_SECONDS_SAVED.labels(agent).inc(seconds)
+        with self._lock:
+            stats = self._agent(agent)
+            stats["converged_runs"] += 1
+            stats["iterations_saved"] += iterations
+            stats["seconds_saved"] += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {agent: dict(stats) for agent, stats in self._stats.items()}
+
+
+loop_guard_stats = LoopGuardStats()
+
+
+class LoopGuardExecutor(AgentExecutor):
+    """
+    AgentExecutor that memoizes idempotent tool calls within a run and stops runs that only
+    repeat themselves. The run state lives in a context variable, so one executor serves
+    concurrent requests.
+    """
+
+    guard_name: str = "agent"
+    guard_enabled: bool = LOOP_GUARD_ENABLED
+    # Whether a run that keeps repeating itself ends with the repeated result as its answer. Off
+    # for agents whose answer is not a tool result, such as a PDP; those only get the hint.
+    finish_on_convergence: bool = True
+
+    def _call(self, inputs: Dict[str, str], run_manager: Optional[CallbackManagerForChainRun] = None) -> Dict[str, Any]:
+        token = _run_state.set(RunState())
+        if self.guard_enabled:
+            loop_guard_stats.record_run(self.guard_name)
+        try:
+            # Retrieval tools pick the parts of long pages relevant to the user's message
+            with asking(str(inputs.get("input", ""))):
+                return super()._call(inputs, run_manager=run_manager)
+        finally:
+            _run_state.reset(token)
+
+    def _should_continue(self, iterations: int, time_elapsed: float) -> bool:
+        state = _run_state.get()
+        if state is None or not self.guard_enabled:
+            return super()._should_continue(iterations, time_elapsed)
+        state.iterations = iterations
+        return not state.converged and super()._should_continue(iterations, time_elapsed)
+
+    def _perform_agent_action(
+        self,
+        name_to_tool_map: Dict[str, BaseTool],
+        color_mapping: Dict[str, str],
+        agent_action: AgentAction,
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> AgentStep:
+        state = _run_state.get()
+        if state is None or not self.guard_enabled or agent_action.tool not in IDEMPOTENT_TOOLS or agent_action.tool not in name_to_tool_map:
+            return super()._perform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+
+        tool_input = normalize_action_input(agent_action.tool_input)
+        previous = state.lookup(agent_action.tool, tool_input)
+        if previous is None:
+            started = time.perf_counter()
+            step = super()._perform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+            observation = str(step.observation)
+            # Errors are worth one more try, so they are not kept
+            if not observation.lstrip().startswith("Error"):
+                state.results[(agent_action.tool, tool_input)] = ToolResult(observation, time.perf_counter() - started)
+            return step
+
+        match, result = previous
+        state.repeats += 1
+        loop_guard_stats.record_repeat(self.guard_name, match, result.seconds)
+        logger.info("Repeated %s call (%s match), answered from this run's earlier result", agent_action.tool, match)
+        if run_manager:
+            run_manager.on_agent_action(agent_action, color="green")
+
+        if self.finish_on_convergence and state.repeats >= LOOP_GUARD_MAX_REPEATS:
+            state.converged = True
+            state.converged_observation = result.observation
+            # The iteration this step belongs to is counted once the executor resumes its loop
+            done = state.iterations + 1
+            saved = max(0, self.max_iterations - done) if self.max_iterations else 0
+            # Each skipped iteration would have cost about as much as the ones so far
+            per_iteration = (time.perf_counter() - state.started) / done
+            loop_guard_stats.record_convergence(self.guard_name, saved, saved * per_iteration)
+            logger.info("Run converged after %s iterations, %s skipped", done, saved)
+
+        return AgentStep(
+            action=agent_action,
+            observation=result.observation + REPEAT_HINT.format(tool=agent_action.tool, match="the same" if match == "exact" else "almost the same")
+        )
+
+    def _return(
+        self,
+        output: AgentFinish,
+        intermediate_steps: List[Tuple[AgentAction, str]],
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        state = _run_state.get()
+        if state is not None and state.converged and state.converged_observation is not None:
+            output = AgentFinish({"output": converged_answer(state.converged_observation)}, log="Converged on repeated actions")
+        return super()._return(output, intermediate_steps, run_manager=run_manager)
+
+
+def converged_answer(observation: str) -> str:
+    """Final answer of a converged run: the repeated call's result, by handle when it has one"""
+    handle = HANDLE_PATTERN.search(observation)
+    if handle:
+        return CONVERGED_ANSWER.format(result=handle.group(0))
+    return CONVERGED_ANSWER.format(result=observation.strip())
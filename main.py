@@ -2,11 +2,7 @@ import uvicorn
 from app import app
 import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+logger = logging.getLogger(__name__)
 
 def main():
     """
@@ -15,7 +11,7 @@ def main():
     port = 8000
     host = "0.0.0.0"
 
-    logging.info(f"Starting server on {host}:{port}...")
+    logger.info("Starting server on %s:%s...", host, port)
     uvicorn.run(app, host=host, port=port)
 
 if __name__ == "__main__":
@@ -1,27 +1,30 @@
 from langchain.agents.output_parsers import ReActSingleInputOutputParser
 from langchain.schema import AgentAction, AgentFinish
+from helpers.metrics import PARSER_PATHS, PDP_VALIDATION_FAILURES
+from pdp_structure import parse_pdp, validate_pdp
 import re
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+logger = logging.getLogger(__name__)
+
 
 class FlexibleOutputParser(ReActSingleInputOutputParser):
+    def _record_path(self, path):
+        """Count which branch produced the result, to see how often the fallbacks are needed"""
+        PARSER_PATHS.labels(type(self).__name__, path).inc()
+
     def parse(self, text):
         # Clean up the text first
         text = text.strip()
-        logging.info(f"Raw LLM output: {text[:200]}...")  # Debug output
+        logger.debug("Raw LLM output: %s", text)
 
         # CRITICAL: Detect if LLM generated both Action and Final Answer
         has_action = "Action:" in text
         has_final_answer = "Final Answer:" in text
 
         if has_action and has_final_answer:
-            logging.info("ERROR: LLM generated both Action and Final Answer - extracting Action only")
+            logger.info("ERROR: LLM generated both Action and Final Answer - extracting Action only")
+            self._record_path("action_and_final_answer")
             # Extract only the Action part, ignore Final Answer
             lines = text.split('\n')
             action_lines = []
@@ -30,7 +33,7 @@ class FlexibleOutputParser(ReActSingleInputOutputParser):
                     break  # Stop at Final Answer
                 action_lines.append(line)
             text = '\n'.join(action_lines).strip()
-            logging.info(f"Cleaned text: {text}")
+            logger.debug("Cleaned text: %s", text)
 
         # Remove any trailing "Observation" that appears without content
         text = re.sub(r'\nObservation\s*:?\s*$', '', text)
@@ -38,6 +41,7 @@ class FlexibleOutputParser(ReActSingleInputOutputParser):
 
         # Handle direct responses (greetings, simple questions)
         if not any(keyword in text for keyword in ["Thought:", "Action:", "Final Answer:"]):
+            self._record_path("direct_response")
             return AgentFinish(
                 return_values={"output": text},
                 log=text
@@ -46,6 +50,7 @@ class FlexibleOutputParser(ReActSingleInputOutputParser):
         # Handle responses that start with Final Answer directly
         if text.startswith("Final Answer:"):
             final_answer = text.replace("Final Answer:", "").strip()
+            self._record_path("final_answer_prefix")
             return AgentFinish(
                 return_values={"output": final_answer},
                 log=text
@@ -53,9 +58,11 @@ class FlexibleOutputParser(ReActSingleInputOutputParser):
 
         try:
             # Try standard ReAct parsing first
-            return super().parse(text)
+            result = super().parse(text)
+            self._record_path("standard")
+            return result
         except Exception as e:
-            logging.info(f"Standard parsing failed: {e}")
+            logger.info("Standard parsing failed: %s", e)
             # Custom parsing for malformed ReAct format
             return self._parse_malformed_react(text)
 
@@ -63,6 +70,7 @@ class FlexibleOutputParser(ReActSingleInputOutputParser):
         """Handle cases where Action is cut off"""
         if "Action:" in text and "Action Input:" not in text:
             # Action was truncated, treat as final answer
+            self._record_path("truncated_action")
             return AgentFinish(
                 return_values={"output": "I need to search for more information. Could you please ask your question again?"},
                 log=text
@@ -80,9 +88,10 @@ class FlexibleOutputParser(ReActSingleInputOutputParser):
 
         # NEW: Handle "Action: None" case - this should be a final answer
         if "Action: None" in text:
-            logging.info("Detected 'Action: None' - treating as final answer")
+            logger.info("Detected 'Action: None' - treating as final answer")
             # Extract everything before "Action: None"
             final_text = text.split("Action: None")[0].strip()
+            self._record_path("action_none")
             return AgentFinish(
                 return_values={"output": final_text},
                 log=text
@@ -90,7 +99,8 @@ class FlexibleOutputParser(ReActSingleInputOutputParser):
 
         # Check if this is a response that should be a Final Answer but is missing the prefix
         if self._should_be_final_answer(text):
-            logging.info("Detected response that should be Final Answer - treating as final answer")
+            logger.info("Detected response that should be Final Answer - treating as final answer")
+            self._record_path("missing_final_answer_prefix")
             return AgentFinish(
                 return_values={"output": text},
                 log=text
@@ -98,7 +108,8 @@ class FlexibleOutputParser(ReActSingleInputOutputParser):
 
         # Check if this looks like job search results that should be preserved as-is
         if self._is_job_search_result(text) and "Action:" not in text:
-            logging.info("Detected job search results in full text - preserving formatting")
+            logger.info("Detected job search results in full text - preserving formatting")
+            self._record_path("job_search_results")
             return AgentFinish(
                 return_values={"output": text},
                 log=text
@@ -123,13 +134,14 @@ class FlexibleOutputParser(ReActSingleInputOutputParser):
 
                 # NEW: If action is "None", treat everything before as final answer
                 if action.lower() == "none":
-                    logging.info("Found 'Action: None' - treating preceding text as final answer")
+                    logger.info("Found 'Action: None' - treating preceding text as final answer")
                     # Get all text before this Action line
                     preceding_lines = lines[:i]
                     final_text = "\n".join(preceding_lines).strip()
                     # Remove "Thought:" prefix if present
                     if final_text.startswith("Thought:"):
                         final_text = final_text.replace("Thought:", "").strip()
+                    self._record_path("action_none")
                     return AgentFinish(
                         return_values={"output": final_text},
                         log=text
@@ -168,7 +180,8 @@ class FlexibleOutputParser(ReActSingleInputOutputParser):
 
         # Check for incomplete action
         if action and not action_input and action.lower() != "none":
-            logging.info("ERROR: Action without Action Input - treating as final answer")
+            logger.info("ERROR: Action without Action Input - treating as final answer")
+            self._record_path("truncated_action")
             return AgentFinish(
                 return_values={"output": "I apologize, but I need more information to help you properly. Could you please rephrase your question?"},
                 log=text
@@ -176,8 +189,9 @@ class FlexibleOutputParser(ReActSingleInputOutputParser):
 
         # If we have action and action_input, return AgentAction
         if action and action_input and action.lower() != "none":
-            logging.info(f"Parsed Action: {action}")
-            logging.info(f"Parsed Action Input: '{action_input[:100]}...'")
+            logger.info("Parsed Action: %s", action)
+            logger.debug("Parsed Action Input: %s", action_input)
+            self._record_path("malformed_action")
             return AgentAction(
                 tool=action,
                 tool_input=action_input,
@@ -186,12 +200,14 @@ class FlexibleOutputParser(ReActSingleInputOutputParser):
 
         # If we have final_answer, return AgentFinish
         if final_answer:
+            self._record_path("malformed_final_answer")
             return AgentFinish(
                 return_values={"output": final_answer},
                 log=text
             )
 
         # Fallback: return the whole text as final answer
+        self._record_path("whole_text")
         return AgentFinish(
             return_values={"output": text},
             log=text
@@ -359,53 +375,15 @@ def validate_pdp_response(response_text: str) -> bool:
     """
     Validate if the PDP response is properly formatted and complete
     """
-    # Check for minimum length
-    if len(response_text.strip()) < 500:
-        print("PDP_VALIDATION_FAILED on length:" ,len(response_text.strip()))
-        return False
-    
-    # Check for required sections
-    required_sections = [
-        "Current Skills Assessment",
-        "Skills Gap Analysis", 
-        "Learning Objectives",
-        "Recommended Training",
-        "Timeline",
-        "Progress Tracking"
-    ]
-    
-    found_sections = 0
-    for section in required_sections:
-        if section.lower() in response_text.lower():
-            found_sections += 1
-    
-    # Require at least 4 out of 6 sections
-    if found_sections < 4:
-        print("PDP_VALIDATION_FAILED on number of sections: ",found_sections)
-        return False
-    
-    # Check for problematic patterns
-    problematic_patterns = [
-        "```python",  # Unfinished code blocks
-        "SyntaxError",
-        "Action:",
-        "Action Input:",
-        "Observation:",
-        "Let's correct this",
-        "There was an issue",
-        "skill_gaps =",  # Incomplete variable assignments
-    ]
-    
-    for pattern in problematic_patterns:
-        if pattern in response_text:
-            print("PDP_VALIDATION_FAILED on pattern:" ,pattern)
-            return False
-    
-    return True
+    report = validate_pdp(parse_pdp(response_text))
+    if not report.valid:
+        logger.warning("PDP validation failed on %s", report.reason, extra={"total_chars": report.total_chars, "found_sections": report.found_sections})
+        PDP_VALIDATION_FAILURES.labels(report.reason).inc()
+    return report.valid
 
 class PDPOutputParser(FlexibleOutputParser):
     def parse(self, text):
-        print(f"PDPOutputParser: Processing {len(text)} characters")
+        logger.info("PDPOutputParser: Processing %s characters", len(text))
 
         # Clean special tokens first
         text = re.sub(r'<\|eot_id\|>', '', text)
@@ -431,7 +409,8 @@ class PDPOutputParser(FlexibleOutputParser):
         pdp_content = re.sub(r'\n\s*\n\s*\n', '\n\n', pdp_content)  # Remove excessive newlines
         pdp_content = pdp_content.strip()
 
-        print(f"PDPOutputParser: Cleaned to {len(pdp_content)} characters")
+        logger.info("PDPOutputParser: Cleaned to %s characters", len(pdp_content))
+        self._record_path("pdp_sections")
 
         return AgentFinish(
             return_values={"output": pdp_content},
@@ -0,0 +1,267 @@
+"""
+PDP export formats and the cache of rendered files.
+
+Renderers are registered per format and turn a StructuredPDP into bytes. Rendered files are
+cached under a content address, the hash of the plan and its header fields, so downloading
+the same plan again or in another format never runs the model and costs a file read.
+"""
+from helpers.helper import create_pdp_pdf
+from helpers.metrics import RENDER_CACHE
+from pdp_structure import StructuredPDP
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional
+import threading
+import hashlib
+import logging
+import shutil
+import html
+import json
+import time
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+RENDER_CACHE_ENABLED = os.getenv("PDP_RENDER_CACHE", "true").lower() == "true"
+RENDER_CACHE_DIR = os.getenv("PDP_RENDER_CACHE_DIR", "/app/data/pdp_exports")
+RENDER_CACHE_TTL_HOURS = float(os.getenv("PDP_RENDER_CACHE_TTL_HOURS", "72"))
+
+
+class PDPRenderer(NamedTuple):
+    media_type: str
+    extension: str
+    render: Callable[[StructuredPDP, str, str], bytes]
+
+
+_renderers: Dict[str, PDPRenderer] = {}
+
+
+def register_renderer(name: str, renderer: PDPRenderer) -> None:
+    """Register an export format under the name used in the format parameter"""
+    _renderers[name] = renderer
+
+
+def get_renderer(name: str) -> PDPRenderer:
+    if name not in _renderers:
+        raise ValueError(f"Unknown format '{name}'. Available formats: {', '.join(_renderers)}")
+    return _renderers[name]
+
+
+def available_formats() -> List[str]:
+    return list(_renderers)
+
+
+def render_pdf(pdp: StructuredPDP, career_goal: str, target_date: str) -> bytes:
+    return create_pdp_pdf(pdp_content=pdp, career_goal=career_goal, target_date=target_date, filename="").getvalue()
+
+
+def render_markdown(pdp: StructuredPDP, career_goal: str, target_date: str) -> bytes:
+    header = (
+        "# Personal Development Plan\n\n"
+        f"**Career Goal:** {career_goal}  \n"
+        f"**Target Date:** {target_date}  \n"
+        f"**Generated on:** {datetime.now().strftime('%B %d, %Y')}\n\n"
+    )
+    return (header + pdp.to_markdown() + "\n").encode("utf-8")
+
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Personal Development Plan - {career_goal}</title>
+<style>
+body {{ font-family: Helvetica, Arial, sans-serif; max-width: 800px; margin: 40px auto; line-height: 1.5; }}
+h1 {{ color: #2E86AB; text-align: center; }}
+h2 {{ color: #A23B72; margin-top: 28px; }}
+h3 {{ color: #F18F01; margin-left: 20px; }}
+p {{ margin: 6px 20px; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+# The same styles the PDF renderer uses for each block type
+HTML_TAGS = {"title": "h1", "heading": "h2", "subheading": "h3", "body": "p"}
+
+
+def _html_text(text: str) -> str:
+    """Escape a block's text, keeping the <b> tags format_markdown_line puts in for bold"""
+    return html.escape(text).replace("&lt;b&gt;", "<b>").replace("&lt;/b&gt;", "</b>")
+
+
+def render_html(pdp: StructuredPDP, career_goal: str, target_date: str) -> bytes:
+    lines = [
+        "<h1>Personal Development Plan</h1>",
+        f"<p><b>Career Goal:</b> {html.escape(career_goal)}</p>",
+        f"<p><b>Target Date:</b> {html.escape(target_date)}</p>",
+        f"<p><b>Generated on:</b> {datetime.now().strftime('%B %d, %Y')}</p>",
+    ]
+    for block_type, text in pdp.blocks():
+        tag = HTML_TAGS.get(block_type, "p")
+        lines.append(f"<{tag}>{_html_text(text)}</{tag}>")
+    return HTML_TEMPLATE.format(career_goal=html.escape(career_goal), body="\n".join(lines)).encode("utf-8")
+
+
+def render_docx(pdp: StructuredPDP, career_goal: str, target_date: str) -> bytes:
+    """Word document built from the HTML export with spire.doc"""
+    try:
+        from spire.doc import Document, FileFormat, Stream
+    except ImportError:
+        raise ValueError("DOCX export needs the spire.doc package")
+
+    document = Document()
+    try:
+        document.AddSection().AddParagraph().AppendHTML(render_html(pdp, career_goal, target_date).decode("utf-8"))
+        stream = Stream()
+        document.SaveToStream(stream, FileFormat.Docx2016)
+        return bytes(stream.ToArray())
+    finally:
+        document.Close()
+
+
+register_renderer("pdf", PDPRenderer("application/pdf", "pdf", render_pdf))
+register_renderer("docx", PDPRenderer("application/vnd.openxmlformats-officedocument.wordprocessingml.document", "docx", render_docx))
+register_renderer("md", PDPRenderer("text/markdown; charset=utf-8", "md", render_markdown))
+register_renderer("html", PDPRenderer("text/html; charset=utf-8", "html", render_html))
+
+
+def pdp_content_id(pdp: StructuredPDP, career_goal: str, target_date: str) -> str:
+    """Content address of a plan: the same plan for the same goal and date always gets the same id"""
+    canonical = json.dumps(
+        {"career_goal": career_goal, "target_date": target_date, "pdp": pdp.model_dump(include={"preamble", "sections"})},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+# Ids come from URLs, so anything else is rejected before it gets near a path
+PDP_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+class RenderCache:
+    """
+    One directory per plan id holding the plan as JSON and every format rendered from it.
+    Plans older than the TTL are removed, at most once an hour, when a new plan is stored.
+    """
+
+    def __init__(self, directory: str = RENDER_CACHE_DIR, ttl_hours: float = RENDER_CACHE_TTL_HOURS):
+        self.directory = directory
+        self.ttl_seconds = ttl_hours * 3600
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self._last_prune = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def store(self, pdp: StructuredPDP, career_goal: str, target_date: str) -> str:
+        """Keep the plan so any format can be rendered from it later, and return its id"""
+        pdp_id = pdp_content_id(pdp, career_goal, target_date)
+        plan_dir = os.path.join(self.directory, pdp_id)
+        plan_path = os.path.join(plan_dir, "pdp.json")
+        if os.path.exists(plan_path):
+            # Storing the same plan again counts as a fresh use for the TTL
+            os.utime(plan_path)
+        else:
+            os.makedirs(plan_dir, exist_ok=True)
+            entry = {"career_goal": career_goal, "target_date": target_date, "pdp": pdp.model_dump()}
+            self._write(plan_path, json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        self._prune()
+        return pdp_id
+
+    def plan(self, pdp_id: str) -> Optional[Dict]:
+        """The stored plan with its career goal and target date, None if unknown or expired"""
+        if not PDP_ID_PATTERN.fullmatch(pdp_id):
+            return None
+        plan_path = os.path.join(self.directory, pdp_id, "pdp.json")
+        try:
+            if time.time() - os.path.getmtime(plan_path) > self.ttl_seconds:
+                return None
+            with open(plan_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        entry["pdp"] = StructuredPDP.model_validate(entry["pdp"])
+        return entry
+
+    def render(self, pdp_id: str, format_name: str) -> Optional[bytes]:
+        """The plan rendered in the format, from the cache or rendered now. None if the plan is unknown."""
+        renderer = get_renderer(format_name)
+        if not PDP_ID_PATTERN.fullmatch(pdp_id):
+            return None
+        artifact_path = os.path.join(self.directory, pdp_id, f"{format_name}.{renderer.extension}")
+        with self._key_lock(f"{pdp_id}/{format_name}"):
+            try:
+                with open(artifact_path, "rb") as f:
+                    RENDER_CACHE.labels(format_name, "hit").inc()
+                    return f.read()
+            except FileNotFoundError:
+                pass
+
+            entry = self.plan(pdp_id)
+            if entry is None:
+                return None
+            RENDER_CACHE.labels(format_name, "miss").inc()
+            data = renderer.render(entry["pdp"], entry["career_goal"], entry["target_date"])
+            try:
+                self._write(artifact_path, data)
+            except OSError as e:
+                logger.warning("Could not cache the %s export of %s: %s", format_name, pdp_id, e)
+            return data
+
+    def _prune(self) -> None:
+        now = time.time()
+        if now - self._last_prune < 3600:
+            return
+        self._last_prune = now
+        for pdp_id in os.listdir(self.directory):
+            plan_path = os.path.join(self.directory, pdp_id, "pdp.json")
+            try:
+                expired = now - os.path.getmtime(plan_path) > self.ttl_seconds
+            except OSError:
+                expired = True
+            if expired:
+                shutil.rmtree(os.path.join(self.directory, pdp_id), ignore_errors=True)
+
+
+_render_cache: Optional[RenderCache] = None
+_render_cache_lock = threading.Lock()
+_render_cache_disabled = not RENDER_CACHE_ENABLED
+
+
+def get_render_cache() -> Optional[RenderCache]:
+    """Shared cache, or None if it is switched off or the directory cannot be created"""
+    global _render_cache, _render_cache_disabled
+    with _render_cache_lock:
+        if _render_cache is None and not _render_cache_disabled:
+            try:
+                _render_cache = RenderCache()
+            except Exception as e:
+                logger.warning("PDP render cache disabled: %s", e)
+                _render_cache_disabled = True
+        return _render_cache
+
+
+def export_pdp(pdp: StructuredPDP, career_goal: str, target_date: str, format_name: str) -> tuple:
+    """
+    Render a freshly generated plan. Returns (pdp_id, bytes), with pdp_id None when the
+    cache is switched off and the plan can't be downloaded again later.
+    """
+    cache = get_render_cache()
+    if cache is None:
+        return None, get_renderer(format_name).render(pdp, career_goal, target_date)
+    pdp_id = cache.store(pdp, career_goal, target_date)
+    return pdp_id, cache.render(pdp_id, format_name)
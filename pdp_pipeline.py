@@ -0,0 +1,344 @@
+"""
+Building blocks of the Personal Development Plan pipeline shared by the single and the
+batch PDP endpoints: CV extraction, the PDP request prompt and the role analysis that a
+whole cohort applying for the same role can share.
+"""
+from helpers.role_profiles import get_role_profile_cache
+from helpers.metrics import PDP_SECTIONS_REGENERATED, PDP_VALIDATION_FAILURES
+from helpers.tracing import span
+from helpers.uploads import PDF_MAGIC, PDF_MAGIC_WINDOW, UploadTooLarge
+from pdp_structure import PDP_SECTIONS, PDPValidationReport, StructuredPDP, parse_pdp, validate_pdp
+from datetime import datetime
+from typing import List, Optional, Tuple
+import tempfile
+import zipfile
+import logging
+import io
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Size limit for a single CV, uploaded directly or inside a zip
+MAX_CV_BYTES = int(os.getenv("PDP_MAX_CV_BYTES", str(20 * 1024 * 1024)))
+# Total size limit of the files in one batch request, and of the CVs unpacked from them
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("PDP_MAX_BATCH_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+PDP_BATCH_MAX_FILES = int(os.getenv("PDP_BATCH_MAX_FILES", "50"))
+# Entries of any kind a single zip may list; more is not a CV archive
+MAX_ZIP_ENTRIES = int(os.getenv("PDP_MAX_ZIP_ENTRIES", "200"))
+MAX_CV_PAGES = int(os.getenv("PDP_MAX_CV_PAGES", "20"))
+# CV text beyond this is not read, it would only crowd the PDP prompt
+MAX_CV_CHARS = int(os.getenv("PDP_MAX_CV_CHARS", "60000"))
+
+ROLE_ANALYSIS_MAX_TOKENS = int(os.getenv("PDP_ROLE_ANALYSIS_MAX_TOKENS", "768"))
+
+# Regenerate only the missing or broken sections of a PDP instead of failing the request
+SECTION_REPAIR_ENABLED = os.getenv("PDP_SECTION_REPAIR", "true").lower() == "true"
+SECTION_REPAIR_MAX_TOKENS_PER_SECTION = int(os.getenv("PDP_SECTION_REPAIR_MAX_TOKENS", "512"))
+
+SECTION_REPAIR_PROMPT = """{pdp_query}
+
+A draft of this plan already covers: {kept_sections}.
+Write ONLY the following sections, each starting with its exact "## " heading, and nothing else:
+
+{sections}
+"""
+
+ROLE_ANALYSIS_PROMPT = """You are a career coach. Describe what the role "{career_goal}" requires, independent of any candidate.
+Answer in concise markdown with exactly these headings and 5-8 bullet points each:
+
+### Required Skills
+### Certifications
+### Recommended Resources
+
+Do NOT ask questions, do NOT use tools and do NOT add any other text.
+"""
+
+_text_splitter = None
+
+
+def _get_text_splitter():
+    # Configure text splitter, created on the first PDP request
+    global _text_splitter
+    if _text_splitter is None:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        _text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=200,
+            length_function=len,
+        )
+    return _text_splitter
+
+
+def extract_cv_file(path: str) -> str:
+    """
+    Text of a CV PDF on disk. The page count is checked from the cross-reference table before
+    any page is parsed, then pages are extracted one at a time until MAX_CV_CHARS is reached.
+    Raises ValueError with a user-facing message if the PDF is unusable.
+    """
+    from langchain_core.documents import Document
+    from pypdf import PdfReader
+
+    with span("pdp.extract_cv", upload_bytes=os.path.getsize(path)) as stage, open(path, "rb") as pdf_file:
+        # Given a path pypdf reads the whole file into memory, given a file it seeks to the objects it needs
+        try:
+            reader = PdfReader(pdf_file, strict=False)
+            page_count = len(reader.pages)
+        except Exception as e:
+            raise ValueError(f"Error processing PDF: {str(e)}")
+        if page_count == 0:
+            raise ValueError("Could not extract content from PDF")
+        if page_count > MAX_CV_PAGES:
+            raise ValueError(f"The CV has {page_count} pages, at most {MAX_CV_PAGES} are allowed")
+
+        # Extract the text one page at a time, like PyPDFLoader does for the whole file
+        documents = []
+        cv_chars = 0
+        try:
+            for page_number, page in enumerate(reader.pages):
+                documents.append(Document(page_content=page.extract_text(), metadata={"source": path, "page": page_number}))
+                cv_chars += len(documents[-1].page_content)
+                if cv_chars >= MAX_CV_CHARS:
+                    logger.info("CV text truncated", extra={"pages_read": len(documents), "pages": page_count})
+                    break
+        except Exception as e:
+            raise ValueError(f"Error processing PDF: {str(e)}")
+        if not documents:
+            raise ValueError("Could not extract content from PDF")
+
+        # Split documents into chunks
+        chunks = _get_text_splitter().split_documents(documents)
+        if stage:
+            stage.set_attribute("pdf.pages", page_count)
+            stage.set_attribute("pdf.chunks", len(chunks))
+
+    if not chunks:
+        raise ValueError("No content could be extracted from the PDF")
+
+    cv_content = "\n".join([chunk.page_content for chunk in chunks])[:MAX_CV_CHARS]
+    if not cv_content.strip():
+        raise ValueError("No text content found in the PDF")
+    return cv_content
+
+
+def extract_cv_text(content: bytes) -> str:
+    """Text of a CV PDF held in memory, e.g. one read from a zip. See extract_cv_file."""
+    if PDF_MAGIC not in content[:PDF_MAGIC_WINDOW]:
+        raise ValueError("Error processing PDF: not a PDF file")
+
+    tmp_file_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+            tmp_file.write(content)
+            tmp_file_path = tmp_file.name
+        return extract_cv_file(tmp_file_path)
+    finally:
+        # Clean up temporary file if it exists
+        if tmp_file_path and os.path.exists(tmp_file_path):
+            try:
+                os.unlink(tmp_file_path)
+            except Exception as e:
+                logger.info("Error cleaning up temporary file: %s", e)
+
+
+def expand_cv_uploads(
+    uploads: List[Tuple[str, bytes]],
+    max_files: int = PDP_BATCH_MAX_FILES,
+    max_total_bytes: int = MAX_BATCH_UPLOAD_BYTES
+) -> List[Tuple[str, bytes]]:
+    """
+    Flatten uploaded PDFs and zips of PDFs into (filename, content) pairs.
+
+    Zips are unpacked against the file count and a budget of max_total_bytes for all CVs,
+    checked before and while each entry is decompressed, so a small zip of huge or countless
+    entries fails early instead of filling memory. Raises ValueError for too many files or a
+    bad archive and UploadTooLarge when the CVs go over the budget.
+    """
+    cvs = []
+    seen = set()
+    remaining_bytes = max_total_bytes
+
+    def add(name: str, data: bytes) -> None:
+        if len(cvs) >= max_files:
+            raise ValueError(f"At most {max_files} CVs can be processed in one batch")
+        # CVs with the same name in different zips would overwrite each other's PDP
+        base, ext = os.path.splitext(name)
+        unique, n = name, 1
+        while unique.lower() in seen:
+            n += 1
+            unique = f"{base}-{n}{ext}"
+        seen.add(unique.lower())
+        cvs.append((unique, data))
+
+    def reserve(size: int, what: str) -> None:
+        nonlocal remaining_bytes
+        if size > remaining_bytes:
+            raise UploadTooLarge(f"{what} goes over the {max_total_bytes // (1024 * 1024)} MB limit of one batch")
+        remaining_bytes -= size
+
+    for filename, content in uploads:
+        lower_name = (filename or "").lower()
+        if lower_name.endswith(".pdf"):
+            reserve(len(content), filename)
+            add(os.path.basename(filename), content)
+        elif lower_name.endswith(".zip"):
+            try:
+                archive = zipfile.ZipFile(io.BytesIO(content))
+            except zipfile.BadZipFile:
+                raise ValueError(f"{filename} is not a valid zip file")
+            entries = archive.infolist()
+            if len(entries) > MAX_ZIP_ENTRIES:
+                raise ValueError(f"{filename} has {len(entries)} entries, at most {MAX_ZIP_ENTRIES} are allowed")
+            for entry in entries:
+                name = os.path.basename(entry.filename)
+                if entry.is_dir() or entry.filename.startswith("__MACOSX/"):
+                    continue
+                if name.lower().endswith(".zip"):
+                    raise ValueError(f"{filename} contains the zip archive {name}, nested archives are not allowed")
+                if not name.lower().endswith(".pdf"):
+                    continue
+                if entry.file_size > MAX_CV_BYTES:
+                    raise UploadTooLarge(f"{name} in {filename} is larger than {MAX_CV_BYTES // (1024 * 1024)} MB")
+                if len(cvs) >= max_files:
+                    raise ValueError(f"At most {max_files} CVs can be processed in one batch")
+                reserve(entry.file_size, f"{name} in {filename}")
+                add(name, _read_entry(archive, entry, f"{name} in {filename}"))
+        else:
+            raise ValueError(f"Only PDF files or zip archives of PDF files are allowed, got {filename}")
+    return cvs
+
+
+def _read_entry(archive: zipfile.ZipFile, entry: zipfile.ZipInfo, what: str) -> bytes:
+    """Decompress an entry, reading no more than its declared size, which a forged header may understate"""
+    try:
+        with archive.open(entry) as f:
+            data = f.read(entry.file_size + 1)
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError, RuntimeError) as e:
+        raise ValueError(f"{what} could not be unpacked: {str(e)}")
+    if len(data) > entry.file_size:
+        raise ValueError(f"{what} is larger than its zip header says")
+    return data
+
+
+def build_pdp_query(
+    career_goal: str,
+    target_date: str,
+    cv_content: str,
+    additional_context: str = "",
+    role_profile: Optional[str] = None
+) -> str:
+    """The PDP request sent to the PDP agent, optionally with an already known role analysis"""
+    role_section = ""
+    if role_profile:
+        role_section = f"""
+        Requirements of the target role, already analysed. Use them for the Skills Gap Analysis and
+        Recommended Training sections instead of deriving them again:
+        {role_profile}
+"""
+
+    sections = "\n\n".join(
+        f"        ## {title}\n        [{instruction.format(target_date=target_date)}]" for title, instruction in PDP_SECTIONS
+    )
+    return f"""
+        Create a comprehensive Personal Development Plan for transitioning to {career_goal} by {target_date}.
+        DO NOT ASK FOR CONFIRMATION OF THIS REQUEST!
+
+        Based on this CV content: {cv_content}
+        Additional context: {additional_context}
+{role_section}
+        Structure your response with these exact sections:
+
+{sections}
+
+        Do NOT include any code execution and Python scripts.
+        Focus on creating a clear, actionable career development plan.
+        """
+
+
+def analyze_role(llm, career_goal: str, callbacks: Optional[list] = None) -> str:
+    """Skills, certifications and resources the target role needs, generated once per role"""
+    with span("pdp.role_analysis", career_goal=career_goal):
+        return llm.invoke(
+            ROLE_ANALYSIS_PROMPT.format(career_goal=career_goal),
+            config={"callbacks": callbacks} if callbacks else None,
+            max_new_tokens=ROLE_ANALYSIS_MAX_TOKENS
+        ).strip()
+
+
+def get_role_profile(llm, career_goal: str, callbacks: Optional[list] = None, analyze_uncached: bool = False) -> Optional[str]:
+    """
+    Role profile from the shared cache, analysed and stored on a miss. With the cache switched
+    off it is analysed for this request only if analyze_uncached is set, otherwise None.
+    """
+    cache = get_role_profile_cache()
+    if cache is None:
+        return analyze_role(llm, career_goal, callbacks) if analyze_uncached else None
+    with span("pdp.role_profile", career_goal=career_goal):
+        return cache.get_or_create(career_goal, lambda goal: analyze_role(llm, goal, callbacks))
+
+
+def pdp_filename(career_goal: str, cv_filename: Optional[str] = None, extension: str = "pdf") -> str:
+    """Download name of a PDP, with the CV name added when several are returned together"""
+    safe_career_goal = re.sub(r'[^\w\s-]', '', career_goal).strip()
+    safe_career_goal = re.sub(r'[-\s]+', '-', safe_career_goal)
+    if cv_filename:
+        safe_cv_name = re.sub(r'[^\w-]+', '-', os.path.splitext(os.path.basename(cv_filename))[0]).strip('-')
+        return f"PDP_{safe_career_goal}_{safe_cv_name}_{datetime.now().strftime('%Y%m%d')}.{extension}"
+    return f"PDP_{safe_career_goal}_{datetime.now().strftime('%Y%m%d')}.{extension}"
+
+
+def regenerate_sections(
+    llm,
+    pdp_query: str,
+    pdp: StructuredPDP,
+    section_titles: List[str],
+    target_date: str,
+    callbacks: Optional[list] = None
+) -> StructuredPDP:
+    """Ask the model for just the given sections and merge them into the plan"""
+    instructions = dict(PDP_SECTIONS)
+    prompt = SECTION_REPAIR_PROMPT.format(
+        pdp_query=pdp_query.strip(),
+        kept_sections=", ".join(pdp_section.title for pdp_section in pdp.sections if pdp_section.key and pdp_section.key not in section_titles) or "nothing yet",
+        sections="\n\n".join(f"## {title}\n[{instructions[title].format(target_date=target_date)}]" for title in section_titles),
+    )
+    with span("pdp.regenerate_sections", sections=",".join(section_titles)):
+        response = llm.invoke(
+            prompt,
+            config={"callbacks": callbacks} if callbacks else None,
+            max_new_tokens=SECTION_REPAIR_MAX_TOKENS_PER_SECTION * len(section_titles)
+        )
+    regenerated = parse_pdp(response)
+    usable = [pdp_section for pdp_section in regenerated.sections if pdp_section.key in section_titles]
+    for pdp_section in usable:
+        PDP_SECTIONS_REGENERATED.labels(pdp_section.key).inc()
+    return pdp.merge(StructuredPDP.from_sections(usable))
+
+
+def finalize_pdp(
+    llm,
+    pdp_query: str,
+    pdp_response: str,
+    target_date: str,
+    callbacks: Optional[list] = None
+) -> Tuple[StructuredPDP, PDPValidationReport]:
+    """
+    Parse and validate the agent's PDP, regenerate the sections that are missing or broken, and
+    return the plan without any section that is still bad, together with its final report.
+    """
+    pdp = parse_pdp(pdp_response)
+    with span("pdp.validate", response_chars=len(pdp_response)):
+        report = validate_pdp(pdp)
+
+    if report.issues and SECTION_REPAIR_ENABLED:
+        logger.info("Regenerating PDP sections", extra={"issues": [issue.model_dump() for issue in report.issues]})
+        try:
+            pdp = regenerate_sections(llm, pdp_query, pdp, report.sections_to_regenerate, target_date, callbacks)
+            report = validate_pdp(pdp)
+        except Exception as e:
+            logger.warning("Regenerating PDP sections failed: %s", e)
+
+    if not report.valid:
+        PDP_VALIDATION_FAILURES.labels(report.reason).inc()
+        logger.warning("PDP validation failed on %s", report.reason, extra={"total_chars": report.total_chars, "found_sections": report.found_sections})
+    return pdp.without(report.sections_to_regenerate), report
@@ -0,0 +1,266 @@
+"""
+Structured Personal Development Plan: the model's Markdown (or JSON) answer parsed once into
+sections, milestones and KPIs, validated section by section and rendered without re-parsing.
+"""
+from helpers.helper import format_markdown_line
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Tuple
+import json
+import re
+
+# Sections every PDP is asked for, with the instruction the PDP prompt gives for each
+PDP_SECTIONS: List[Tuple[str, str]] = [
+    ("Current Skills Assessment", "Analyze current skills from CV"),
+    ("Skills Gap Analysis", "Identify missing skills for the target role"),
+    ("Learning Objectives and Milestones", "Specific, measurable goals with dates"),
+    ("Recommended Training and Development", "Specific courses, certifications, resources"),
+    ("Timeline and Action Steps", "Month-by-month plan until {target_date}"),
+    ("Progress Tracking and KPIs", "How to measure success"),
+]
+
+# Short names a heading has to contain to count as one of the PDP sections
+SECTION_KEYS = {
+    "Current Skills Assessment": "Current Skills Assessment",
+    "Skills Gap Analysis": "Skills Gap Analysis",
+    "Learning Objectives and Milestones": "Learning Objectives",
+    "Recommended Training and Development": "Recommended Training",
+    "Timeline and Action Steps": "Timeline",
+    "Progress Tracking and KPIs": "Progress Tracking",
+}
+
+MIN_TOTAL_CHARS = 500
+MIN_SECTIONS = 4
+# Less than this in a section is a heading without an answer
+MIN_SECTION_CHARS = 40
+
+PROBLEMATIC_PATTERNS = [
+    "```python",  # Unfinished code blocks
+    "SyntaxError",
+    "Action:",
+    "Action Input:",
+    "Observation:",
+    "Let's correct this",
+    "There was an issue",
+    "skill_gaps =",  # Incomplete variable assignments
+]
+
+LIST_ITEM = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(.*)$")
+MARKDOWN_HEADING = re.compile(r"^\s*(#{1,4})(?!#)\s*(.+?)\s*#*\s*$")
+# A line that is nothing but bold text, which some answers use for section titles
+BOLD_HEADING = re.compile(r"^\s*(?:\d+[.)]\s*)?(?:\*\*|__)(.+?)(?:\*\*|__):?\s*$")
+DATE_PATTERN = re.compile(
+    r"\b(?:(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{4}"
+    r"|\d{4}-\d{2}(?:-\d{2})?"
+    r"|q[1-4]\s+\d{4}"
+    r"|(?:months?|weeks?)\s+\d+(?:\s*-\s*\d+)?)\b",
+    re.IGNORECASE
+)
+
+
+def section_key(heading: str) -> Optional[str]:
+    """Full title of the PDP section a heading stands for, None for any other heading"""
+    lower_heading = heading.lower()
+    for title, key in SECTION_KEYS.items():
+        if key.lower() in lower_heading:
+            return title
+    return None
+
+
+class Milestone(BaseModel):
+    text: str
+    due: Optional[str] = None
+
+
+class PDPSection(BaseModel):
+    title: str
+    key: Optional[str] = None  # One of the PDP_SECTIONS titles, None for extra sections
+    content: str = ""
+
+    def items(self) -> List[str]:
+        """Text of the bullet and numbered list items"""
+        return [match.group(1).strip() for match in map(LIST_ITEM.match, self.content.split("\n")) if match]
+
+    def problematic_pattern(self) -> Optional[str]:
+        return next((pattern for pattern in PROBLEMATIC_PATTERNS if pattern in self.content), None)
+
+
+class SectionIssue(BaseModel):
+    section: str
+    reason: str  # missing, empty or problematic_pattern
+
+
+class PDPValidationReport(BaseModel):
+    valid: bool
+    reason: Optional[str] = None  # too_short, missing_sections or problematic_pattern when invalid
+    total_chars: int
+    found_sections: List[str] = Field(default_factory=list)
+    issues: List[SectionIssue] = Field(default_factory=list)
+
+    @property
+    def sections_to_regenerate(self) -> List[str]:
+        return [issue.section for issue in self.issues]
+
+
+class StructuredPDP(BaseModel):
+    preamble: str = ""
+    sections: List[PDPSection] = Field(default_factory=list)
+    milestones: List[Milestone] = Field(default_factory=list)
+    kpis: List[str] = Field(default_factory=list)
+
+    @classmethod
+    def from_sections(cls, sections: List[PDPSection], preamble: str = "") -> "StructuredPDP":
+        """Build the plan and derive its milestones and KPIs from the section lists"""
+        milestones, kpis = [], []
+        for pdp_section in sections:
+            if pdp_section.key in ("Learning Objectives and Milestones", "Timeline and Action Steps"):
+                for item in pdp_section.items():
+                    due = DATE_PATTERN.search(item)
+                    milestones.append(Milestone(text=item, due=due.group(0) if due else None))
+            elif pdp_section.key == "Progress Tracking and KPIs":
+                kpis.extend(pdp_section.items())
+        return cls(preamble=preamble, sections=sections, milestones=milestones, kpis=kpis)
+
+    def section(self, key: str) -> Optional[PDPSection]:
+        return next((pdp_section for pdp_section in self.sections if pdp_section.key == key), None)
+
+    def merge(self, replacements: "StructuredPDP") -> "StructuredPDP":
+        """Copy with the PDP sections of replacements swapped in or added, in the prompt's order"""
+        replaced = {pdp_section.key: pdp_section for pdp_section in replacements.sections if pdp_section.key}
+        # A preamble with its own take on a replaced section would put that section in the plan twice
+        preamble = "" if any(section_key(line) in replaced for line in self.preamble.split("\n") if 0 < len(line.strip()) <= 80) else self.preamble
+        sections = [replaced.pop(pdp_section.key, pdp_section) if pdp_section.key else pdp_section for pdp_section in self.sections]
+        sections.extend(replaced.values())
+        order = {title: position for position, (title, _) in enumerate(PDP_SECTIONS)}
+        sections.sort(key=lambda pdp_section: order.get(pdp_section.key, len(order)))
+        return StructuredPDP.from_sections(sections, preamble)
+
+    def without(self, keys: List[str]) -> "StructuredPDP":
+        return StructuredPDP.from_sections([pdp_section for pdp_section in self.sections if pdp_section.key not in keys], self.preamble)
+
+    def to_markdown(self) -> str:
+        parts = [self.preamble] if self.preamble else []
+        parts.extend(f"## {pdp_section.title}\n{pdp_section.content}" for pdp_section in self.sections)
+        return "\n\n".join(parts)
+
+    def blocks(self) -> List[Tuple[str, str]]:
+        """(style, text) lines for the PDF renderer"""
+        blocks = []
+        for line in self.preamble.split("\n"):
+            block = format_markdown_line(line)
+            if block:
+                blocks.append(block)
+        for pdp_section in self.sections:
+            blocks.append(("heading", pdp_section.title))
+            for line in pdp_section.content.split("\n"):
+                block = format_markdown_line(line)
+                if block:
+                    blocks.append(block)
+        return blocks
+
+
+def _json_to_markdown(data: Dict) -> str:
+    """{"sections": [{"title", "content"}]} or {title: content}, with content a string or a list of items"""
+    if isinstance(data.get("sections"), list):
+        entries = [(entry.get("title", ""), entry.get("content", "")) for entry in data["sections"] if isinstance(entry, dict)]
+    else:
+        entries = list(data.items())
+    parts = []
+    for title, content in entries:
+        if isinstance(content, list):
+            content = "\n".join(f"- {item}" for item in content)
+        parts.append(f"## {title}\n{content}")
+    return "\n\n".join(parts)
+
+
+def _heading(line: str) -> Optional[Tuple[int, str]]:
+    """Level and title of a Markdown heading or a standalone bold line (level 0)"""
+    match = MARKDOWN_HEADING.match(line)
+    if match:
+        return len(match.group(1)), match.group(2).strip("*_: ")
+    match = BOLD_HEADING.match(line)
+    if match and len(match.group(1)) <= 80:
+        return 0, match.group(1).strip("*_: ")
+    return None
+
+
+def parse_pdp(text: str) -> StructuredPDP:
+    """
+    Parse a PDP answer, Markdown or a JSON object, in a single pass over its lines. Every
+    ## heading starts a section; #, ###, #### headings and standalone bold lines only do when
+    they name a PDP section that has not started yet, otherwise they belong to the text.
+    """
+    stripped = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+    if stripped.startswith("{"):
+        try:
+            data = json.loads(stripped)
+            if isinstance(data, dict):
+                text = _json_to_markdown(data)
+        except json.JSONDecodeError:
+            pass
+
+    preamble: List[str] = []
+    sections: List[PDPSection] = []
+    current: Optional[Tuple[str, List[str]]] = None
+    started = set()
+    for line in text.split("\n"):
+        heading = _heading(line)
+        if heading:
+            level, title = heading
+            key = section_key(title)
+            if level != 2 and (key is None or key in started):
+                heading = None
+        if heading:
+            if current:
+                sections.append(PDPSection(title=current[0], key=section_key(current[0]), content="\n".join(current[1]).strip()))
+            current = (title, [])
+            started.add(key)
+        elif current:
+            current[1].append(line)
+        else:
+            preamble.append(line)
+    if current:
+        sections.append(PDPSection(title=current[0], key=section_key(current[0]), content="\n".join(current[1]).strip()))
+
+    # Only the first occurrence of a PDP section counts, repeats are usually the model starting over
+    seen = set()
+    unique_sections = []
+    for pdp_section in sections:
+        if pdp_section.key and pdp_section.key in seen:
+            continue
+        seen.add(pdp_section.key)
+        # Extra sections are optional, so broken ones are dropped rather than regenerated
+        if pdp_section.key is None and pdp_section.problematic_pattern():
+            continue
+        unique_sections.append(pdp_section)
+
+    preamble_text = "\n".join(preamble).strip()
+    if any(pattern in preamble_text for pattern in PROBLEMATIC_PATTERNS):
+        preamble_text = ""
+    return StructuredPDP.from_sections(unique_sections, preamble_text)
+
+
+def validate_pdp(pdp: StructuredPDP) -> PDPValidationReport:
+    """
+    Check every PDP section on its own. Missing, empty and broken sections are reported as
+    issues, and the plan is valid without them as long as enough good sections remain.
+    """
+    issues, found = [], []
+    for title, _ in PDP_SECTIONS:
+        pdp_section = pdp.section(title)
+        if pdp_section is None:
+            issues.append(SectionIssue(section=title, reason="missing"))
+        elif len(pdp_section.content.strip()) < MIN_SECTION_CHARS:
+            issues.append(SectionIssue(section=title, reason="empty"))
+        elif pdp_section.problematic_pattern():
+            issues.append(SectionIssue(section=title, reason="problematic_pattern"))
+        else:
+            found.append(title)
+
+    total_chars = len(pdp.without([issue.section for issue in issues]).to_markdown())
+    reason = None
+    if total_chars < MIN_TOTAL_CHARS:
+        reason = "too_short"
+    elif len(found) < MIN_SECTIONS:
+        reason = "problematic_pattern" if any(issue.reason == "problematic_pattern" for issue in issues) else "missing_sections"
+
+    return PDPValidationReport(valid=reason is None, reason=reason, total_chars=total_chars, found_sections=found, issues=issues)
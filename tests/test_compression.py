@@ -0,0 +1,54 @@
+"""
+Compressed responses list Accept-Encoding in Vary exactly once, next to the fields the
+response already varies on.
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse
+from fastapi.testclient import TestClient
+
+from helpers.compression import CompressionMiddleware, merge_vary
+from helpers.static_assets import PrecompressedStaticFiles
+
+PAGE = "<p>career coach</p>" * 100
+
+
+def make_client(vary: str) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/")
+    def index():
+        return HTMLResponse(PAGE, headers={"vary": vary} if vary else None)
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("vary, expected", [
+    ("", "Accept-Encoding"),
+    ("Accept-Encoding", "Accept-Encoding"),
+    ("accept-encoding", "accept-encoding"),
+    ("Origin", "Origin, Accept-Encoding"),
+])
+def test_vary_is_merged(vary, expected):
+    response = make_client(vary).get("/", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers.get_list("vary") == [expected]
+
+
+def test_merge_vary_joins_several_headers():
+    assert merge_vary([b"Origin", b"Cookie, origin"], b"Accept-Encoding") == b"Origin, Cookie, origin, Accept-Encoding"
+
+
+def test_static_file_compressed_on_the_fly_has_one_vary(tmp_path):
+    pytest.importorskip("brotli")
+    # Only a brotli variant, so a gzip-only client gets the file compressed by the middleware
+    (tmp_path / "app.css").write_text("body { color: black; }\n" * 100)
+    (tmp_path / "app.css.br").write_bytes(b"precompressed")
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+    app.mount("/static", PrecompressedStaticFiles(directory=str(tmp_path)), name="static")
+
+    response = TestClient(app).get("/static/app.css", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers.get_list("vary") == ["Accept-Encoding"]
@@ -0,0 +1,24 @@
+"""
+Time zones of date/time questions: places and abbreviations map to zones with daylight saving.
+"""
+import pytest
+
+from fast_path import _extract_timezone
+
+
+@pytest.mark.parametrize("question, zone", [
+    ("what time is it in est", "America/New_York"),
+    ("what time is it in EST?", "America/New_York"),
+    ("what time is it in pst", "America/Los_Angeles"),
+    ("what time is it in cet", "Europe/Berlin"),
+    ("what time is it in berlin, germany", "Europe/Berlin"),
+    ("what time is it in Europe/Paris", "Europe/Paris"),
+    ("what time is it in utc", "UTC"),
+    ("what time is it", "UTC"),
+])
+def test_timezone(question, zone):
+    assert _extract_timezone(question) == zone
+
+
+def test_unknown_place_has_no_timezone():
+    assert _extract_timezone("what time is it in atlantis") is None
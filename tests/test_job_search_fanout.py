@@ -0,0 +1,65 @@
+"""
+Job sources run concurrently under one deadline: a failing or hanging source does not hold up
+the others' results.
+"""
+import threading
+import time
+
+import pytest
+
+from tools import job_search_fanout
+from tools.job_search_fanout import fan_out_search, register_job_source
+
+DEADLINE = 1.0
+
+
+def working_source(query):
+    return [{"title": "Data Scientist", "company_name": "Acme", "location": "Berlin", "description": query}]
+
+
+@pytest.fixture
+def sources(monkeypatch):
+    monkeypatch.setattr(job_search_fanout, "_sources", {})
+    release = threading.Event()
+    yield release
+    release.set()
+
+
+def test_failing_source_does_not_hide_the_others(sources):
+    def failing_source(query):
+        raise ValueError("SerpAPI error: quota exceeded")
+
+    register_job_source("failing", failing_source)
+    register_job_source("working", working_source)
+    result = fan_out_search("data scientist berlin", deadline_seconds=DEADLINE)
+    assert [job["title"] for job in result.jobs] == ["Data Scientist"]
+    assert not result.complete
+
+
+def test_hanging_source_is_cut_off_at_the_deadline(sources):
+    def hanging_source(query):
+        sources.wait(10)
+        return []
+
+    register_job_source("hanging", hanging_source)
+    register_job_source("working", working_source)
+    started = time.perf_counter()
+    result = fan_out_search("data scientist berlin", deadline_seconds=DEADLINE)
+    assert time.perf_counter() - started < DEADLINE + 0.5
+    assert [job["title"] for job in result.jobs] == ["Data Scientist"]
+    assert not result.complete
+
+
+def test_every_source_failing_raises(sources):
+    def failing_source(query):
+        raise ValueError("down")
+
+    register_job_source("failing", failing_source)
+    with pytest.raises(ValueError):
+        fan_out_search("data scientist berlin", deadline_seconds=DEADLINE)
+
+
+def test_google_job_search_registers_both_clients():
+    import tools.google_jobs_search  # noqa: F401
+
+    assert {"serpapi_google_jobs", "langchain_google_jobs"} <= set(job_search_fanout._sources)
@@ -0,0 +1,38 @@
+"""
+Near-duplicate tool calls are those that only differ in filler words and word order.
+"""
+import pytest
+
+from loop_guard import RunState, ToolResult, normalize_action_input
+
+BERLIN = "senior machine learning engineer jobs in berlin germany full time"
+
+
+@pytest.fixture
+def state():
+    run = RunState()
+    for query in (BERLIN, "data scientist jobs berlin"):
+        run.results[("google_job_search", normalize_action_input(query))] = ToolResult(query, 1.0)
+    return run
+
+
+@pytest.mark.parametrize("query", [
+    "senior machine learning engineer jobs in munich germany full time",
+    "junior machine learning engineer jobs in berlin germany full time",
+    "data scientist munich",
+])
+def test_different_searches_are_not_repeats(state, query):
+    assert state.lookup("google_job_search", normalize_action_input(query)) is None
+
+
+@pytest.mark.parametrize("query, original", [
+    ("data scientist berlin", "data scientist jobs berlin"),
+    ("Data Scientist position in Berlin", "data scientist jobs berlin"),
+    ("berlin germany senior machine learning engineer full time", BERLIN),
+])
+def test_filler_and_word_order_are_near_repeats(state, query, original):
+    assert state.lookup("google_job_search", normalize_action_input(query)) == ("near", ToolResult(original, 1.0))
+
+
+def test_other_tools_are_not_matched(state):
+    assert state.lookup("internet_search", normalize_action_input("data scientist berlin")) is None
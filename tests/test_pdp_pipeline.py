@@ -0,0 +1,25 @@
+"""
+Sections that fail validation are regenerated with the same instructions as the first answer.
+"""
+from pdp_pipeline import build_pdp_query, regenerate_sections
+from pdp_structure import StructuredPDP
+
+
+class RecordingLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt, config=None, **kwargs):
+        self.prompts.append(prompt)
+        return "## Timeline and Action Steps\n- Month 1: learn SQL"
+
+
+def test_timeline_repair_prompt_has_the_target_date():
+    llm = RecordingLLM()
+    pdp_query = build_pdp_query(career_goal="Data Scientist", target_date="2026-12-31", cv_content="Analyst", additional_context="")
+    regenerate_sections(llm, pdp_query, StructuredPDP(), ["Timeline and Action Steps"], "2026-12-31")
+
+    [prompt] = llm.prompts
+    repair_part = prompt[len(pdp_query.strip()):]
+    assert "Month-by-month plan until 2026-12-31" in repair_part
+    assert "{" not in prompt and "}" not in prompt
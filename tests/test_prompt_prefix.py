@@ -0,0 +1,31 @@
+"""
+The stable prompt layout keeps the system prompt and tool specs byte-identical across
+requests, so inference servers can reuse their prefix cache.
+"""
+import json
+import os
+
+import pytest
+
+from benchmarks.prompt_prefix import DEFAULT_BASELINE, REPO_ROOT, measure_layouts, regressions
+
+
+@pytest.fixture(scope="module")
+def results():
+    # The app reads prompts.yaml and models.yaml from the working directory
+    os.chdir(REPO_ROOT)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import app as app_module
+
+    return measure_layouts(app_module)
+
+
+def test_stable_layout_shares_the_system_prompt(results):
+    assert results["stable"]["system_prompt_shared"]
+    assert results["stable"]["shared_prefix_chars"] > results["legacy"]["shared_prefix_chars"]
+
+
+def test_stable_layout_prefix_does_not_shrink(results):
+    with open(DEFAULT_BASELINE) as f:
+        baseline = json.load(f)
+    assert regressions(results, baseline) == []
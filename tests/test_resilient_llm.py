@@ -0,0 +1,187 @@
+"""
+ResilientLLM against a local stub completions server that can be made slow or failing.
+
+Each test scripts the server's responses, then calls it through OpenAICompatibleLLM wrapped
+in ResilientLLM, exactly as build_llm wires the openai backend.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+import threading
+import json
+import time
+
+import pytest
+import requests
+
+from inference import CircuitBreaker, CircuitOpenError, LLMDeadlineExceeded, OpenAICompatibleLLM, ResilientLLM
+
+
+class StubServer:
+    """/v1/completions that plays back scripted (delay, status) responses, then repeats the last"""
+
+    def __init__(self):
+        self.script: List[Tuple[float, int]] = [(0.0, 200)]
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub._lock:
+                    delay, status = stub.script[min(stub.requests, len(stub.script) - 1)]
+                    stub.requests += 1
+                time.sleep(delay)
+                body = json.dumps({"choices": [{"text": "stub answer"}]} if status == 200 else {"error": "stub failure"})
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body.encode())
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client gave up on a slow response
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def respond(self, *script: Tuple[float, int]) -> None:
+        with self._lock:
+            self.script = list(script)
+            self.requests = 0
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def server():
+    stub = StubServer()
+    yield stub
+    stub.close()
+
+
+def make_llm(server: StubServer, **kwargs) -> ResilientLLM:
+    timeout = kwargs.pop("timeout", 2.0)
+    settings = {
+        "timeout": timeout,
+        "total_timeout": timeout * 2,
+        "max_retries": 2,
+        "backoff_base": 0.01,
+        "backoff_max": 0.02,
+        "circuit_breaker": CircuitBreaker(failure_threshold=5, reset_timeout=30),
+        **kwargs,
+    }
+    client = OpenAICompatibleLLM(base_url=server.base_url, model="stub", timeout=timeout)
+    return ResilientLLM(llm=client, model_name="stub", **settings)
+
+
+def test_returns_the_completion(server):
+    assert make_llm(server).invoke("Hello") == "stub answer"
+    assert server.requests == 1
+
+
+def test_slow_attempt_fails_at_its_deadline(server):
+    server.respond((2.0, 200))
+    llm = make_llm(server, timeout=0.3, total_timeout=0.3, max_retries=0)
+
+    started = time.monotonic()
+    with pytest.raises(LLMDeadlineExceeded):
+        llm.invoke("Hello")
+    assert time.monotonic() - started < 1.0
+
+
+def test_transient_errors_are_retried(server):
+    server.respond((0.0, 503), (0.0, 502), (0.0, 200))
+    assert make_llm(server).invoke("Hello") == "stub answer"
+    assert server.requests == 3
+
+
+def test_slow_attempt_is_retried_after_its_deadline(server):
+    server.respond((1.0, 200), (0.0, 200))
+    llm = make_llm(server, timeout=0.3, total_timeout=2.0, max_retries=1)
+    assert llm.invoke("Hello") == "stub answer"
+    assert server.requests == 2
+
+
+def test_client_errors_are_not_retried_and_keep_the_circuit_closed(server):
+    server.respond((0.0, 400))
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    llm = make_llm(server, circuit_breaker=breaker)
+
+    with pytest.raises(requests.HTTPError):
+        llm.invoke("Hello")
+    assert server.requests == 1
+    assert breaker.state == "closed"
+
+
+def test_slow_call_is_hedged(server):
+    # The first request hangs, the hedged duplicate answers at once
+    server.respond((1.5, 200), (0.0, 200))
+    llm = make_llm(server, timeout=3.0, max_retries=0, hedge=True, hedge_delay=0.1)
+
+    started = time.monotonic()
+    assert llm.invoke("Hello") == "stub answer"
+    assert time.monotonic() - started < 1.0
+    assert server.requests == 2
+
+
+def test_no_hedge_for_fast_calls(server):
+    llm = make_llm(server, hedge=True, hedge_delay=0.5)
+    assert llm.invoke("Hello") == "stub answer"
+    time.sleep(0.6)
+    assert server.requests == 1
+
+
+def test_circuit_opens_fails_fast_and_closes_after_a_successful_trial(server):
+    server.respond((0.0, 503))
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.3)
+    llm = make_llm(server, max_retries=1, circuit_breaker=breaker)
+
+    with pytest.raises(requests.HTTPError):
+        llm.invoke("Hello")
+    assert breaker.state == "open"
+
+    # Open: rejected without contacting the upstream
+    server.respond((0.0, 200))
+    with pytest.raises(CircuitOpenError):
+        llm.invoke("Hello")
+    assert server.requests == 0
+
+    # Half-open: one trial call goes through and closes the circuit
+    time.sleep(0.35)
+    assert breaker.state == "half-open"
+    assert llm.invoke("Hello") == "stub answer"
+    assert server.requests == 1
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_reopens_the_circuit(server):
+    server.respond((0.0, 503))
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.3)
+    llm = make_llm(server, max_retries=0, circuit_breaker=breaker)
+
+    with pytest.raises(requests.HTTPError):
+        llm.invoke("Hello")
+    time.sleep(0.35)
+    assert breaker.state == "half-open"
+    with pytest.raises(requests.HTTPError):
+        llm.invoke("Hello")
+    assert breaker.state == "open"
+    assert server.requests == 2
+
+
+def test_half_open_lets_a_single_trial_through(server):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == "closed"
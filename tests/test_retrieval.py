@@ -0,0 +1,35 @@
+"""
+The question retrieval tools select by follows the agent run into prefetch threads, and empty
+documents are not cached.
+"""
+from langchain_core.tools import Tool
+
+from tools.retrieval import BM25Index, DocumentIndexCache, asking, current_question
+from tools.speculative import SpeculativeToolPrefetcher
+
+
+def test_prefetched_call_sees_the_question():
+    prefetcher = SpeculativeToolPrefetcher(tool_names=["wikipedia_search"])
+    [tool] = prefetcher.wrap_tools([Tool(name="wikipedia_search", func=lambda topic: f"{topic}|{current_question()}", description="Wikipedia")])
+    with asking("what does a data engineer do"):
+        prefetcher.prefetch("wikipedia_search", "data engineer")
+    assert tool.run("data engineer") == "data engineer|what does a data engineer do"
+    assert prefetcher.stats()["hits"] == 1
+
+
+def test_question_is_empty_outside_a_run():
+    assert current_question() == ""
+
+
+def test_empty_index_is_not_cached():
+    cache = DocumentIndexCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return BM25Index([])
+
+    cache.get_or_build("wikipedia", "wikipedia:nothing", build)
+    _, cached = cache.get_or_build("wikipedia", "wikipedia:nothing", build)
+    assert not cached
+    assert len(builds) == 2
@@ -0,0 +1,76 @@
+"""
+Speculative prefetching parses the action from the attempt that is streaming now, never from
+text left over by a failed or timed-out attempt of the same LLM run.
+"""
+from typing import Any, List, Optional
+import time
+
+from langchain_core.language_models.llms import LLM
+
+from inference import CircuitBreaker, ResilientLLM
+from tools.speculative import SpeculativePrefetchHandler
+
+
+class RecordingPrefetcher:
+    def __init__(self):
+        self.calls = []
+
+    def prefetch(self, tool_name: str, tool_input: str) -> None:
+        self.calls.append((tool_name, tool_input))
+
+
+class ScriptedLLM(LLM):
+    """Streams one scripted attempt per call: (tokens, then raise, or sleep past the deadline)"""
+
+    attempts: List[Any]
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        tokens, outcome = self.attempts[min(self.calls, len(self.attempts) - 1)]
+        self.calls += 1
+        for token in tokens:
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+        if outcome == "fail":
+            raise ConnectionError("upstream reset the stream")
+        if outcome == "hang":
+            # Times out, then keeps streaming as if the upstream had not noticed
+            time.sleep(0.6)
+            for token in ["Action: internet_search\n", "Action Input: stale\n"]:
+                run_manager.on_llm_new_token(token)
+        return "".join(tokens)
+
+
+def run(attempts) -> List[tuple]:
+    prefetcher = RecordingPrefetcher()
+    llm = ResilientLLM(
+        llm=ScriptedLLM(attempts=attempts),
+        model_name="scripted",
+        timeout=0.3,
+        total_timeout=5.0,
+        max_retries=2,
+        backoff_base=0.01,
+        backoff_max=0.02,
+        hedge=False,
+        circuit_breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30),
+    )
+    llm.invoke("prompt", config={"callbacks": [SpeculativePrefetchHandler(prefetcher)]})
+    return prefetcher.calls
+
+
+RETRY = (["Action: wikipedia_search\n", "Action Input: data engineer\n"], "ok")
+
+
+def test_retry_starts_a_fresh_buffer():
+    calls = run([(["Thought: look it up\n", "Action: wikipedia_search\n", "Action Input: data sci"], "fail"), RETRY])
+    assert calls == [("wikipedia_search", "data engineer")]
+
+
+def test_timed_out_attempt_stops_streaming_into_the_retry():
+    calls = run([(["Action: wikipedia_search\n", "Action Input: data sci"], "hang"), RETRY])
+    time.sleep(0.5)  # Let the abandoned attempt finish streaming
+    assert calls == [("wikipedia_search", "data engineer")]
@@ -0,0 +1,43 @@
+"""
+Token counts never wait for the tokenizer: they are estimated until the startup load finishes.
+"""
+import threading
+
+from helpers import tokens
+
+
+class FakeTokenizer:
+    class Encoding:
+        def __init__(self, text):
+            self.ids = text.split()
+
+    def encode(self, text, add_special_tokens=False):
+        return self.Encoding(text)
+
+
+def test_counts_are_estimated_while_the_tokenizer_loads(monkeypatch):
+    release = threading.Event()
+
+    def slow_load():
+        release.wait(5)
+        return FakeTokenizer()
+
+    monkeypatch.setattr(tokens, "_load_tokenizer", slow_load)
+    monkeypatch.setattr(tokens, "_tokenizer", None)
+    monkeypatch.setattr(tokens, "_tokenizer_loaded", False)
+    tokens._count.cache_clear()
+
+    loader = threading.Thread(target=tokens.load_tokenizer)
+    loader.start()
+    try:
+        text = "one two three four five six"
+        assert tokens.tokens_are_estimated()
+        assert tokens.count_tokens(text) == len(text) // 4
+    finally:
+        release.set()
+        loader.join()
+
+    # Estimates made while loading are not served from the cache afterwards
+    assert not tokens.tokens_are_estimated()
+    assert tokens.count_tokens(text) == 6
+    tokens._count.cache_clear()
@@ -0,0 +1,50 @@
+"""
+Upload routes answer 413 once the body goes over the limit, with or without Content-Length.
+"""
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from helpers.uploads import UploadLimitMiddleware
+
+LIMIT = 1024 * 1024
+
+
+def make_client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, limits={"/upload": LIMIT})
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    return TestClient(app)
+
+
+def multipart(size: int):
+    yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="cv.pdf"\r\n\r\n'
+    for _ in range(size // 65536):
+        yield b"0" * 65536
+    yield b"\r\n--b--\r\n"
+
+
+def post(client: TestClient, body):
+    return client.post("/upload", content=body, headers={"Content-Type": "multipart/form-data; boundary=b"})
+
+
+def test_small_upload_passes():
+    response = post(make_client(), b"".join(multipart(65536)))
+    assert response.status_code == 200
+    assert response.json() == {"size": 65536}
+
+
+def test_oversized_upload_with_content_length_is_413():
+    response = post(make_client(), b"".join(multipart(2 * LIMIT)))
+    assert response.status_code == 413
+
+
+def test_oversized_chunked_upload_is_413():
+    # A generator body is sent chunked, without Content-Length
+    response = post(make_client(), multipart(2 * LIMIT))
+    assert response.request.headers.get("content-length") is None
+    assert response.status_code == 413
+    assert "larger than" in response.json()["detail"]
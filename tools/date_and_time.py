@@ -4,12 +4,7 @@ import pytz
 from helpers.helper import clean_input
 import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-
+logger = logging.getLogger(__name__)
 
 @tool
 def current_date_and_time(timezone: str) -> str:
@@ -20,7 +15,7 @@ def current_date_and_time(timezone: str) -> str:
         return current date and time in format '%Y:%m:%d %H:%M:%S %Z %z'
     """
     try:
-        logging.info(f"\n Get current date and time for Timezone: {timezone}")
+        logger.info("Get current date and time for Timezone: %s", timezone)
         clean_timezone = clean_input(timezone)
         tz = pytz.timezone(clean_timezone)
         current_time = datetime.now(tz)
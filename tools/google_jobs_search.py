@@ -1,11 +1,16 @@
-from langchain_community.tools.google_jobs import GoogleJobsQueryRun
-from langchain_community.utilities.google_jobs import GoogleJobsAPIWrapper
 from langchain_core.tools import tool
 from helpers.helper import clean_input
+from helpers.tracing import span
+from .job_index import get_job_index
+from .job_search_fanout import fan_out_search, query_variants, register_job_source
+import logging
 import os
+import re
+
+logger = logging.getLogger(__name__)
 
 if not os.getenv('SERPAPI_API_KEY'):
-    raise ValueError("Please set SERPAPI_API_KEY environment variable")
+    logger.warning("SERPAPI_API_KEY is not set, google_job_search will only answer from the local job index")
 
 def format_job_results(jobs: list, query: str) -> str:
     """Format job results into a readable string"""
@@ -46,29 +51,51 @@ def format_job_results(jobs: list, query: str) -> str:
 
     return "".join(formatted_results)
 
-def serpapi_fallback(query: str) -> str:
-    """Direct SerpAPI call as fallback when LangChain wrapper fails"""
-    try:
-        import serpapi
+def fetch_jobs(query: str) -> list:
+    """Fetch raw job postings from SerpAPI Google Jobs"""
+    import serpapi
+
+    search = serpapi.GoogleSearch({
+        "q": query,
+        "api_key": os.getenv('SERPAPI_API_KEY'),
+        "engine": "google_jobs"
+    })
+
+    results = search.get_dict()
+    jobs = results.get('jobs_results', [])
 
-        search = serpapi.GoogleSearch({
-            "q": query,
-            "api_key": os.getenv('SERPAPI_API_KEY'),
-            "engine": "google_jobs"
-        })
+    # SerpAPI reports both "no results" and API problems through the error field
+    error = results.get('error')
+    if error and not jobs and "hasn't returned any results" not in error:
+        raise ValueError(f"SerpAPI error: {error}")
+    return jobs
 
-        results = search.get_dict()
-        jobs = results.get('jobs_results', [])
+register_job_source("serpapi_google_jobs", fetch_jobs)
 
-        if jobs:
-            return format_job_results(jobs, query)
-        else:
-            return f"No job results found for query: '{query}'. Try using different keywords or location terms."
+def fetch_jobs_langchain(query: str) -> list:
+    """Job postings from LangChain's Google Jobs tool, a second client for the same API that keeps working when ours breaks"""
+    from langchain_community.tools.google_jobs import GoogleJobsQueryRun
+    from langchain_community.utilities.google_jobs import GoogleJobsAPIWrapper
 
-    except ImportError:
-        return f"Fallback search unavailable. Please try searching manually on Google Jobs, LinkedIn, Indeed, or other job boards for '{query}'."
-    except Exception:
-        return f"Search temporarily unavailable. Please try searching manually on Google Jobs, LinkedIn, Indeed, or other job boards for '{query}'."
+    try:
+        text = GoogleJobsQueryRun(api_wrapper=GoogleJobsAPIWrapper()).run(query)
+    except (KeyError, IndexError):
+        # Its way of saying there are no results
+        return []
+    jobs = []
+    # It answers with "Field: value" blocks between lines of underscores
+    for block in re.split(r"\n_{10,}\n", text):
+        fields = dict(re.findall(r"^(Job Title|Company Name|Location|Description): (.*)$", block, re.MULTILINE))
+        if fields.get("Job Title"):
+            jobs.append({
+                "title": fields["Job Title"],
+                "company_name": fields.get("Company Name", ""),
+                "location": fields.get("Location", ""),
+                "description": fields.get("Description", ""),
+            })
+    return jobs
+
+register_job_source("langchain_google_jobs", fetch_jobs_langchain)
 
 @tool
 def google_job_search(query: str) -> str:
@@ -78,34 +105,46 @@ def google_job_search(query: str) -> str:
     Returns:
         A formatted string containing job listings with titles, companies, locations, and links
     """
-    try:
-        clean_query = clean_input(query)
+    clean_query = clean_input(query)
+
+    # Repeated or overlapping queries, or their synonym variants, are answered from the local index while it is fresh
+    job_index = get_job_index()
+    if job_index:
+        with span("job_search.index_lookup") as stage:
+            try:
+                indexed_jobs = job_index.search(clean_query, variants=query_variants(clean_query)[1:])
+                if stage:
+                    stage.set_attribute("job_index.hit", indexed_jobs is not None)
+                if indexed_jobs is not None:
+                    return format_job_results(indexed_jobs, clean_query)
+            except Exception as e:
+                logger.warning("Job index lookup failed: %s", e)
+
+    if not os.getenv('SERPAPI_API_KEY'):
+        return f"Job search is not configured on this server. Please try searching manually on Google Jobs, LinkedIn, Indeed, or other job boards for '{clean_query}'."
 
-        # Try LangChain wrapper first
-        try:
-            api_wrapper = GoogleJobsAPIWrapper()
-            tool_instance = GoogleJobsQueryRun(api_wrapper=api_wrapper)
-            results = tool_instance.run(clean_query)
-
-            if results and results.strip():
-                return results
-            else:
-                return serpapi_fallback(clean_query)
-
-        except KeyError as e:
-            # LangChain wrapper failed with jobs_results error, use fallback
-            if "'jobs_results'" in str(e):
-                return serpapi_fallback(clean_query)
-            else:
-                raise e
-
-    except Exception:
-        # Try fallback for any other errors
-        if "clean_query" in locals():
-            fallback_result = serpapi_fallback(clean_query)
-            if "Search temporarily unavailable" not in fallback_result:
-                return fallback_result
-
-        # If fallback also fails, return helpful error message
-        query_name = clean_query if "clean_query" in locals() else query
-        return f"I'm unable to search for jobs right now. Please try searching manually on Google Jobs, LinkedIn, Indeed, or other job boards for '{query_name}'."
+    try:
+        # Query variants and sources run concurrently under one deadline, so a failing or slow
+        # source costs no extra round-trip
+        with span("job_search.fan_out") as stage:
+            result = fan_out_search(clean_query)
+            if stage:
+                stage.set_attribute("job_search.calls_done", result.calls_done)
+                stage.set_attribute("job_search.calls_total", result.calls_total)
+                stage.set_attribute("job_search.complete", result.complete)
+                stage.set_attribute("job_search.jobs", len(result.jobs))
+        if not result.jobs and not result.complete:
+            raise TimeoutError("No job source answered before the deadline")
+    except Exception as e:
+        logger.warning("Job search failed: %s", e)
+        return f"I'm unable to search for jobs right now. Please try searching manually on Google Jobs, LinkedIn, Indeed, or other job boards for '{clean_query}'."
+
+    jobs = result.jobs
+    if job_index and jobs:
+        with span("job_search.ingest"):
+            try:
+                job_index.ingest(clean_query, jobs, complete=result.complete)
+            except Exception as e:
+                logger.warning("Job index ingestion failed: %s", e)
+
+    return format_job_results(jobs, clean_query)
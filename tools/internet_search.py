@@ -1,14 +1,9 @@
 from langchain_core.tools import tool
-from langchain_community.tools import DuckDuckGoSearchResults
 from helpers.helper import clean_input
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+logger = logging.getLogger(__name__)
+
 
 @tool
 def internet_search(query: str) -> str:
@@ -21,7 +16,10 @@ def internet_search(query: str) -> str:
     try:
         # Clean the query by removing special tokens
         cleaned_query = clean_input(query)
-        logging.info(f"\n Internet search tool with query: {cleaned_query}")
+        logger.info("Internet search called", extra={"query_chars": len(cleaned_query)})
+        logger.debug("Internet search query: %s", cleaned_query)
+
+        from langchain_community.tools import DuckDuckGoSearchResults
 
         search = DuckDuckGoSearchResults()
         results = search.run(cleaned_query)
@@ -0,0 +1,261 @@
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import threading
+import hashlib
+import logging
+import sqlite3
+import time
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+JOB_INDEX_PATH = os.getenv("JOB_INDEX_PATH", "/app/data/jobs/job_index.db")
+JOB_INDEX_TTL_HOURS = float(os.getenv("JOB_INDEX_TTL_HOURS", "24"))
+
+# Words that do not narrow a job search down and only make full-text matching stricter
+QUERY_STOPWORDS = {
+    "job", "jobs", "in", "at", "for", "the", "a", "an", "and", "or", "near", "around", "of",
+    "position", "positions", "role", "roles", "vacancy", "vacancies", "opening", "openings",
+    "post", "posts", "ad", "ads", "find", "search", "me", "show", "looking", "hiring",
+}
+
+# Bumped whenever the tables change; an index with another version is rebuilt, it is only a cache
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    company TEXT,
+    location TEXT,
+    salary TEXT,
+    link TEXT,
+    description TEXT,
+    first_seen REAL NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_fetched_at ON jobs (fetched_at);
+-- rowid is jobs.id, so a posting's text is replaced and pruned by rowid
+CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(title, company, location, description);
+CREATE TABLE IF NOT EXISTS queries (
+    query TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS query_jobs (
+    query TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (query, fingerprint)
+);
+"""
+
+OLD_TABLES = ("jobs_fts", "query_jobs", "queries", "jobs")
+
+
+def _collapse(text: Any) -> str:
+    return re.sub(r"\s+", " ", str(text or "")).strip()
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and strip punctuation so trivially different queries share one entry"""
+    return " ".join(re.findall(r"\w+", query.lower()))
+
+
+def job_fingerprint(title: str, company: str, location: str) -> str:
+    """Stable identity of a posting, independent of which query or source returned it"""
+    key = "|".join(normalize_query(part) for part in (title, company, location))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def normalize_job(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Map a raw SerpAPI / LangChain job posting onto title, company, location, salary and link"""
+    title = _collapse(job.get("title"))
+    if not title:
+        return None
+
+    company = _collapse(job.get("company_name") or job.get("company"))
+    location = _collapse(job.get("location"))
+
+    extensions = job.get("detected_extensions") or {}
+    salary = _collapse(job.get("salary") or extensions.get("salary"))
+
+    link = job.get("link") or job.get("url") or job.get("apply_link")
+    if not link and job.get("apply_options"):
+        link = job["apply_options"][0].get("link")
+    link = _collapse(link or job.get("share_link"))
+
+    return {
+        "fingerprint": job_fingerprint(title, company, location),
+        "title": title,
+        "company": company,
+        "location": location,
+        "salary": salary,
+        "link": link,
+        "description": _collapse(job.get("description") or job.get("snippet")),
+    }
+
+
+class JobIndex:
+    """
+    Local SQLite FTS5 index of normalized, deduplicated job postings.
+
+    Repeated queries are answered from the postings they returned last time, overlapping
+    queries from a full-text match over fresh postings; both also try the query's synonym
+    variants. Anything older than the TTL is treated as stale, so the caller goes back to
+    the network for it, and is deleted at most every prune interval.
+    """
+
+    def __init__(self, path: str = JOB_INDEX_PATH, ttl_hours: float = JOB_INDEX_TTL_HOURS, min_overlap_results: int = 5):
+        self.path = path
+        self.ttl_seconds = ttl_hours * 3600
+        self.min_overlap_results = min_overlap_results
+        self.prune_interval_seconds = min(self.ttl_seconds, 3600)
+        self._lock = threading.Lock()
+        self._last_pruned = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                for table in OLD_TABLES:
+                    connection.execute(f"DROP TABLE IF EXISTS {table}")
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Connection that commits on success and is always closed"""
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.row_factory = sqlite3.Row
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def ingest(self, query: str, raw_jobs: List[Dict[str, Any]], complete: bool = True) -> List[Dict[str, Any]]:
+        """
+        Normalize, deduplicate and store postings, returning them in their original order.
+        Partial results are indexed, but the query is only remembered when it is complete.
+        """
+        jobs: List[Dict[str, Any]] = []
+        seen = set()
+        for raw_job in raw_jobs:
+            job = normalize_job(raw_job)
+            if job and job["fingerprint"] not in seen:
+                seen.add(job["fingerprint"])
+                jobs.append(job)
+
+        now = time.time()
+        normalized_query = normalize_query(query)
+        with self._lock, self._connect() as connection:
+            if complete:
+                connection.execute("DELETE FROM query_jobs WHERE query = ?", (normalized_query,))
+            for position, job in enumerate(jobs):
+                connection.execute(
+                    """INSERT INTO jobs (fingerprint, title, company, location, salary, link, description, first_seen, fetched_at)
+                       VALUES (:fingerprint, :title, :company, :location, :salary, :link, :description, :now, :now)
+                       ON CONFLICT(fingerprint) DO UPDATE SET
+                           salary = COALESCE(NULLIF(excluded.salary, ''), jobs.salary),
+                           link = COALESCE(NULLIF(excluded.link, ''), jobs.link),
+                           description = COALESCE(NULLIF(excluded.description, ''), jobs.description),
+                           fetched_at = excluded.fetched_at""",
+                    {**job, "now": now}
+                )
+                row_id = connection.execute("SELECT id FROM jobs WHERE fingerprint = ?", (job["fingerprint"],)).fetchone()[0]
+                connection.execute("DELETE FROM jobs_fts WHERE rowid = ?", (row_id,))
+                connection.execute(
+                    "INSERT INTO jobs_fts (rowid, title, company, location, description) VALUES (?, ?, ?, ?, ?)",
+                    (row_id, job["title"], job["company"], job["location"], job["description"])
+                )
+                if complete:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO query_jobs (query, fingerprint, position) VALUES (?, ?, ?)",
+                        (normalized_query, job["fingerprint"], position)
+                    )
+            if complete:
+                connection.execute(
+                    "INSERT OR REPLACE INTO queries (query, fetched_at) VALUES (?, ?)",
+                    (normalized_query, now)
+                )
+            if now - self._last_pruned >= self.prune_interval_seconds:
+                self._prune(connection, now - self.ttl_seconds)
+                self._last_pruned = now
+        return jobs
+
+    def _prune(self, connection: sqlite3.Connection, stale_before: float) -> None:
+        """Delete postings and queries older than the TTL, which search no longer returns"""
+        connection.execute("DELETE FROM queries WHERE fetched_at < ?", (stale_before,))
+        connection.execute("DELETE FROM query_jobs WHERE query NOT IN (SELECT query FROM queries)")
+        connection.execute("DELETE FROM jobs_fts WHERE rowid IN (SELECT id FROM jobs WHERE fetched_at < ?)", (stale_before,))
+        pruned = connection.execute("DELETE FROM jobs WHERE fetched_at < ?", (stale_before,)).rowcount
+        if pruned:
+            logger.info("Job index pruned %s stale postings", pruned)
+
+    def search(self, query: str, limit: int = 10, variants: Sequence[str] = ()) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return fresh postings for the query or one of its variants (e.g. "ml" for "machine
+        learning"), or None if the network should be used
+        """
+        queries = list(dict.fromkeys(normalize_query(q) for q in (query, *variants) if normalize_query(q)))
+        if not queries:
+            return None
+        fresh_after = time.time() - self.ttl_seconds
+
+        with self._connect() as connection:
+            for normalized_query in queries:
+                known = connection.execute(
+                    "SELECT fetched_at FROM queries WHERE query = ? AND fetched_at >= ?",
+                    (normalized_query, fresh_after)
+                ).fetchone()
+                if known:
+                    rows = connection.execute(
+                        """SELECT jobs.* FROM query_jobs JOIN jobs USING (fingerprint)
+                           WHERE query_jobs.query = ? ORDER BY query_jobs.position LIMIT ?""",
+                        (normalized_query, limit)
+                    ).fetchall()
+                    logger.info("Job index hit for repeated query (%s postings)", len(rows))
+                    logger.debug("Job index query: %s", normalized_query)
+                    return [dict(row) for row in rows]
+
+            # Any variant's terms may match, all terms of that variant must
+            groups = []
+            for normalized_query in queries:
+                terms = [term for term in normalized_query.split() if term not in QUERY_STOPWORDS]
+                if terms:
+                    groups.append("(" + " ".join(f'"{term}"' for term in terms) + ")")
+            if not groups:
+                return None
+            rows = connection.execute(
+                """SELECT jobs.* FROM jobs_fts JOIN jobs ON jobs.id = jobs_fts.rowid
+                   WHERE jobs_fts MATCH ? AND jobs.fetched_at >= ?
+                   ORDER BY bm25(jobs_fts) LIMIT ?""",
+                (" OR ".join(groups), fresh_after, limit)
+            ).fetchall()
+
+        if len(rows) < self.min_overlap_results:
+            return None
+        logger.info("Job index hit for overlapping query (%s postings)", len(rows))
+        logger.debug("Job index query: %s", queries[0])
+        return [dict(row) for row in rows]
+
+
+_job_index: Optional[JobIndex] = None
+_job_index_lock = threading.Lock()
+_job_index_disabled = False
+
+
+def get_job_index() -> Optional[JobIndex]:
+    """Shared index, or None if it cannot be created here (read-only disk, no FTS5)"""
+    global _job_index, _job_index_disabled
+    with _job_index_lock:
+        if _job_index is None and not _job_index_disabled:
+            try:
+                _job_index = JobIndex()
+            except Exception as e:
+                logger.warning("Job index disabled: %s", e)
+                _job_index_disabled = True
+        return _job_index
@@ -0,0 +1,140 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+from .job_index import normalize_job
+import logging
+import time
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+JOB_SEARCH_DEADLINE_SECONDS = float(os.getenv("JOB_SEARCH_DEADLINE_SECONDS", "10"))
+
+# Title synonyms, tried in both directions ("ml engineer" <-> "machine learning engineer")
+TITLE_SYNONYMS = [
+    ("ml", "machine learning"),
+    ("ai", "artificial intelligence"),
+    ("swe", "software engineer"),
+    ("software developer", "software engineer"),
+    ("dev", "developer"),
+    ("frontend", "front end"),
+    ("backend", "back end"),
+    ("devops", "site reliability"),
+    ("pm", "product manager"),
+    ("ux", "user experience"),
+    ("qa", "quality assurance"),
+    ("bi", "business intelligence"),
+]
+
+LOCATION_SYNONYMS = [
+    ("usa", "united states"),
+    ("us", "united states"),
+    ("uk", "united kingdom"),
+    ("nyc", "new york"),
+    ("sf", "san francisco"),
+    ("uae", "united arab emirates"),
+    ("munich", "münchen"),
+    ("cologne", "köln"),
+]
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="job-search")
+_sources: Dict[str, Callable[[str], List[Dict[str, Any]]]] = {}
+
+
+def register_job_source(name: str, search: Callable[[str], List[Dict[str, Any]]]) -> None:
+    """Register a source that returns raw job postings for a query"""
+    _sources[name] = search
+
+
+def _swap(query: str, synonyms: List[tuple]) -> Optional[str]:
+    """Replace the first term that has a synonym, in whichever direction matches"""
+    for short, long in synonyms:
+        for old, new in ((short, long), (long, short)):
+            pattern = rf"\b{re.escape(old)}\b"
+            if re.search(pattern, query, re.IGNORECASE):
+                return re.sub(pattern, new, query, count=1, flags=re.IGNORECASE)
+    return None
+
+
+def query_variants(query: str, max_variants: int = 3) -> List[str]:
+    """The original query plus title and location synonym variants"""
+    variants = [query]
+    title_variant = _swap(query, TITLE_SYNONYMS)
+    location_variant = _swap(query, LOCATION_SYNONYMS)
+    for variant in (title_variant, location_variant):
+        if variant and variant.lower() not in (v.lower() for v in variants):
+            variants.append(variant)
+    return variants[:max_variants]
+
+
+class FanOutResult:
+    def __init__(self, jobs: List[Dict[str, Any]], complete: bool, calls_done: int, calls_total: int, elapsed: float):
+        self.jobs = jobs
+        self.complete = complete
+        self.calls_done = calls_done
+        self.calls_total = calls_total
+        self.elapsed = elapsed
+
+
+def fan_out_search(query: str, deadline_seconds: float = JOB_SEARCH_DEADLINE_SECONDS, limit: int = 10) -> FanOutResult:
+    """
+    Send every query variant to every source concurrently and merge postings as they arrive.
+
+    Postings are deduplicated by fingerprint and ranked by how many calls returned them and
+    how high they were ranked there, with a bonus for the user's own wording. When the shared
+    deadline hits, whatever has arrived is returned instead of waiting for the slowest call.
+    Raises the last error if every call failed.
+    """
+    started = time.perf_counter()
+    variants = query_variants(query)
+    futures = {
+        _executor.submit(search, variant): (name, variant)
+        for name, search in _sources.items()
+        for variant in variants
+    }
+
+    merged: Dict[str, Dict[str, Any]] = {}
+    scores: Dict[str, float] = {}
+    calls_done = 0
+    errors: List[Exception] = []
+    complete = True
+
+    try:
+        for future in as_completed(futures, timeout=deadline_seconds):
+            name, variant = futures[future]
+            try:
+                raw_jobs = future.result()
+            except Exception as e:
+                logger.warning("Job source '%s' failed: %s", name, e)
+                logger.debug("Failed job search query: %s", variant)
+                errors.append(e)
+                continue
+
+            calls_done += 1
+            for position, raw_job in enumerate(raw_jobs):
+                job = normalize_job(raw_job)
+                if not job:
+                    continue
+                fingerprint = job["fingerprint"]
+                merged.setdefault(fingerprint, job)
+                score = 1.0 + 1.0 / (1 + position)
+                if variant == query:
+                    score += 0.5
+                scores[fingerprint] = scores.get(fingerprint, 0.0) + score
+    except TimeoutError:
+        complete = False
+        for future in futures:
+            future.cancel()  # Only calls that have not started yet can be cancelled
+        logger.info("Job search deadline of %ss hit, returning %s postings from %s/%s calls", deadline_seconds, len(merged), calls_done, len(futures))
+
+    if calls_done == 0 and errors:
+        raise errors[-1]
+
+    ranked = sorted(merged, key=lambda fingerprint: scores[fingerprint], reverse=True)
+    return FanOutResult(
+        jobs=[merged[fingerprint] for fingerprint in ranked[:limit]],
+        complete=complete and not errors,
+        calls_done=calls_done,
+        calls_total=len(futures),
+        elapsed=time.perf_counter() - started
+    )
@@ -0,0 +1,82 @@
+from langchain_core.tools import BaseTool
+from helpers.tool_wrapping import rewrap_tool
+from typing import Any, Dict, List, Sequence, Tuple
+import hashlib
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+TOOL_PASSTHROUGH_ENABLED = os.getenv("TOOL_PASSTHROUGH", "true").lower() == "true"
+
+# Tools whose results are shown to the user verbatim, with the handle prefix for each
+PASSTHROUGH_TOOLS = {"google_job_search": "JOBS"}
+
+# Short results (errors, "no results found") are cheaper to copy than to explain a handle for
+MIN_PASSTHROUGH_CHARS = 300
+
+# Square brackets, because curly ones would be taken as template variables in the system prompt
+HANDLE_PATTERN = re.compile(r"\[\[([A-Z]+)_([0-9a-f]{8})\]\]")
+HANDLE_NOTE = "\n[Passthrough handle: {handle} - write {handle} on its own line in your Final Answer to show these results in full, do not copy them]"
+
+
+def observation_handle(kind: str, observation: str) -> str:
+    """Stable handle of a tool result, the same for the same result in any request"""
+    return f"[[{kind}_{hashlib.sha1(observation.encode('utf-8')).hexdigest()[:8]}]]"
+
+
+def wrap_tools(tools: List[BaseTool]) -> List[BaseTool]:
+    """Return the tools with the passthrough ones wrapped to append a handle note to their results"""
+    return [_wrap(tool, PASSTHROUGH_TOOLS[tool.name]) if tool.name in PASSTHROUGH_TOOLS else tool for tool in tools]
+
+
+def _wrap(tool: BaseTool, kind: str) -> BaseTool:
+    def run_with_handle(*args: Any, **kwargs: Any) -> str:
+        result = tool.func(*args, **kwargs)
+        if not isinstance(result, str) or len(result) < MIN_PASSTHROUGH_CHARS or result.lstrip().startswith("Error"):
+            return result
+        return result + HANDLE_NOTE.format(handle=observation_handle(kind, result))
+
+    return rewrap_tool(tool, run_with_handle)
+
+
+def strip_handle_note(observation: str) -> str:
+    note_start = observation.rfind("\n[Passthrough handle: ")
+    return observation[:note_start] if note_start != -1 else observation
+
+
+def splice_observations(output: str, intermediate_steps: Sequence[Tuple[Any, Any]]) -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    Replace the handles in a final answer with the tool results they stand for. A handle the
+    model got wrong falls back to the latest result of the same kind, and is dropped if there
+    is none. Returns the answer and the (kind, result) pairs that were spliced in.
+    """
+    if "[[" not in output:
+        return output, []
+
+    observations: Dict[str, str] = {}
+    latest: Dict[str, str] = {}
+    for action, observation in intermediate_steps:
+        kind = PASSTHROUGH_TOOLS.get(getattr(action, "tool", None))
+        if not kind or not isinstance(observation, str):
+            continue
+        original = strip_handle_note(observation)
+        if original == observation:
+            continue
+        observations[observation_handle(kind, original)] = original
+        latest[kind] = original
+
+    spliced: List[Tuple[str, str]] = []
+
+    def replace(match: re.Match) -> str:
+        original = observations.get(match.group(0)) or latest.get(match.group(1))
+        if original is None:
+            logger.info("Dropping unknown passthrough handle %s", match.group(0))
+            return ""
+        if match.group(0) not in observations:
+            logger.info("Unknown passthrough handle %s, using the latest %s result", match.group(0), match.group(1))
+        spliced.append((match.group(1), original))
+        return original.strip()
+
+    return HANDLE_PATTERN.sub(replace, output).strip(), spliced
@@ -1,14 +1,9 @@
 from langchain_core.tools import tool
-from langchain_experimental.utilities import PythonREPL
 from helpers.helper import clean_input
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+logger = logging.getLogger(__name__)
+
 
 @tool
 def run_python_code(code: str) -> str:
@@ -19,11 +14,14 @@ def run_python_code(code: str) -> str:
         A string containing the output of the executed code
     """
     try:
-        logging.info(f"\n run python code with code: {code}")
+        logger.info("Run python code called", extra={"code_chars": len(code)})
+        logger.debug("Code: %s", code)
 
         # Clean the code by removing special tokens and unwanted text
         cleaned_code = clean_input(code)
-        logging.info(f"cleaned code: {cleaned_code}")
+        logger.debug("Cleaned code: %s", cleaned_code)
+
+        from langchain_experimental.utilities import PythonREPL
 
         python_repl = PythonREPL()
         result = python_repl.run(cleaned_code)
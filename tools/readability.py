@@ -0,0 +1,322 @@
+"""
+Main-content extraction for fetched web pages.
+
+A career article or job ad is usually a small part of its page: navigation, cookie banners,
+sidebars, related links and footers make up most of the HTML, and converted to markdown they
+fill the observation the model has to read in every later prompt. extract_page reads
+schema.org JobPosting data from JSON-LD when the page has it, then keeps only the main
+content, chosen the way Readability does: paragraphs score their parent blocks by text
+length and commas, class and id names push blocks up or down, and link-heavy blocks lose
+score by their link density.
+"""
+from bs4 import BeautifulSoup, Tag
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urljoin
+import markdownify
+import logging
+import json
+import re
+
+logger = logging.getLogger(__name__)
+
+# Elements that never carry the content of a page
+REMOVED_TAGS = ("script", "style", "noscript", "template", "iframe", "svg", "canvas", "button", "input", "select", "textarea", "nav", "footer", "aside")
+
+# class, id and role values of boilerplate and of content, as in Readability
+NEGATIVE_PATTERN = re.compile(
+    r"cookie|consent|gdpr|banner|newsletter|subscribe|signup|share|social|sidebar|widget|menu|navbar|"
+    r"breadcrumb|footer|masthead|related|recommend|comment|popup|modal|promo|sponsor|advert|\bads?\b|"
+    r"skip-link|toolbar|pagination|tags|author-bio|disclaimer",
+    re.I
+)
+# Not "text" or "body" as in Readability, utility CSS classes like text-gray-700 are everywhere
+POSITIVE_PATTERN = re.compile(r"article|content|main|post|entry|story|job|description|posting|vacanc|detail", re.I)
+
+# Boilerplate containers removed outright, unless their names also say they are content
+STRIP_PATTERN = re.compile(r"cookie|consent|gdpr|newsletter|subscribe|share|social|breadcrumb|popup|modal|promo|advert|skip-link", re.I)
+
+# Blocks whose paragraphs are scored, and the blocks that collect the scores
+SCORED_TAGS = ("p", "pre", "td", "blockquote", "li", "dd")
+CANDIDATE_TAGS = ("div", "section", "article", "main", "td", "blockquote", "body")
+TAG_WEIGHTS = {"article": 10, "main": 10, "section": 5, "div": 5, "pre": 3, "td": 3, "blockquote": 3}
+
+MIN_PARAGRAPH_CHARS = 25
+# Below this the extraction probably missed the content and the whole cleaned page is used
+MIN_CONTENT_CHARS = 250
+
+
+@dataclass
+class ExtractedPage:
+    title: str = ""
+    job_postings: List[str] = field(default_factory=list)
+    content: str = ""
+    method: str = "readability"  # readability, fallback or job_posting
+
+    def to_markdown(self) -> str:
+        parts = []
+        # Postings carry their own titles
+        if self.title and not self.job_postings and not self.content.lstrip().startswith("#"):
+            parts.append(f"# {self.title}")
+        parts.extend(self.job_postings)
+        if self.content:
+            parts.append(self.content)
+        return "\n\n".join(parts).strip()
+
+
+def extract_page(html: str, url: Optional[str] = None) -> ExtractedPage:
+    """Title, JSON-LD job postings and main content of an HTML page, as markdown"""
+    soup = BeautifulSoup(html, "html.parser")
+    page = ExtractedPage(title=_title(soup))
+
+    postings = list(_job_postings(soup))
+    page.job_postings = [format_job_posting(posting) for posting in postings]
+
+    _remove_boilerplate(soup)
+    _resolve_links(soup, url)
+    _separate_inline(soup)
+    body = soup.body or soup
+    main = _main_content(body)
+    content = to_markdown(main) if main is not None else ""
+    if len(content) < MIN_CONTENT_CHARS:
+        # Odd layouts (link lists, single-table pages) score badly, the cleaned page is still far smaller
+        content = to_markdown(body)
+        page.method = "fallback"
+
+    # A posting with a full description already says what the ad says
+    if any(len(_description(posting)) >= MIN_CONTENT_CHARS for posting in postings):
+        page.content = ""
+        page.method = "job_posting"
+    else:
+        page.content = content
+    return page
+
+
+def to_markdown(element: Any) -> str:
+    markdown = markdownify.markdownify(str(element), heading_style="ATX", strip=["img"]).strip()
+    # Remove multiple line breaks and trailing spaces
+    markdown = re.sub(r"[ \t]+\n", "\n", markdown)
+    return re.sub(r"\n{3,}", "\n\n", markdown)
+
+
+def _title(soup: BeautifulSoup) -> str:
+    heading = soup.find("h1")
+    if heading and heading.get_text(strip=True):
+        return heading.get_text(" ", strip=True)
+    if soup.title and soup.title.string:
+        return soup.title.string.strip()
+    return ""
+
+
+def _names(element: Tag) -> str:
+    classes = element.get("class") or []
+    return " ".join([*classes, element.get("id") or "", element.get("role") or ""]) if element.attrs else ""
+
+
+def _is_hidden(element: Tag) -> bool:
+    style = (element.get("style") or "").replace(" ", "").lower()
+    return element.has_attr("hidden") or element.get("aria-hidden") == "true" or "display:none" in style or "visibility:hidden" in style
+
+
+def _remove_boilerplate(soup: BeautifulSoup) -> None:
+    for element in soup.find_all(REMOVED_TAGS):
+        element.decompose()
+    for element in soup.find_all(["header", "div", "section", "ul", "p", "span", "dialog", "form"]):
+        if element.decomposed:
+            continue
+        names = _names(element)
+        if _is_hidden(element) or element.name == "dialog" or (names and STRIP_PATTERN.search(names) and not POSITIVE_PATTERN.search(names)):
+            element.decompose()
+        elif element.name == "form" and len(element.get_text(" ", strip=True)) < 500:
+            # Search boxes and signups; some frameworks wrap the whole page in a form
+            element.decompose()
+        elif element.name == "header" and element.find("h1") is None:
+            # Site headers; an article's own header holds its title
+            element.decompose()
+
+
+def _resolve_links(soup: BeautifulSoup, url: Optional[str]) -> None:
+    """Absolute links, so the model can visit them; in-page and script links become plain text"""
+    for link in soup.find_all("a"):
+        href = (link.get("href") or "").strip()
+        if not href or href.startswith(("#", "javascript:")):
+            link.unwrap()
+        elif url:
+            link["href"] = urljoin(url, href)
+
+
+def _separate_inline(soup: BeautifulSoup) -> None:
+    """Inline elements laid out as columns, e.g. a job title and its location, would run into one word"""
+    for element in soup.find_all(["a", "span", "strong", "b", "em", "time"]):
+        if isinstance(element.next_sibling, Tag) and element.next_sibling.name in ("a", "span", "strong", "b", "em", "time"):
+            element.insert_after(" ")
+
+
+def _class_weight(element: Tag) -> int:
+    names = _names(element)
+    if not names:
+        return 0
+    weight = 0
+    if NEGATIVE_PATTERN.search(names):
+        weight -= 25
+    if POSITIVE_PATTERN.search(names):
+        weight += 25
+    return weight
+
+
+def link_density(element: Tag) -> float:
+    text_length = len(element.get_text(" ", strip=True))
+    if not text_length:
+        return 0.0
+    link_length = sum(len(link.get_text(" ", strip=True)) for link in element.find_all("a"))
+    return link_length / text_length
+
+
+def _main_content(body: Tag) -> Optional[Tag]:
+    scores: Dict[int, float] = {}
+    candidates: Dict[int, Tag] = {}
+
+    def add(element: Optional[Tag], score: float) -> None:
+        if element is None or element.name not in CANDIDATE_TAGS:
+            return
+        key = id(element)
+        if key not in candidates:
+            candidates[key] = element
+            scores[key] = TAG_WEIGHTS.get(element.name, 0) + _class_weight(element)
+        scores[key] += score
+
+    for paragraph in body.find_all(SCORED_TAGS):
+        text = paragraph.get_text(" ", strip=True)
+        if len(text) < MIN_PARAGRAPH_CHARS:
+            continue
+        score = 1 + text.count(",") + min(len(text) // 100, 3)
+        parent = paragraph.parent
+        add(parent, score)
+        add(parent.parent if parent is not None else None, score / 2)
+
+    if not candidates:
+        return None
+    for key, element in candidates.items():
+        scores[key] *= 1 - link_density(element)
+    top_key = max(scores, key=scores.get)
+    top = candidates[top_key]
+    if scores[top_key] <= 0:
+        return None
+
+    # Siblings that scored well enough, or read like paragraphs, belong to the same article
+    threshold = max(10.0, scores[top_key] * 0.2)
+    kept: List[Tag] = []
+    parent = top.parent
+    siblings: Iterable[Any] = parent.children if parent is not None and top.name != "body" else [top]
+    for sibling in list(siblings):
+        if not isinstance(sibling, Tag):
+            continue
+        keep = sibling is top or scores.get(id(sibling), 0) >= threshold
+        if not keep and sibling.name == "p":
+            text = sibling.get_text(" ", strip=True)
+            keep = len(text) > 80 and link_density(sibling) < 0.25
+        if not keep and sibling.name in ("section", "div") and _class_weight(sibling) >= 0 and sibling.find(["h2", "h3"]) is not None:
+            # A headed part of the same page, e.g. the list of open positions below a careers intro
+            keep = len(sibling.get_text(" ", strip=True)) >= 200 and link_density(sibling) < 0.8
+        if not keep and sibling.name in ("h2", "h3") and sibling.find_next_sibling() is not None:
+            next_tag = sibling.find_next_sibling()
+            keep = next_tag is top or scores.get(id(next_tag), 0) >= threshold
+        if keep:
+            kept.append(sibling)
+    # A copy, so the page is left whole for the fallback
+    container = BeautifulSoup(f"<div>{''.join(str(element) for element in kept)}</div>", "html.parser").div
+    _clean_conditionally(container)
+    return container
+
+
+def _clean_conditionally(container: Tag) -> None:
+    """Drop link lists and negative blocks left inside the chosen content"""
+    for element in container.find_all(["div", "section", "ul", "ol", "table"]):
+        if element.decomposed:
+            continue
+        text = element.get_text(" ", strip=True)
+        if not text:
+            element.decompose()
+            continue
+        density = link_density(element)
+        if _class_weight(element) < 0 and len(text) < 500:
+            element.decompose()
+        elif density > 0.75 and len(text.split()) < 80:
+            # Link lists; job lists with a location or team next to each link stay
+            element.decompose()
+
+
+def _job_postings(soup: BeautifulSoup) -> Iterable[Dict[str, Any]]:
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or script.get_text() or "")
+        except (json.JSONDecodeError, TypeError):
+            logger.debug("Skipping JSON-LD block that does not parse")
+            continue
+        yield from _find_job_postings(data)
+
+
+def _find_job_postings(data: Any) -> Iterable[Dict[str, Any]]:
+    if isinstance(data, list):
+        for item in data:
+            yield from _find_job_postings(item)
+    elif isinstance(data, dict):
+        types = data.get("@type")
+        types = types if isinstance(types, list) else [types]
+        if "JobPosting" in types:
+            yield data
+        elif "@graph" in data:
+            yield from _find_job_postings(data["@graph"])
+
+
+def _text(value: Any) -> str:
+    """Plain text of a schema.org value, which may be a string, a Thing or a list of either"""
+    if isinstance(value, list):
+        return ", ".join(text for text in (_text(item) for item in value) if text)
+    if isinstance(value, dict):
+        if value.get("@type") == "PostalAddress":
+            parts = [value.get(key) for key in ("streetAddress", "addressLocality", "addressRegion", "postalCode", "addressCountry")]
+            return ", ".join(_text(part) for part in parts if part)
+        for key in ("name", "address", "value"):
+            if value.get(key):
+                return _text(value[key])
+        return ""
+    return str(value).strip() if value is not None else ""
+
+
+def _description(posting: Dict[str, Any]) -> str:
+    description = posting.get("description") or ""
+    return to_markdown(description) if "<" in description else description.strip()
+
+
+def _salary(value: Any) -> str:
+    if not isinstance(value, dict):
+        return _text(value)
+    amount = value.get("value")
+    currency = value.get("currency", "")
+    if isinstance(amount, dict):
+        low, high, unit = amount.get("minValue"), amount.get("maxValue"), amount.get("unitText", "")
+        figure = f"{low}-{high}" if low is not None and high is not None else str(amount.get("value", low or high or ""))
+        return " ".join(part for part in (figure, currency, f"per {unit.lower()}" if unit else "") if part)
+    return " ".join(part for part in (str(amount or ""), currency) if part)
+
+
+def format_job_posting(posting: Dict[str, Any]) -> str:
+    """A schema.org JobPosting as a compact markdown block"""
+    fields = [
+        ("Company", _text(posting.get("hiringOrganization"))),
+        ("Location", _text(posting.get("jobLocation"))),
+        ("Remote", "yes" if posting.get("jobLocationType") == "TELECOMMUTE" else ""),
+        ("Applicants from", _text(posting.get("applicantLocationRequirements"))),
+        ("Employment type", _text(posting.get("employmentType"))),
+        ("Salary", _salary(posting.get("baseSalary"))),
+        ("Posted", _text(posting.get("datePosted"))),
+        ("Apply by", _text(posting.get("validThrough"))),
+        ("Apply", _text(posting.get("url"))),
+    ]
+    lines = [f"## {_text(posting.get('title')) or 'Job posting'}"]
+    lines.extend(f"- {label}: {value}" for label, value in fields if value)
+    description = _description(posting)
+    if description:
+        lines.extend(["", description])
+    return "\n".join(lines)
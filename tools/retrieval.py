@@ -0,0 +1,273 @@
+"""
+Query-focused retrieval over long fetched documents.
+
+Instead of cutting a page or article after its first 10,000 characters, the document is split
+into chunks along its headings and paragraphs, indexed with BM25, and only the lead chunk plus
+the chunks most relevant to the user's question are returned, in document order and within a
+token budget. Indexes are cached per URL (or Wikipedia topic), so a follow-up question about
+the same page skips both the fetch and the indexing.
+
+The question is the user's message behind the agent run in progress, set with asking() by the
+agent executor and carried into prefetch threads with the context, together with whatever the
+tool itself was asked.
+"""
+from helpers.metrics import RETRIEVAL_CACHE, RETRIEVAL_TOKENS
+from helpers.tokens import count_tokens
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+import threading
+import logging
+import math
+import time
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL", "true").lower() == "true"
+
+# Tokens of document text a tool may return, and chunks it returns at most
+RETRIEVAL_MAX_TOKENS = int(os.getenv("RETRIEVAL_MAX_TOKENS", "2000"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
+RETRIEVAL_CHUNK_CHARS = int(os.getenv("RETRIEVAL_CHUNK_CHARS", "800"))
+# Indexed documents kept, and for how long a page is served without fetching it again
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "64"))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "900"))
+
+# Markdown headings and the "== Section ==" headings of Wikipedia's plain text
+HEADING_PATTERN = re.compile(r"^(#{1,6}\s+.+|={2,}\s*[^=].*?\s*={2,})\s*$")
+WORD_PATTERN = re.compile(r"\w+")
+OMITTED = "[...]"
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in is it its me my of on or "
+    "our should so that the their there these this to was what when where which who why will with "
+    "would you your about into than then them they we".split()
+)
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def terms(text: str) -> List[str]:
+    return [word for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+
+
+@dataclass
+class Chunk:
+    text: str
+    source: str  # title of the page or article the chunk belongs to
+    position: int  # order within its source, 0 is the lead
+    tokens: int = 0
+
+
+def chunk_document(text: str, source: str, max_chars: int = RETRIEVAL_CHUNK_CHARS) -> List[Chunk]:
+    """
+    Split a document into chunks of about max_chars along headings and paragraphs. Each chunk
+    starts with the heading it falls under, so a matching heading ranks the section.
+    """
+    chunks: List[Chunk] = []
+    heading = ""
+    current: List[str] = []
+
+    def flush() -> None:
+        body = "\n\n".join(current).strip()
+        if body:
+            prefix = f"{heading}\n" if heading and not body.startswith(heading) else ""
+            chunks.append(Chunk(text=prefix + body, source=source, position=len(chunks)))
+        current.clear()
+
+    for block in re.split(r"\n\s*\n", text):
+        block = block.strip()
+        if not block:
+            continue
+        first_line = block.split("\n", 1)[0]
+        if HEADING_PATTERN.match(first_line):
+            flush()
+            heading = first_line.strip()
+        # Paragraphs longer than a chunk are split on sentences, then hard
+        pieces = [block] if len(block) <= max_chars else _split_long(block, max_chars)
+        for piece in pieces:
+            if current and sum(len(part) for part in current) + len(piece) > max_chars:
+                flush()
+            current.append(piece)
+    flush()
+    for chunk in chunks:
+        chunk.tokens = count_tokens(chunk.text)
+    return chunks
+
+
+def _split_long(block: str, max_chars: int) -> List[str]:
+    pieces: List[str] = []
+    current = ""
+    for sentence in re.split(r"(?<=[.!?])\s+|\n", block):
+        while len(sentence) > max_chars:
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}".strip()
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+class BM25Index:
+    """Okapi BM25 over the chunks of one or more documents"""
+
+    def __init__(self, chunks: Sequence[Chunk]):
+        self.chunks = list(chunks)
+        self._term_counts = [Counter(terms(chunk.text)) for chunk in self.chunks]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._average_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        document_frequency: Counter = Counter()
+        for counts in self._term_counts:
+            document_frequency.update(counts.keys())
+        total = len(self.chunks)
+        self._idf = {term: math.log(1 + (total - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    @property
+    def tokens(self) -> int:
+        return sum(chunk.tokens for chunk in self.chunks)
+
+    def scores(self, query: str) -> List[float]:
+        query_terms = [term for term in set(terms(query)) if term in self._idf]
+        scores = [0.0] * len(self.chunks)
+        if not query_terms or not self._average_length:
+            return scores
+        for i, counts in enumerate(self._term_counts):
+            length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[i] / self._average_length)
+            score = 0.0
+            for term in query_terms:
+                frequency = counts.get(term)
+                if frequency:
+                    score += self._idf[term] * frequency * (BM25_K1 + 1) / (frequency + length_norm)
+            scores[i] = score
+        return scores
+
+    def select(self, query: str, max_tokens: int = RETRIEVAL_MAX_TOKENS, top_k: int = RETRIEVAL_TOP_K) -> List[Chunk]:
+        """
+        The lead chunk of each source, then the best-scoring chunks, within max_tokens, in
+        document order. Without a usable query this is the start of each document.
+        """
+        scores = self.scores(query)
+        leads = [i for i, chunk in enumerate(self.chunks) if chunk.position == 0]
+        ranked = sorted((i for i in range(len(self.chunks)) if scores[i] > 0), key=lambda i: scores[i], reverse=True)[:top_k]
+        # Nothing matched: read from the top, as far as the budget goes
+        candidates = [*leads, *ranked] if ranked else [*leads, *range(len(self.chunks))]
+
+        chosen: List[int] = []
+        used = 0
+        for i in candidates:
+            if i in chosen:
+                continue
+            if used + self.chunks[i].tokens > max_tokens:
+                if not ranked:
+                    break
+                continue
+            chosen.append(i)
+            used += self.chunks[i].tokens
+        return [self.chunks[i] for i in sorted(chosen)]
+
+
+def format_chunks(chunks: Sequence[Chunk], all_chunks: Sequence[Chunk], with_source: bool = False) -> str:
+    """Chunks in order, with a marker wherever chunks were left out"""
+    index_of = {id(chunk): i for i, chunk in enumerate(all_chunks)}
+    parts: List[str] = []
+    previous: Optional[Chunk] = None
+    for chunk in chunks:
+        if with_source and (previous is None or previous.source != chunk.source):
+            parts.append(f"Page: {chunk.source}")
+        elif previous is not None and index_of[id(chunk)] != index_of[id(previous)] + 1:
+            parts.append(OMITTED)
+        parts.append(chunk.text)
+        previous = chunk
+    if chunks and index_of[id(chunks[-1])] != len(all_chunks) - 1 and not with_source:
+        parts.append(OMITTED)
+    return "\n\n".join(parts)
+
+
+@dataclass
+class _Entry:
+    index: BM25Index
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class DocumentIndexCache:
+    """Recently indexed documents by URL, so follow-up questions skip the fetch and the indexing"""
+
+    def __init__(self, max_entries: int = RETRIEVAL_CACHE_SIZE, ttl_seconds: float = RETRIEVAL_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[BM25Index]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry.created_at > self.ttl_seconds:
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return entry.index
+
+    def put(self, key: str, index: BM25Index) -> None:
+        with self._lock:
+            self._entries[key] = _Entry(index)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_build(self, kind: str, key: str, build: Callable[[], BM25Index]) -> Tuple[BM25Index, bool]:
+        """The cached index of a document, or a new one from build(); and whether it was cached"""
+        index = self.get(key)
+        if index is not None:
+            RETRIEVAL_CACHE.labels(kind, "hit").inc()
+            return index, True
+        RETRIEVAL_CACHE.labels(kind, "miss").inc()
+        index = build()
+        # Failed fetches raise before this, so errors are never cached. Neither are empty results,
+        # such as a Wikipedia topic without articles, which may well exist a minute later.
+        if index.chunks:
+            self.put(key, index)
+        return index, False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+document_cache = DocumentIndexCache()
+
+
+_question: ContextVar[str] = ContextVar("retrieval_question", default="")
+
+
+@contextmanager
+def asking(question: str) -> Iterator[None]:
+    """Make question the one current_question() returns for the tool calls inside the block"""
+    token = _question.set(question)
+    try:
+        yield
+    finally:
+        _question.reset(token)
+
+
+def current_question() -> str:
+    """The user's message behind the agent run in progress, empty outside of one"""
+    return _question.get()
+
+
+def retrieve(kind: str, index: BM25Index, query: str, max_tokens: int = RETRIEVAL_MAX_TOKENS, with_source: bool = False) -> str:
+    """The parts of an indexed document relevant to the query, the whole document when it fits"""
+    RETRIEVAL_TOKENS.labels(kind, "document").inc(index.tokens)
+    if index.tokens <= max_tokens:
+        selected = index.chunks
+    else:
+        selected = index.select(query, max_tokens=max_tokens)
+    RETRIEVAL_TOKENS.labels(kind, "returned").inc(sum(chunk.tokens for chunk in selected))
+    return format_chunks(selected, index.chunks, with_source=with_source)
@@ -0,0 +1,174 @@
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tools import BaseTool
+from helpers.tool_wrapping import rewrap_tool
+from helpers.helper import clean_input
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+import contextvars
+import threading
+import logging
+import time
+import re
+
+logger = logging.getLogger(__name__)
+
+# Tools whose result only depends on their input, so running them early is safe
+IDEMPOTENT_TOOLS = ("wikipedia_search", "internet_search", "google_job_search", "visit_webpage")
+
+# "Action: <tool>" followed by a finished "Action Input: <input>" line
+ACTION_PATTERN = re.compile(r"Action\s*:\s*(\S+)\s*\n\s*Action Input\s*:\s*(.+?)\s*\n")
+
+
+def _cache_key(tool_name: str, tool_input: str) -> Tuple[str, str]:
+    """
+    Normalize the input the same way the tools do, so streamed and parsed inputs match.
+    These tools take a one-line query or URL, so anything the model rambled on with after
+    the first line is ignored.
+    """
+    cleaned = clean_input(tool_input).strip()
+    first_line = cleaned.split("\n")[0] if cleaned else ""
+    return tool_name, first_line.strip().strip('"\'').strip()
+
+
+class _PendingCall:
+    def __init__(self, future: Future):
+        self.future = future
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        future.add_done_callback(self._mark_finished)
+
+    def _mark_finished(self, _: Future) -> None:
+        self.finished_at = time.perf_counter()
+
+
+class SpeculativeToolPrefetcher:
+    """
+    Starts idempotent tool calls while the LLM is still generating.
+
+    A streaming callback watches the completion for an "Action:" line followed by a finished
+    "Action Input:" line and submits the tool call right away. The tools handed to the agent
+    executor are wrapped so they pick up the prefetched result instead of calling out again.
+    """
+
+    def __init__(self, tool_names: Iterable[str] = IDEMPOTENT_TOOLS, max_workers: int = 8, ttl: float = 120.0):
+        self.tool_names = set(tool_names)
+        self.ttl = ttl
+        self._tools: Dict[str, BaseTool] = {}
+        self._pending: Dict[Tuple[str, str], _PendingCall] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool-prefetch")
+        self._stats = {"prefetched": 0, "hits": 0, "misses": 0, "expired": 0, "seconds_saved": 0.0}
+        self.callback_handler = SpeculativePrefetchHandler(self)
+
+    def wrap_tools(self, tools: List[BaseTool]) -> List[BaseTool]:
+        """Return the tools with the idempotent ones wrapped to consume prefetched results"""
+        return [self._wrap(tool) if tool.name in self.tool_names else tool for tool in tools]
+
+    def _wrap(self, tool: BaseTool) -> BaseTool:
+        self._tools[tool.name] = tool
+
+        def run_with_prefetch(*args: Any, **kwargs: Any) -> str:
+            tool_input = args[0] if args else next(iter(kwargs.values()), "")
+            return self._run(tool, tool_input)
+
+        return rewrap_tool(tool, run_with_prefetch)
+
+    def prefetch(self, tool_name: str, tool_input: str) -> None:
+        """Submit a tool call seen in the streamed completion, unless it is already running"""
+        if tool_name not in self._tools:
+            return
+        key = _cache_key(tool_name, tool_input)
+        if not key[1]:
+            return
+
+        with self._lock:
+            self._expire()
+            if key in self._pending:
+                return
+            # In the context of the run, so the tool sees the same current_question() as when the agent calls it
+            self._pending[key] = _PendingCall(self._executor.submit(contextvars.copy_context().run, self._tools[tool_name].func, key[1]))
+            self._stats["prefetched"] += 1
+        logger.info("Speculatively started %s", tool_name, extra={"input_chars": len(key[1])})
+        logger.debug("Speculative %s input: %s", tool_name, key[1])
+
+    def _run(self, tool: BaseTool, tool_input: str) -> str:
+        key = _cache_key(tool.name, tool_input)
+        with self._lock:
+            pending = self._pending.pop(key, None)
+
+        if pending is None:
+            with self._lock:
+                self._stats["misses"] += 1
+            return self._tools[tool.name].func(tool_input)
+
+        requested_at = time.perf_counter()
+        result = pending.future.result()
+        finished_at = pending.finished_at or time.perf_counter()
+        # Tool time that overlapped with generation instead of following it
+        saved = max(0.0, min(requested_at, finished_at) - pending.started_at)
+        with self._lock:
+            self._stats["hits"] += 1
+            self._stats["seconds_saved"] += saved
+        logger.info("Speculative hit for %s: %.2fs of tool latency hidden behind generation", tool.name, saved)
+        return result
+
+    def _expire(self) -> None:
+        """Drop prefetched results the executor never asked for (caller holds the lock)"""
+        now = time.perf_counter()
+        for key in [key for key, pending in self._pending.items() if now - pending.started_at > self.ttl]:
+            del self._pending[key]
+            self._stats["expired"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class SpeculativePrefetchHandler(BaseCallbackHandler):
+    """Feeds streamed tokens of each LLM run to the prefetcher"""
+
+    def __init__(self, prefetcher: SpeculativeToolPrefetcher):
+        self.prefetcher = prefetcher
+        self._buffers: Dict[UUID, str] = {}
+        self._dispatched: set = set()
+        self._lock = threading.Lock()
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._buffers[run_id] = ""
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            if run_id in self._dispatched:
+                return
+            buffer = self._buffers.get(run_id, "") + token
+            self._buffers[run_id] = buffer
+            match = ACTION_PATTERN.search(buffer)
+            if not match or "Final Answer:" in buffer:
+                return
+            self._dispatched.add(run_id)
+
+        self.prefetcher.prefetch(match.group(1), match.group(2))
+
+    def on_retry(self, retry_state: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        # The retried attempt streams its answer from the start, so the failed one's text goes
+        with self._lock:
+            if run_id in self._buffers:
+                self._buffers[run_id] = ""
+            self._dispatched.discard(run_id)
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._forget(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._forget(run_id)
+
+    def _forget(self, run_id: UUID) -> None:
+        with self._lock:
+            self._buffers.pop(run_id, None)
+            self._dispatched.discard(run_id)
@@ -4,14 +4,17 @@ import markdownify
 import re
 from requests.exceptions import RequestException
 from helpers.helper import clean_input
+from helpers.tracing import span
+from .readability import extract_page
+from .retrieval import RETRIEVAL_ENABLED, BM25Index, chunk_document, current_question, document_cache, retrieve
 import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Keep only the main content of HTML pages, and JSON-LD job postings, instead of the whole page
+WEBPAGE_MAIN_CONTENT = os.getenv("WEBPAGE_MAIN_CONTENT", "true").lower() == "true"
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
 
 @tool
 def visit_webpage(url: str) -> str:
@@ -22,24 +25,22 @@ def visit_webpage(url: str) -> str:
         A string containing the webpage content in markdown format
     """
     try:
-        logging.info(f"\n Visit Webpage search called with url: {url}")
-        # Send a GET request to the URL with a 20-second timeout
+        logger.info("Visit Webpage search called with url: %s", url)
         clean_url = clean_input(url)
-        response = requests.get(clean_url, timeout=20)
-        response.raise_for_status()  # Raise an exception for bad status codes
-
-        # Convert the HTML content to Markdown
-        markdown_content = markdownify.markdownify(response.text).strip()
-
-        # Remove multiple line breaks
-        markdown_content = re.sub(r"\n{3,}", "\n\n", markdown_content)
+        if not RETRIEVAL_ENABLED:
+            markdown_content = _fetch_markdown(clean_url)
+            # Truncate content to reasonable size
+            max_length = 10000
+            if len(markdown_content) > max_length:
+                markdown_content = markdown_content[:max_length] + "...(content truncated)"
+            return markdown_content
 
-        # Truncate content to reasonable size
-        max_length = 10000
-        if len(markdown_content) > max_length:
-            markdown_content = markdown_content[:max_length] + "...(content truncated)"
-
-        return markdown_content
+        # Follow-up questions about the same page reuse its index instead of fetching it again
+        index, cached = document_cache.get_or_build(
+            "webpage", clean_url, lambda: BM25Index(chunk_document(_fetch_markdown(clean_url), source=clean_url))
+        )
+        with span("webpage.retrieve", chunks=len(index.chunks), cached=cached):
+            return retrieve("webpage", index, current_question())
 
     except requests.exceptions.Timeout:
         return "Error: The request timed out after 20 seconds. Please try again later or check the URL."
@@ -52,3 +53,24 @@ def visit_webpage(url: str) -> str:
     except Exception as e:
         return f"Error: An unexpected error occurred while visiting the webpage: {str(e)}"
 
+
+def _fetch_markdown(clean_url: str) -> str:
+    # Send a GET request to the URL with a 20-second timeout
+    with span("webpage.fetch", url=clean_url):
+        response = requests.get(clean_url, timeout=20)
+        response.raise_for_status()  # Raise an exception for bad status codes
+
+    if WEBPAGE_MAIN_CONTENT and "html" in response.headers.get("Content-Type", "text/html"):
+        with span("webpage.extract", html_chars=len(response.text)) as stage:
+            page = extract_page(response.text, url=response.url)
+            markdown_content = page.to_markdown()
+            if stage:
+                stage.set_attribute("webpage.method", page.method)
+                stage.set_attribute("webpage.job_postings", len(page.job_postings))
+    else:
+        # Convert the HTML content to Markdown
+        with span("webpage.to_markdown", html_chars=len(response.text)):
+            markdown_content = markdownify.markdownify(response.text).strip()
+
+    # Remove multiple line breaks
+    return re.sub(r"\n{3,}", "\n\n", markdown_content)
@@ -1,7 +1,25 @@
 from langchain_core.tools import tool
-from langchain_community.tools import WikipediaQueryRun
-from langchain_community.utilities import WikipediaAPIWrapper
 from helpers.helper import clean_input
+from .retrieval import RETRIEVAL_ENABLED, BM25Index, chunk_document, current_question, document_cache, retrieve
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Articles read per search, and the most of each article that is indexed
+WIKIPEDIA_PAGES = int(os.getenv("WIKIPEDIA_PAGES", "3"))
+WIKIPEDIA_MAX_CHARS = int(os.getenv("WIKIPEDIA_MAX_CHARS", "100000"))
+
+
+def _load_articles(topic: str) -> BM25Index:
+    from langchain_community.utilities import WikipediaAPIWrapper
+
+    wiki = WikipediaAPIWrapper(top_k_results=WIKIPEDIA_PAGES, doc_content_chars_max=WIKIPEDIA_MAX_CHARS)
+    chunks = []
+    for document in wiki.load(topic):
+        chunks.extend(chunk_document(document.page_content, source=document.metadata.get("title", topic)))
+    return BM25Index(chunks)
+
 
 @tool
 def wikipedia_search(topic: str) -> str:
@@ -11,13 +29,24 @@ def wikipedia_search(topic: str) -> str:
     Returns:
         A string containing the Wikipedia summary of the topic
     """
+    clean_topic = clean_input(topic)
     try:
-        print("\n Wikipedia search called with topic: ",topic)
-        wiki = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
-        clean_topic = clean_input(topic)
-        result = wiki.run(clean_topic)
-        if not result:
+        logger.info("Wikipedia search called", extra={"topic_chars": len(topic)})
+        logger.debug("Wikipedia topic: %s", topic)
+        if not RETRIEVAL_ENABLED:
+            from langchain_community.tools import WikipediaQueryRun
+            from langchain_community.utilities import WikipediaAPIWrapper
+
+            wiki = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
+            result = wiki.run(clean_topic)
+            if not result:
+                return f"No Wikipedia article found for '{clean_topic}'"
+            return result
+
+        # Whole articles, not just their summaries, with the sections that match the question
+        index, _ = document_cache.get_or_build("wikipedia", f"wikipedia:{clean_topic.lower()}", lambda: _load_articles(clean_topic))
+        if not index.chunks:
             return f"No Wikipedia article found for '{clean_topic}'"
-        return result
+        return retrieve("wikipedia", index, f"{current_question()} {clean_topic}", with_source=True)
     except Exception as e:
-        return f"Error searching Wikipedia for '{clean_topic}': {str(e)}" 
\ No newline at end of file
+        return f"Error searching Wikipedia for '{clean_topic}': {str(e)}"